@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+# Micro-benchmarks des chemins critiques (lancés à la main, hors Discord) :
+#   python -m benchmarks.run --sizes 1k 100k --output before.json
+#   python -m benchmarks.compare before.json after.json
+import os
+
+# config.py exige le channel autorisé : valeur factice si aucun .env n'est présent
+os.environ.setdefault("AUTHORIZED_CHANNEL_ID", "0")
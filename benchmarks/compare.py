@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Compare deux fichiers de résultats de benchmarks.run (médianes par appel)
+
+    python -m benchmarks.compare before.json after.json [--threshold 20]
+"""
+import argparse
+import json
+import sys
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparaison de deux exécutions de benchmarks")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=20.0, help="Écart (%%) signalé comme régression/gain")
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    print(f"baseline : {baseline['meta'].get('git')} ({baseline['meta']['date']})")
+    print(f"candidate: {candidate['meta'].get('git')} ({candidate['meta']['date']})")
+    print(f"{'benchmark':<36} {'baseline µs':>14} {'candidate µs':>14} {'change':>9}")
+
+    regressions = 0
+    for name in sorted(set(baseline['results']) | set(candidate['results'])):
+        before = baseline['results'].get(name)
+        after = candidate['results'].get(name)
+        if name.endswith("/index_memory"):
+            # Mémoire des index : seul le respect du budget compte
+            if after is not None:
+                flag = "" if after['within_budget'] else "  ▲ over budget"
+                regressions += 0 if after['within_budget'] else 1
+                before_mb = '-' if before is None else before['traced_mb']
+                print(f"{name:<36} {before_mb:>12} MB {after['traced_mb']:>12} MB {'':>9}{flag}")
+            continue
+        if before is None or after is None:
+            print(f"{name:<36} {'-' if before is None else before['median_us']:>14} "
+                  f"{'-' if after is None else after['median_us']:>14} {'n/a':>9}")
+            continue
+        change = (after['median_us'] - before['median_us']) / before['median_us'] * 100 if before['median_us'] else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "  ▲ slower"
+            regressions += 1
+        elif change < -args.threshold:
+            flag = "  ▼ faster"
+        print(f"{name:<36} {before['median_us']:>14.3f} {after['median_us']:>14.3f} {change:>+8.1f}%{flag}")
+
+    # Code de sortie non nul en cas de régression (utilisable en CI)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
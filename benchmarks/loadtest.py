@@ -0,0 +1,410 @@
+# -*- coding: utf-8 -*-
+"""Test de charge de bout en bout : faux contexte Discord et CDN local pour les pièces jointes
+
+    python -m benchmarks.loadtest [--size 100k] [--concurrency 1 8 32] [--duration 20]
+                                  [--mix pb=3,pbshow=1,top10=3,mystats=2,mercy=1]
+    python -m benchmarks.loadtest --replay /chemin/bot_data.db   # rejoue pb_history
+
+Chaque palier de concurrence lance N utilisateurs virtuels en boucle fermée (commande suivante
+dès la réponse reçue). Une soumission de PB n'est terminée qu'à la réponse du worker de la file.
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+import types
+
+from aiohttp import web
+
+import config
+from benchmarks.run import template_path, SIZES
+from benchmarks.synthetic import load_accounts
+from cogs.mercy import Mercy
+from cogs.mystats import MyStats
+from utils import leaderboard_handler, pb_handler
+from utils.AsyncDatabaseManager_class import AsyncDatabaseManager
+from utils.AsyncMercyManager_class import AsyncMercyManager
+from utils.ConnectionPool_class import ConnectionPool
+from utils.DatabaseManager_class import DatabaseManager
+from utils.MercyManager_class import MercyManager
+from utils.ScreenshotManager_class import ScreenshotManager
+
+DEFAULT_MIX = "pb=3,pbshow=1,top10=3,mystats=2,mercy=1"
+MEMORY_LIMIT_MB = 256    # Limite mémoire du conteneur (docker-compose)
+COMMAND_TIMEOUT = 120    # Secondes avant de compter une commande comme perdue
+RSS_SAMPLE_SECONDS = 0.05
+
+# ---------- Faux objets Discord ----------
+
+class FakeMessage:
+    _ids = itertools.count(1)
+
+    def __init__(self, attachments=(), embeds=()):
+        self.id = next(self._ids)
+        self.attachments = list(attachments)
+        self.embeds = list(embeds)
+
+    async def add_reaction(self, emoji):
+        pass
+
+    async def remove_reaction(self, emoji, member):
+        pass
+
+    async def edit(self, **kwargs):
+        pass
+
+class FakeCtx:
+    """Contexte de commande : send() enregistre la réponse et simule l'hébergement CDN des fichiers"""
+
+    def __init__(self, bot, author, attachments=()):
+        self.bot = bot
+        self.author = author
+        self.channel = types.SimpleNamespace(id=config.AUTHORIZED_CHANNEL_ID)
+        self.guild = None
+        self.message = FakeMessage(attachments)
+        self.replies = []
+        self.replied = asyncio.Event()
+
+    async def send(self, content=None, embed=None, file=None, **kwargs):
+        attachments = []
+        if file is not None:
+            # Discord héberge le fichier : URL CDN valide une journée
+            expires = format(int(time.time()) + 86400, "x")
+            attachments.append(types.SimpleNamespace(
+                url=f"https://cdn.discordapp.com/attachments/1/{self.message.id}/{file.filename}?ex={expires}"
+            ))
+            file.close()
+        self.replies.append(content or (embed.title if embed else ""))
+        # La notification de mise en file n'est pas la réponse attendue
+        if not (content and content.startswith(config.SUBMISSION_QUEUED_EMOJI)):
+            self.replied.set()
+        return FakeMessage(attachments, [embed] if embed else [])
+
+class FakeAttachment:
+    def __init__(self, url, filename, size):
+        self.url = url
+        self.filename = filename
+        self.size = size
+
+# ---------- CDN local ----------
+
+def make_screenshot(seed, width=1280, height=720):
+    """Capture d'écran synthétique (dégradés + bruit) encodée en PNG"""
+    from PIL import Image
+    rng = random.Random(seed)
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    noise = Image.effect_noise((width, height), rng.randint(20, 60)).convert("RGB")
+    image = Image.blend(image, noise, 0.3)
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+async def start_cdn(images, latency):
+    """Serveur HTTP local : /<image>/<variante>.png renvoie une image unique par variante"""
+    async def handle(request):
+        if latency:
+            await asyncio.sleep(latency)
+        body = images[int(request.match_info["image"]) % len(images)]
+        # Octets ajoutés après la fin du PNG : contenu (et sha256) unique, décodage identique
+        return web.Response(body=body + request.match_info["variant"].encode(), content_type="image/png")
+
+    app = web.Application()
+    app.router.add_get("/{image}/{variant}.png", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+# ---------- Mémoire ----------
+
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def _children(pid):
+    children = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                children += [int(child) for child in f.read().split()]
+    except OSError:
+        pass
+    return children
+
+def current_rss_mb():
+    """RSS du bot et de ses processus de traitement d'images (Linux), en Mo"""
+    pid = os.getpid()
+    return (_rss_kb(pid) + sum(_rss_kb(child) for child in _children(pid))) / 1024
+
+async def sample_rss(peak):
+    while True:
+        peak[0] = max(peak[0], current_rss_mb())
+        await asyncio.sleep(RSS_SAMPLE_SECONDS)
+
+# ---------- Commandes ----------
+
+class Harness:
+    """Managers réels (base, screenshots, mercy) branchés comme dans bot.py"""
+
+    def __init__(self, db_path, workdir, cdn_url, accounts, images):
+        self.pool = ConnectionPool(db_path)
+        self.db_manager = AsyncDatabaseManager(DatabaseManager(pool=self.pool))
+        self.mercy_manager = AsyncMercyManager(MercyManager(pool=self.pool), self.db_manager.executor)
+        self.screenshot_manager = ScreenshotManager(os.path.join(workdir, "screenshots"))
+        self.bot = types.SimpleNamespace(
+            db_manager=self.db_manager, mercy_manager=self.mercy_manager,
+            screenshot_manager=self.screenshot_manager, user=types.SimpleNamespace(id=0),
+            dispatch=lambda *args: None,
+        )
+        self.mystats_cog = MyStats(self.bot)
+        self.mercy_cog = Mercy(self.bot)
+        self.cdn_url = cdn_url
+        self.accounts = accounts
+        self.images = images
+        self.variants = itertools.count()
+        self.rng = random.Random(1)
+
+    async def start(self):
+        pb_handler.set_managers(self.db_manager, self.screenshot_manager)
+        leaderboard_handler.set_db_manager(self.db_manager)
+        await self.db_manager.warm_leaderboard_cache()
+        await self.db_manager.warm_username_index()
+        await self.db_manager.warm_screenshot_index()
+        await self.screenshot_manager.start()
+        pb_handler.submission_pipeline.start()
+
+    async def close(self):
+        await pb_handler.submission_pipeline.close()
+        await self.screenshot_manager.close()
+        await self.mercy_manager.flush_events()
+        self.db_manager.shutdown()
+        self.pool.close()
+
+    def author(self, account=None):
+        discord_id, username = account or self.rng.choice(self.accounts)
+        return types.SimpleNamespace(id=int(discord_id), display_name=username, name=username)
+
+    def attachment(self):
+        variant = next(self.variants)
+        image = variant % len(self.images)
+        return FakeAttachment(f"{self.cdn_url}/{image}/{variant}.png", f"{variant}.png", len(self.images[image]))
+
+    async def pb(self, author=None, boss_type="hydra", difficulty="brutal", damage=None):
+        ctx = FakeCtx(self.bot, author or self.author(), [self.attachment()])
+        damage = damage or int(self.rng.lognormvariate(16, 1.2))
+        args = (difficulty, str(damage)) if difficulty else (str(damage),)
+        await pb_handler.handle_pb_command(ctx, boss_type, *args)
+        # Réponse envoyée par le worker de la file (ou refus immédiat si la file est pleine)
+        await asyncio.wait_for(ctx.replied.wait(), COMMAND_TIMEOUT)
+        return ctx
+
+    async def pbshow(self):
+        ctx = FakeCtx(self.bot, self.author())
+        await pb_handler.handle_pb_command(ctx, "hydra", "brutal")
+        return ctx
+
+    async def top10(self):
+        ctx = FakeCtx(self.bot, self.author())
+        clan = self.rng.choice([None, None, *config.CLAN_CONFIG])
+        await leaderboard_handler.show_leaderboard(ctx, "hydra", self.rng.choice(["normal", "hard", "brutal", "nm"]), clan)
+        return ctx
+
+    async def mystats(self):
+        ctx = FakeCtx(self.bot, self.author())
+        await MyStats.mystats.callback(self.mystats_cog, ctx)
+        return ctx
+
+    async def mercy(self):
+        ctx = FakeCtx(self.bot, self.author())
+        if self.rng.random() < 0.5:
+            await Mercy.mercy.callback(self.mercy_cog, ctx, "add", "ancient", str(self.rng.randint(1, 30)))
+        else:
+            await Mercy.mercy.callback(self.mercy_cog, ctx, "show")
+        return ctx
+
+def parse_mix(text):
+    """'pb=3,top10=2' -> [(commande, poids), ...]"""
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("pb", "pbshow", "top10", "mystats", "mercy"):
+            raise SystemExit(f"[ERREUR] Commande inconnue dans --mix: {name}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+def load_replay(path):
+    """Soumissions de PB dans l'ordre de pb_history d'une base réelle (ouverte en lecture seule)"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return conn.execute(
+            'SELECT discord_id, username, boss_type, difficulty, damage FROM pb_history ORDER BY id'
+        ).fetchall()
+    finally:
+        conn.close()
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def summarize(latencies):
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        "mean_ms": round(statistics.mean(values) * 1000, 2) if values else 0.0,
+    }
+
+async def run_level(harness, concurrency, duration, mix, replay=None):
+    """Un palier : `concurrency` utilisateurs virtuels pendant `duration` secondes (ou jusqu'à la fin du rejeu)"""
+    latencies = {}
+    outcomes = {"ok": 0, "shed": 0, "error": 0, "timeout": 0}
+    names, weights = zip(*mix)
+    deadline = time.perf_counter() + duration
+    rng = random.Random(concurrency)
+
+    async def one(name, call):
+        start = time.perf_counter()
+        try:
+            ctx = await call()
+        except asyncio.TimeoutError:
+            outcomes["timeout"] += 1
+            return
+        except Exception as e:
+            outcomes["error"] += 1
+            print(f"[ERREUR] {name}: {e}")
+            return
+        latencies.setdefault(name, []).append(time.perf_counter() - start)
+        last = ctx.replies[-1] if ctx.replies else ""
+        if last.startswith("⚠️ Too many"):
+            outcomes["shed"] += 1
+        elif last.startswith("⚠️ Error"):
+            outcomes["error"] += 1
+        else:
+            outcomes["ok"] += 1
+
+    async def virtual_user():
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            await one(name, getattr(harness, name))
+
+    async def replayer(rows):
+        for discord_id, username, boss_type, difficulty, damage in rows:
+            author = harness.author((discord_id, username))
+            difficulty = None if difficulty == "none" else difficulty
+            await one("pb", lambda: harness.pb(author, boss_type, difficulty, damage))
+
+    start = time.perf_counter()
+    if replay is not None:
+        # Un utilisateur par flux : l'ordre des soumissions d'un même joueur est conservé
+        streams = {}
+        for row in replay:
+            streams.setdefault(row[0], []).append(row)
+        lanes = [[] for _ in range(concurrency)]
+        for i, rows in enumerate(streams.values()):
+            lanes[i % concurrency].extend(rows)
+        await asyncio.gather(*(replayer(rows) for rows in lanes))
+    else:
+        await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    every = [value for values in latencies.values() for value in values]
+    return {
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_per_s": round(len(every) / elapsed, 1) if elapsed else 0.0,
+        "outcomes": outcomes,
+        "all": summarize(every),
+        "commands": {name: summarize(values) for name, values in sorted(latencies.items())},
+    }
+
+def print_level(result, peak_mb, limit_mb):
+    overall = result["all"]
+    print(f"\n== concurrency {result['concurrency']}: {result['throughput_per_s']} cmd/s over {result['elapsed_s']}s, "
+          f"outcomes {result['outcomes']}, peak RSS {peak_mb:.0f} MB / {limit_mb} MB")
+    print(f"   {'command':<10} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in list(result["commands"].items()) + [("ALL", overall)]:
+        print(f"   {name:<10} {stats['count']:>7} {stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}")
+
+async def main_async(args):
+    workdir = tempfile.mkdtemp(prefix="loadtest_")
+    peak = [0.0]
+    sampler = asyncio.create_task(sample_rss(peak))
+    try:
+        mix = parse_mix(args.mix)
+        replay = None
+        if args.replay:
+            replay = load_replay(args.replay)
+            print(f"[INFO] Rejeu de {len(replay)} soumissions de pb_history")
+            accounts = list(dict((discord_id, username) for discord_id, username, *_ in replay).items())
+        else:
+            template = template_path(args.size, SIZES[args.size])
+            accounts = load_accounts(template)
+
+        images = [make_screenshot(seed) for seed in range(args.images)]
+        cdn, cdn_url = await start_cdn(images, args.cdn_latency)
+        report = {"size": None if args.replay else args.size, "memory_limit_mb": args.memory_limit, "levels": []}
+        try:
+            for concurrency in args.concurrency:
+                # Base et screenshots neufs à chaque palier : les paliers ne s'influencent pas
+                # (rejeu : base vide, l'historique reconstruit les PB comme en production)
+                level_dir = tempfile.mkdtemp(dir=workdir)
+                db_path = os.path.join(level_dir, "bot_data.db")
+                if not replay:
+                    shutil.copyfile(template, db_path)
+                harness = Harness(db_path, level_dir, cdn_url, accounts, images)
+                await harness.start()
+                try:
+                    peak[0] = current_rss_mb()
+                    result = await run_level(harness, concurrency, args.duration, mix, replay)
+                finally:
+                    await harness.close()
+                result["peak_rss_mb"] = round(peak[0], 1)
+                report["levels"].append(result)
+                print_level(result, peak[0], args.memory_limit)
+                if peak[0] > args.memory_limit:
+                    print(f"[ERREUR] Limite mémoire dépassée ({peak[0]:.0f} MB > {args.memory_limit} MB)")
+        finally:
+            await cdn.cleanup()
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"[OK] Résultats enregistrés dans {args.output}")
+    finally:
+        sampler.cancel()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge de bout en bout (faux contexte Discord)")
+    parser.add_argument("--size", default="1k", choices=list(SIZES), help="Base synthétique utilisée")
+    parser.add_argument("--replay", default=None, help="Base réelle dont pb_history est rejoué")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=20.0, help="Secondes par palier (hors rejeu)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Poids des commandes, ex. pb=3,top10=2,mystats=1")
+    parser.add_argument("--images", type=int, default=8, help="Images distinctes servies par le CDN local")
+    parser.add_argument("--cdn-latency", type=float, default=0.05, help="Latence simulée du CDN (secondes)")
+    parser.add_argument("--memory-limit", type=int, default=MEMORY_LIMIT_MB, help="Limite mémoire (Mo)")
+    parser.add_argument("--output", default=None, help="Fichier JSON de résultats")
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""Lance les micro-benchmarks et enregistre les résultats en JSON
+
+    python -m benchmarks.run [--sizes 1k 100k 1M] [--output results.json] [--repeat 5]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks.synthetic import build_database, load_accounts
+from config import BOSS_CONFIG, INDEX_MEMORY_BUDGET_MB
+from utils.AsyncDatabaseManager_class import AsyncDatabaseManager
+from utils.ConnectionPool_class import ConnectionPool
+from utils.DatabaseManager_class import DatabaseManager
+from utils.MercyManager_class import MercyManager
+from utils.helpers import parse_damage_amount, format_damage_display, get_user_clan
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+SIZES = {"1k": 1_000, "100k": 100_000, "1M": 1_000_000}
+MIN_TIME = 0.2  # Secondes minimum par mesure (nombre d'appels ajusté automatiquement)
+
+def measure(func, repeat):
+    """Temps par appel (µs) : meilleure, médiane et moyenne sur `repeat` mesures"""
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        if timer.timeit(number) >= MIN_TIME:
+            break
+        number *= 2 if number < 1024 else 10
+    runs = [t / number * 1e6 for t in timer.repeat(repeat, number)]
+    return {
+        "min_us": round(min(runs), 3),
+        "median_us": round(statistics.median(runs), 3),
+        "mean_us": round(statistics.mean(runs), 3),
+        "number": number,
+        "repeat": repeat,
+    }
+
+def helper_benchmarks():
+    """Fonctions pures de utils.helpers (indépendantes de la taille de la base)"""
+    samples = ["1.5M", "500K", "2.25B", "750000", "12.3M", "12345678"]
+    # Uniquement des formats acceptés : un rejet mesurerait le chemin d'erreur
+    assert all(parse_damage_amount(sample) is not None for sample in samples)
+    damages = itertools.cycle(samples)
+    amounts = itertools.cycle([950, 12_500, 1_500_000, 2_250_000_000])
+    names = itertools.cycle(["[RTF] Karito12", "[rtfc]Shadra", "Vexmor77", "[RTFR] Elgor"])
+    return {
+        "parse_damage_amount": lambda: parse_damage_amount(next(damages)),
+        "format_damage_display": lambda: format_damage_display(next(amounts)),
+        "get_user_clan": lambda: get_user_clan(next(names)),
+    }
+
+def database_benchmarks(db, mercy, accounts, seed=7):
+    """Requêtes de DatabaseManager/MercyManager sur des utilisateurs tirés au hasard"""
+    rng = random.Random(seed)
+    sample = rng.sample(accounts, min(len(accounts), 1000))
+    users = itertools.cycle([discord_id for discord_id, _ in sample])
+    # Recherche sur un fragment du pseudo (sans le tag de clan), comme !pbhydra brutal <nom>
+    fragments = itertools.cycle([username.split("] ")[-1][:6] for _, username in sample])
+    # Toujours supérieur au PB en base : chaque appel écrit réellement
+    damages = itertools.count(10 ** 12)
+    names = dict(sample)
+
+    def update_pb():
+        discord_id = next(users)
+        db.update_user_pb(discord_id, names[discord_id], "hydra", next(damages), None, "brutal")
+
+    return {
+        "get_leaderboard": lambda: db.get_leaderboard("hydra", "brutal", 10),
+        "get_leaderboard_clan": lambda: db.get_leaderboard("hydra", "brutal", 10, "RTF"),
+        "get_user_all_pbs": lambda: db.get_user_all_pbs(next(users)),
+        "find_user_by_name": lambda: db.find_user_by_name(next(fragments)),
+        "add_pulls": lambda: mercy.add_pulls(next(users), "ancient", 1),
+        "update_user_pb": update_pb,
+    }
+
+def facade_benchmarks(facade, loop, accounts, seed=7):
+    """Façade asynchrone après chargement des index : (chemin servi, fonction) par benchmark
+
+    Un index resté froid (hors budget) est servi par SQLite : le chemin est indiqué avec le résultat.
+    """
+    rng = random.Random(seed)
+    sample = rng.sample(accounts, min(len(accounts), 1000))
+    users = itertools.cycle([discord_id for discord_id, _ in sample])
+    fragments = itertools.cycle([username.split("] ")[-1][:6] for _, username in sample])
+    cache = facade.leaderboard_cache
+    # Classement servi depuis la mémoire s'il en existe un, sinon hydra/brutal (SQLite)
+    keys = [("hydra", "brutal")] + [(boss, difficulty) for boss, info in BOSS_CONFIG.items()
+                                    for difficulty in (info['difficulties'] or [None])]
+    boss_type, difficulty = next((key for key in keys if cache.is_cached(*key)), ("hydra", "brutal"))
+    board_path = "memory" if cache.is_cached(boss_type, difficulty) else "sqlite"
+    name_path = "memory" if facade.username_index.warmed else "sqlite"
+    # Hors cache, le rang global est servi par tranches (mémoire + reste de tranche en SQLite)
+    rank_path = "buckets" if cache.get_rank_buckets(boss_type, difficulty) else board_path
+    run = loop.run_until_complete
+
+    return {
+        "facade_get_leaderboard": (board_path, lambda: run(facade.get_leaderboard(boss_type, difficulty, 10))),
+        "facade_get_leaderboard_clan": (board_path, lambda: run(facade.get_leaderboard(boss_type, difficulty, 10, "RTF"))),
+        "facade_get_user_rank": (rank_path, lambda: run(facade.get_user_rank(next(users), boss_type, difficulty))),
+        "facade_find_user_by_name": (name_path, lambda: run(facade.find_user_by_name(next(fragments)))),
+    }
+
+def warmed_facade(db, loop):
+    """Façade asynchrone avec les trois index chargés comme au démarrage du bot"""
+    facade = AsyncDatabaseManager(db)
+    loop.run_until_complete(facade.warm_leaderboard_cache())
+    loop.run_until_complete(facade.warm_username_index())
+    loop.run_until_complete(facade.warm_screenshot_index())
+    return facade
+
+def template_path(label, users):
+    """Base de référence générée une fois par taille, puis copiée à chaque exécution"""
+    path = os.path.join(DATA_DIR, f"bench_{label}.db")
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print(f"[INFO] Génération de la base synthétique {label} ({users} utilisateurs)...")
+        start = time.perf_counter()
+        build_database(path, users)
+        print(f"[OK] Base {label} générée en {time.perf_counter() - start:.1f}s")
+    return path
+
+def index_memory(db):
+    """Mémoire réellement occupée par les index chargés au démarrage, comparée au budget commun"""
+    async def warm():
+        facade = AsyncDatabaseManager(db)
+        tracemalloc.start()
+        try:
+            await facade.warm_leaderboard_cache()
+            await facade.warm_username_index()
+            await facade.warm_screenshot_index()
+            traced = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+            facade.shutdown()
+        return traced, facade.memory_budget.used
+
+    traced, reserved = asyncio.run(warm())
+    return {
+        "traced_mb": round(traced / 2 ** 20, 1),
+        "reserved_mb": round(reserved / 2 ** 20, 1),
+        "budget_mb": INDEX_MEMORY_BUDGET_MB,
+        "within_budget": traced <= INDEX_MEMORY_BUDGET_MB * 2 ** 20,
+    }
+
+def run_size(label, users, repeat):
+    template = template_path(label, users)
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    try:
+        # Copie de travail : les écritures ne modifient jamais la base de référence
+        path = os.path.join(workdir, "bench.db")
+        shutil.copyfile(template, path)
+        accounts = load_accounts(path)
+        pool = ConnectionPool(path)
+        try:
+            db = DatabaseManager(pool=pool)
+            mercy = MercyManager(pool=pool)
+            results = {}
+            memory = results[f"{label}/index_memory"] = index_memory(db)
+            status = "[OK]" if memory["within_budget"] else "[ERREUR]"
+            print(f"{status} {label} index chargés: {memory['traced_mb']} Mo mesurés, "
+                  f"{memory['reserved_mb']} Mo réservés, budget {memory['budget_mb']} Mo")
+            for name, func in database_benchmarks(db, mercy, accounts).items():
+                results[f"{label}/{name}"] = measure(func, repeat)
+                print(f"  {label:>5} {name:<28} {results[f'{label}/{name}']['median_us']:>12.1f} µs")
+
+            # Même chemin que les commandes : mémoire d'abord, SQLite pour ce qui n'a pas tenu dans le budget
+            loop = asyncio.new_event_loop()
+            facade = warmed_facade(db, loop)
+            try:
+                for name, (path, func) in facade_benchmarks(facade, loop, accounts).items():
+                    result = results[f"{label}/{name}"] = dict(measure(func, repeat), path=path)
+                    print(f"  {label:>5} {name:<28} {result['median_us']:>12.1f} µs ({path})")
+            finally:
+                facade.shutdown()
+                loop.close()
+            return results
+        finally:
+            pool.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(__file__), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de la base et des helpers")
+    parser.add_argument("--sizes", nargs="+", default=["1k", "100k"], choices=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=None, help="Fichier JSON de résultats (défaut: horodaté dans benchmarks/data)")
+    args = parser.parse_args()
+
+    results = {}
+    for name, func in helper_benchmarks().items():
+        results[f"helpers/{name}"] = measure(func, args.repeat)
+        print(f"  helpers {name:<24} {results[f'helpers/{name}']['median_us']:>10.3f} µs")
+    for label in args.sizes:
+        results.update(run_size(label, SIZES[label], args.repeat))
+
+    report = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(DATA_DIR, f"results_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[OK] Résultats enregistrés dans {output}")
+    # Code de sortie non nul si les index dépassent le budget mémoire commun
+    over = [name for name, result in results.items() if name.endswith("/index_memory") and not result["within_budget"]]
+    if over:
+        print(f"[ERREUR] Budget mémoire des index dépassé: {', '.join(over)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Génération de bases synthétiques (utilisateurs, PB, compteurs de mercy) pour les benchmarks"""
+import os
+import random
+from config import BOSS_CONFIG, CLAN_CONFIG
+from utils.ConnectionPool_class import ConnectionPool
+from utils.DatabaseManager_class import DatabaseManager, _difficulty_key
+from utils.MercyManager_class import MercyManager, MERCY_RULES
+from utils.helpers import get_user_clan
+
+SYLLABLES = ["ka", "ri", "to", "ne", "mo", "sha", "dra", "lu", "vex", "zor", "an", "el", "gor", "thi", "mar", "qu"]
+CLAN_SHARE = 0.6       # Part des utilisateurs portant un tag de clan
+PB_PER_USER = (1, 8)   # Nombre de PB par utilisateur (bornes incluses)
+BATCH_SIZE = 50_000    # Lignes par executemany
+
+def make_username(rng, index):
+    """Pseudo réaliste et unique, avec tag de clan pour une partie des utilisateurs"""
+    name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+    name = f"{name}{index}"
+    if rng.random() < CLAN_SHARE:
+        name = f"[{rng.choice(list(CLAN_CONFIG))}] {name}"
+    return name
+
+def _pb_keys():
+    return [(boss, _difficulty_key(difficulty))
+            for boss, info in BOSS_CONFIG.items() for difficulty in (info['difficulties'] or [None])]
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def build_database(path, users, seed=42):
+    """Crée une base de `users` utilisateurs via DatabaseManager/MercyManager (schéma et migrations réels)
+
+    Les lignes sont insérées en masse : update_user_pb un par un prendrait des heures pour 1M d'utilisateurs.
+    Retourne la liste des (discord_id, username).
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    pool = ConnectionPool(path)
+    DatabaseManager(pool=pool)
+    MercyManager(pool=pool)
+
+    accounts = [(str(100_000_000_000_000_000 + i), make_username(rng, i)) for i in range(users)]
+    keys = _pb_keys()
+    shard_types = list(MERCY_RULES)
+
+    def user_rows():
+        for discord_id, username in accounts:
+            yield discord_id, username, get_user_clan(username), rng.randint(1, 20)
+
+    def pb_rows():
+        for discord_id, username in accounts:
+            clan = get_user_clan(username)
+            for boss, difficulty in rng.sample(keys, rng.randint(*PB_PER_USER)):
+                # Dégâts log-normaux : beaucoup de PB moyens, quelques très gros
+                damage = int(rng.lognormvariate(16, 1.2))
+                yield discord_id, boss, difficulty, damage, None, "2024-01-01 12:00:00", clan
+
+    def mercy_rows():
+        for discord_id, _ in accounts:
+            for shard_type in rng.sample(shard_types, rng.randint(0, 3)):
+                yield discord_id, shard_type, rng.randint(0, MERCY_RULES[shard_type]['threshold'])
+
+    with pool.writer() as conn:
+        for batch in _batches(user_rows()):
+            conn.executemany(
+                'INSERT INTO users (discord_id, discord_username, clan, total_attempts) VALUES (?, ?, ?, ?)', batch
+            )
+        for batch in _batches(pb_rows()):
+            conn.executemany(
+                'INSERT INTO pb_records (discord_id, boss_type, difficulty, damage, screenshot, date, clan) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', batch
+            )
+        for batch in _batches(mercy_rows()):
+            conn.executemany('INSERT INTO mercy_counters (user_id, shard_type, pulls) VALUES (?, ?, ?)', batch)
+    pool.close()
+    return accounts
+
+def load_accounts(path):
+    """Relit les (discord_id, username) d'une base déjà générée"""
+    pool = ConnectionPool(path, readers=1)
+    try:
+        with pool.reader() as conn:
+            return conn.execute('SELECT discord_id, discord_username FROM users ORDER BY id').fetchall()
+    finally:
+        pool.close()
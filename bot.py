@@ -8,26 +8,16 @@ from config import DISCORD_TOKEN
 from utils.DatabaseManager_class import DatabaseManager
 from utils.ScreenshotManager_class import ScreenshotManager
 from utils.MercyManager_class import MercyManager
-from utils.pb_handler import set_managers
+from utils.AsyncDatabaseManager_class import AsyncDatabaseManager
+from utils.AsyncMercyManager_class import AsyncMercyManager
+from utils.ConnectionPool_class import ConnectionPool
+from utils.pb_handler import set_managers, submission_pipeline
 from utils.leaderboard_handler import set_db_manager
 
-# Force UTF-8
-
-os.environ["PYTHONIOENCODING"] = "utf-8"
-sys.stdout.reconfigure(encoding='utf-8')
-
 # Définir les intents
 intents = discord.Intents.default()
 intents.message_content = True
-
-# Initialisation des managers
-db_manager = DatabaseManager()
-screenshot_manager = ScreenshotManager()
-mercy_manager = MercyManager()
-
-# Injection des managers dans les handlers
-set_managers(db_manager, screenshot_manager)  # pb_handler
-set_db_manager(db_manager)                    # leaderboard_handler
+intents.members = True  # Synchronisation des pseudos (on_member_update + cache des membres)
 
 # Liste des cogs
 initial_cogs = [
@@ -37,7 +27,11 @@ initial_cogs = [
     "cogs.pbcvc",
     "cogs.top10",
     "cogs.mystats",
+    "cogs.rank",
     "cogs.mercy",
+    "cogs.maintenance",
+    "cogs.membersync",
+    "cogs.liveboard",
 ]
 
 # Liste des dossiers
@@ -55,18 +49,26 @@ folders = [
     "screenshots/cvc",
 ]
 
-# Création des dossiers si nécessaire (exist_ok=True évite d'écraser)
-for f in folders:
-    os.makedirs(f, exist_ok=True)
-
 class MyBot(commands.Bot):
     def __init__(self):
         super().__init__(command_prefix="!", intents=intents)
-        self.db_manager = db_manager
-        self.screenshot_manager = screenshot_manager
-        self.mercy_manager = mercy_manager
+        # Initialisation des managers (connexions SQLite partagées, façades asynchrones)
+        self.db_pool = ConnectionPool()
+        self.db_manager = AsyncDatabaseManager(DatabaseManager(pool=self.db_pool))
+        self.screenshot_manager = ScreenshotManager()
+        self.mercy_manager = AsyncMercyManager(MercyManager(pool=self.db_pool), self.db_manager.executor)
+
+        # Injection des managers dans les handlers
+        set_managers(self.db_manager, self.screenshot_manager)  # pb_handler
+        set_db_manager(self.db_manager)                         # leaderboard_handler
 
     async def setup_hook(self):
+        await self.db_manager.warm_leaderboard_cache()
+        await self.db_manager.warm_username_index()
+        await self.db_manager.warm_screenshot_index()
+        await self.screenshot_manager.start()
+        submission_pipeline.start()
+
         for cog in initial_cogs:
             try:
                 await self.load_extension(cog)
@@ -74,8 +76,30 @@ class MyBot(commands.Bot):
             except Exception as e:
                 print(f"[ERREUR] Impossible de charger {cog}: {e}")
 
+    async def close(self):
+        await super().close()
+        await submission_pipeline.close()
+        await self.screenshot_manager.close()
+        await self.mercy_manager.flush_events()
+        self.db_manager.shutdown()
+        self.db_pool.close()
+
     async def on_ready(self):
         print(f"{self.user.name} est connecté !")
 
-bot = MyBot()
-bot.run(DISCORD_TOKEN)
+def main():
+    # Force UTF-8
+    os.environ["PYTHONIOENCODING"] = "utf-8"
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    # Création des dossiers si nécessaire (exist_ok=True évite d'écraser)
+    for f in folders:
+        os.makedirs(f, exist_ok=True)
+
+    bot = MyBot()
+    bot.run(DISCORD_TOKEN)
+
+# Garde nécessaire : les processus de traitement d'images ré-importent ce module sans rien
+# initialiser (ni base, ni managers, ni dossiers)
+if __name__ == "__main__":
+    main()
@@ -65,6 +65,9 @@ class Guide(commands.Cog):
             value="`!mercy show` - Show your current mercy pulls\n"
                   "`!mercy add <nb> <type>` - Add pulls to a shard type\n"
                   "`!mercy reset <type>` - Reset pulls for a shard type\n"
+                  "`!mercy forecast <type> [pulls]` - Shards needed for 50/75/90/99% chance\n"
+                  "`!mercy stats` - Your drop history\n"
+                  "`!mercy community <type> [clan]` - Community drop statistics\n"
                   "**Available types:** ancient, void, sacred, primal, remnant",
             inline=False
         )
@@ -74,7 +77,9 @@ class Guide(commands.Cog):
             name="🌍 Global Leaderboards",
             value="`!top10hydra <difficulty>` - Global Hydra rankings\n"
                   "`!top10chimera <difficulty>` - Global Chimera rankings\n"
-                  "`!top10cvc` - Global CvC rankings",
+                  "`!top10cvc` - Global CvC rankings\n"
+                  "`!top10all <hydra|chimera> [clan]` - Every difficulty at once\n"
+                  "`!liveboard <boss> [difficulty] [clan]` - Pinned live leaderboard (moderators)",
             inline=False
         )
 
@@ -92,6 +97,7 @@ class Guide(commands.Cog):
             name="📈 Stats & Info",
             value="`!mystats` - View all your PBs\n"
                   "`!mystats <username>` - View someone's PBs\n"
+                  "`!rank <boss> <difficulty> [user]` - Rank & percentile\n"
                   "`!guide` - Show this help message",
             inline=False
         )
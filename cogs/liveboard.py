@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+import discord
+from datetime import datetime, timezone
+from discord.ext import commands, tasks
+from config import AUTHORIZED_CHANNEL_ID, BOSS_CONFIG, CLAN_CONFIG, LEADERBOARD_PAGE_SIZE, LIVE_BOARD_UPDATE_SECONDS
+from utils.helpers import normalize_difficulty, get_difficulty_display_name, get_user_clan
+from utils.leaderboard_handler import get_first_page
+
+class LiveBoard(commands.Cog):
+    """Classements épinglés mis à jour automatiquement (éditions groupées par intervalle)"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.boards = {}  # message_id -> (channel_id, boss_type, difficulty, clan)
+        self.dirty = set()  # message_id à rééditer au prochain passage
+        self.shown = {}  # message_id -> discord_id affichés au dernier rendu
+
+    async def cog_load(self):
+        for message_id, channel_id, boss_type, difficulty, clan in await self.bot.db_manager.get_live_boards():
+            self.boards[message_id] = (channel_id, boss_type, difficulty, clan)
+        # Rafraîchissement complet après un redémarrage
+        self.dirty.update(self.boards)
+        self.refresh_boards.start()
+
+    async def cog_unload(self):
+        self.refresh_boards.cancel()
+
+    async def _render(self, boss_type, difficulty, clan):
+        """(discord_id affichés, embed) du classement (première page partagée avec les commandes !top10)"""
+        rows, _, embed = await get_first_page(boss_type, difficulty, clan)
+        if embed is None:
+            difficulty_name = get_difficulty_display_name(difficulty) if difficulty else ""
+            clan_text = f" {clan}" if clan else ""
+            embed = discord.Embed(
+                title=f"🏆{clan_text} {difficulty_name} {BOSS_CONFIG[boss_type]['name']} Leaderboard".replace("  ", " "),
+                description="No records yet!",
+                color=BOSS_CONFIG[boss_type]['color']
+            )
+        # Marqueur en pied de page : la description ("No records yet!") reste visible
+        footer = embed.footer.text
+        embed.set_footer(text=f"🔴 Live leaderboard • {footer}" if footer else "🔴 Live leaderboard")
+        embed.timestamp = datetime.now(timezone.utc)
+        return {row[0] for row in rows or []}, embed
+
+    @commands.Cog.listener()
+    async def on_pb_update(self, user_id, username, boss_type, difficulty):
+        """Un nouveau PB ne marque que les classements dont il modifie le top"""
+        if not self.boards:
+            return
+        clan = get_user_clan(username)
+        for message_id, (_, board_boss, board_difficulty, board_clan) in list(self.boards.items()):
+            if (board_boss, board_difficulty) != (boss_type, difficulty) or board_clan not in (None, clan):
+                continue
+            rank = await self.bot.db_manager.get_user_rank(user_id, boss_type, difficulty, board_clan)
+            if rank and rank[0] <= LEADERBOARD_PAGE_SIZE:
+                self.dirty.add(message_id)
+
+    @commands.Cog.listener()
+    async def on_usernames_update(self, renamed):
+        """Pseudos renommés [(discord_id, username), ...] : classements où ils apparaissent ou entrent (clan)"""
+        renamed_ids = {discord_id for discord_id, _ in renamed}
+        for message_id, (_, boss_type, difficulty, clan) in list(self.boards.items()):
+            if message_id in self.dirty:
+                continue
+            if self.shown.get(message_id, set()) & renamed_ids:
+                self.dirty.add(message_id)
+                continue
+            if not clan:
+                continue
+            # Nouveau tag de clan : l'utilisateur peut entrer dans le top du classement de ce clan
+            for discord_id, username in renamed:
+                if get_user_clan(username) != clan:
+                    continue
+                rank = await self.bot.db_manager.get_user_rank(discord_id, boss_type, difficulty, clan)
+                if rank and rank[0] <= LEADERBOARD_PAGE_SIZE:
+                    self.dirty.add(message_id)
+                    break
+
+    @tasks.loop(seconds=LIVE_BOARD_UPDATE_SECONDS)
+    async def refresh_boards(self):
+        """Une seule édition par classement modifié et par intervalle (limites de débit Discord)"""
+        dirty, self.dirty = self.dirty, set()
+        for message_id in dirty:
+            board = self.boards.get(message_id)
+            if board is None:
+                continue
+            channel_id, boss_type, difficulty, clan = board
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                continue
+            try:
+                shown, embed = await self._render(boss_type, difficulty, clan)
+                await channel.get_partial_message(message_id).edit(embed=embed)
+                self.shown[message_id] = shown
+            except discord.NotFound:
+                # Message supprimé à la main : on oublie le classement
+                self.boards.pop(message_id, None)
+                self.shown.pop(message_id, None)
+                await self.bot.db_manager.remove_live_board(message_id)
+                print(f"[INFO] Classement en direct {message_id} introuvable, supprimé")
+            except Exception as e:
+                self.dirty.add(message_id)
+                print(f"[ERREUR] Mise à jour du classement en direct {message_id}: {e}")
+
+    @refresh_boards.before_loop
+    async def before_refresh(self):
+        await self.bot.wait_until_ready()
+
+    @commands.command(name="liveboard")
+    @commands.has_permissions(manage_messages=True)
+    async def liveboard(self, ctx, boss_type: str = None, arg1: str = None, arg2: str = None):
+        """Commande !liveboard <boss> [difficulty] [clan] | !liveboard remove <message_id>"""
+        if ctx.channel.id != AUTHORIZED_CHANNEL_ID:
+            return
+
+        boss_type = boss_type.lower() if boss_type else None
+
+        # ----- REMOVE -----
+        if boss_type == "remove":
+            if not (arg1 and arg1.isdigit()) or int(arg1) not in self.boards:
+                await ctx.send("⚠️ Usage: `!liveboard remove <message_id>` (message must be a live board)")
+                return
+            message_id = int(arg1)
+            self.boards.pop(message_id)
+            self.dirty.discard(message_id)
+            self.shown.pop(message_id, None)
+            await self.bot.db_manager.remove_live_board(message_id)
+            try:
+                await ctx.channel.get_partial_message(message_id).unpin()
+            except discord.HTTPException:
+                pass
+            await ctx.send("🧾 Live board removed.")
+            return
+
+        # ----- CREATE -----
+        if boss_type not in BOSS_CONFIG:
+            await ctx.send(
+                "⚠️ Usage: `!liveboard <boss> [difficulty] [clan]` or `!liveboard remove <message_id>`\n"
+                f"**Bosses:** {' | '.join(BOSS_CONFIG.keys())}"
+            )
+            return
+
+        difficulties = BOSS_CONFIG[boss_type]['difficulties']
+        if difficulties:
+            difficulty = normalize_difficulty(arg1)
+            if difficulty not in difficulties:
+                await ctx.send(f"⚠️ Please specify difficulty: `!liveboard {boss_type} <difficulty> [clan]`\n**Available:** {' | '.join(difficulties)}")
+                return
+            clan = arg2
+        else:
+            difficulty = None
+            clan = arg1
+        clan = clan.upper() if clan else None
+        if clan and clan not in CLAN_CONFIG:
+            await ctx.send(f"⚠️ Invalid clan. Available: {', '.join(CLAN_CONFIG.keys())}")
+            return
+
+        shown, embed = await self._render(boss_type, difficulty, clan)
+        message = await ctx.send(embed=embed)
+        await self.bot.db_manager.add_live_board(message.id, ctx.channel.id, boss_type, difficulty, clan)
+        self.boards[message.id] = (ctx.channel.id, boss_type, difficulty, clan)
+        self.shown[message.id] = shown
+        try:
+            await message.pin()
+        except discord.HTTPException as e:
+            print(f"[ERREUR] Impossible d'épingler le classement en direct: {e}")
+
+async def setup(bot):
+    await bot.add_cog(LiveBoard(bot))
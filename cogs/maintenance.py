@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import discord
+from discord.ext import commands, tasks
+from config import AUTHORIZED_CHANNEL_ID, SWEEP_INTERVAL_HOURS
+from utils.ScreenshotSweeper_class import ScreenshotSweeper
+
+class Maintenance(commands.Cog):
+    """Tâches de fond : nettoyage des screenshots orphelins, hash perceptuels manquants"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.sweeper = ScreenshotSweeper(bot.db_manager.db_manager, bot.screenshot_manager)
+
+    async def cog_load(self):
+        self.sweep_screenshots.start()
+        self.backfill_screenshot_hashes.start()
+
+    async def cog_unload(self):
+        self.sweep_screenshots.cancel()
+        self.backfill_screenshot_hashes.cancel()
+
+    @tasks.loop(count=1)
+    async def backfill_screenshot_hashes(self):
+        """Au démarrage : hash perceptuel des screenshots de PB qui n'en ont pas encore (reprise incrémentale)"""
+        db_manager = self.bot.db_manager
+        hashed = 0
+        for discord_id, boss_type, difficulty, screenshot in await db_manager.get_unhashed_screenshots():
+            phash = await self.bot.screenshot_manager.compute_phash(screenshot, boss_type, difficulty)
+            if phash is not None:
+                await db_manager.record_screenshot_hash(screenshot, phash, discord_id, boss_type, difficulty)
+                hashed += 1
+        if hashed:
+            print(f"[OK] Hash perceptuels calculés pour {hashed} screenshots existants")
+
+    @tasks.loop(hours=SWEEP_INTERVAL_HOURS)
+    async def sweep_screenshots(self):
+        """Passage périodique du ramasse-miettes, hors de la boucle d'événements"""
+        try:
+            counters = await asyncio.to_thread(self.sweeper.sweep)
+            print(f"[OK] Nettoyage screenshots: {counters['orphans_deleted']} supprimés, "
+                  f"{counters['orphans_found']} orphelins vus, {counters['missing_files']} fichiers manquants")
+        except Exception as e:
+            print(f"[ERREUR] Nettoyage screenshots: {e}")
+
+    @sweep_screenshots.before_loop
+    async def before_sweep(self):
+        await self.bot.wait_until_ready()
+
+    @commands.command(name="sweepstats")
+    async def sweepstats(self, ctx):
+        """Affiche les compteurs du nettoyage des screenshots"""
+        if ctx.channel.id != AUTHORIZED_CHANNEL_ID:
+            return
+
+        counters = self.sweeper.counters
+        last_sweep = counters['last_sweep'].strftime("%Y-%m-%d %H:%M") if counters['last_sweep'] else "never"
+        duration = f"{counters['last_duration']:.1f}s" if counters['last_duration'] is not None else "-"
+
+        embed = discord.Embed(title="🧹 Screenshot Sweeper", color=0x00bfff)
+        embed.add_field(name="Sweeps", value=f"{counters['sweeps']} (last: {last_sweep}, {duration})", inline=False)
+        embed.add_field(name="Files scanned", value=str(counters['files_scanned']), inline=True)
+        embed.add_field(name="Orphans found", value=str(counters['orphans_found']), inline=True)
+        embed.add_field(name="Orphans deleted", value=str(counters['orphans_deleted']), inline=True)
+        embed.add_field(name="Space freed", value=f"{counters['bytes_freed'] / (1024 * 1024):.1f} MB", inline=True)
+        embed.add_field(name="Missing files", value=str(counters['missing_files']), inline=True)
+        embed.add_field(name="Errors", value=str(counters['errors']), inline=True)
+        if self.sweeper.dry_run:
+            embed.set_footer(text="Dry run: orphans are reported, not deleted")
+        await ctx.send(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(Maintenance(bot))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from discord.ext import commands, tasks
+from config import AUTHORIZED_CHANNEL_ID, USERNAME_SYNC_INTERVAL
+
+class MemberSync(commands.Cog):
+    """Synchronise pseudos et clans avec les membres du serveur (écritures groupées)"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def cog_load(self):
+        self.flush_usernames.start()
+
+    async def cog_unload(self):
+        self.flush_usernames.cancel()
+        await self._flush()
+
+    async def _flush(self):
+        """Écrit les pseudos en attente et signale les renommages (classements en direct)"""
+        renamed = await self.bot.db_manager.flush_usernames()
+        if renamed:
+            self.bot.dispatch("usernames_update", renamed)
+        return renamed
+
+    def _guild(self):
+        """Serveur du salon autorisé (seuls ses pseudos font foi)"""
+        channel = self.bot.get_channel(AUTHORIZED_CHANNEL_ID)
+        return channel.guild if channel else None
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        """Réconciliation au démarrage avec le cache des membres"""
+        guild = self._guild()
+        if guild is None:
+            return
+        queued = sum(
+            self.bot.db_manager.queue_username(member.id, member.display_name)
+            for member in guild.members
+        )
+        renamed = await self._flush()
+        if queued:
+            print(f"[OK] Pseudos réconciliés au démarrage: {len(renamed)}")
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        """Changement de surnom ou de pseudo : mis en attente, écrit au prochain flush"""
+        if before.display_name == after.display_name:
+            return
+        guild = self._guild()
+        if guild is None or after.guild.id != guild.id:
+            return
+        self.bot.db_manager.queue_username(after.id, after.display_name)
+
+    @commands.Cog.listener()
+    async def on_user_update(self, before, after):
+        """Changement du nom global : le surnom sur le serveur reste prioritaire"""
+        if before.display_name == after.display_name:
+            return
+        guild = self._guild()
+        member = guild.get_member(after.id) if guild else None
+        if member is not None:
+            self.bot.db_manager.queue_username(member.id, member.display_name)
+
+    @tasks.loop(seconds=USERNAME_SYNC_INTERVAL)
+    async def flush_usernames(self):
+        """Écriture groupée des changements de pseudo en attente"""
+        await self._flush()
+
+async def setup(bot):
+    await bot.add_cog(MemberSync(bot))
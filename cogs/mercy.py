@@ -1,18 +1,47 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import discord
-from discord.ext import commands
-from config import AUTHORIZED_CHANNEL_ID
-from utils.MercyManager_class import MercyManager
-from utils.helpers import calc_chance_and_guarantee
+from discord.ext import commands, tasks
+from config import AUTHORIZED_CHANNEL_ID, CLAN_CONFIG, MERCY_EVENT_FLUSH_SECONDS
+from utils.helpers import calc_chance_and_guarantee, get_user_clan
+from utils import mercy_forecast
 
 VALID_SHARDS = ["ancient", "void", "sacred", "primal", "remnant"]
+PRIMAL_SUBTYPES = ["primal_legendary", "primal_mythical"]
+
+def summarize_distribution(rows):
+    """Résumé d'une distribution [(drop_at, drops), ...] : total, moyenne, médiane, P10 et P90"""
+    total = sum(drops for _, drops in rows)
+    if not total:
+        return None
+    mean = sum(drop_at * drops for drop_at, drops in rows) / total
+    quantiles = {}
+    cumulative = 0
+    targets = [(10, total * 0.1), (50, total * 0.5), (90, total * 0.9)]
+    for drop_at, drops in rows:
+        cumulative += drops
+        while targets and cumulative >= targets[0][1]:
+            quantiles[targets.pop(0)[0]] = drop_at
+    return total, mean, quantiles
 
 class Mercy(commands.Cog):
     """Cog pour gérer les pulls de Mercy"""
 
     def __init__(self, bot):
         self.bot = bot
-        self.mercy_manager = MercyManager()
+        self.mercy_manager = bot.mercy_manager
+
+    async def cog_load(self):
+        self.flush_events.start()
+
+    async def cog_unload(self):
+        self.flush_events.cancel()
+        await self.mercy_manager.flush_events()
+
+    @tasks.loop(seconds=MERCY_EVENT_FLUSH_SECONDS)
+    async def flush_events(self):
+        """Écrit périodiquement les événements mercy tamponnés"""
+        await self.mercy_manager.flush_events()
 
     @commands.command(name="mercy")
     async def mercy(self, ctx, action: str = None, arg1: str = None, arg2: str = None):
@@ -20,10 +49,11 @@ class Mercy(commands.Cog):
             return
 
         user_id = str(ctx.author.id)
+        clan = get_user_clan(ctx.author.display_name)
 
         # ----- SHOW -----
         if action == "show":
-            pulls_dict = self.mercy_manager.get_all_pulls(user_id)
+            pulls_dict = await self.mercy_manager.get_all_pulls(user_id)
             if not pulls_dict:
                 await ctx.send("ℹ️ You don't have any mercy data yet.")
                 return
@@ -35,7 +65,7 @@ class Mercy(commands.Cog):
 
             for shard_type, pulls in pulls_dict.items():
                 if shard_type == "primal":
-                    for sub_type in ["primal_legendary", "primal_mythical"]:
+                    for sub_type in PRIMAL_SUBTYPES:
                         sub_pulls = pulls_dict.get(sub_type, 0)
                         chance, guaranteed_at, remaining = calc_chance_and_guarantee(sub_type, sub_pulls)
                         guaranteed_text = f" (Guaranteed at {guaranteed_at} pulls, {remaining} remaining)" if guaranteed_at else ""
@@ -70,13 +100,13 @@ class Mercy(commands.Cog):
 
             if shard_type == "primal":
                 messages = []
-                for sub_type in ["primal_legendary", "primal_mythical"]:
-                    new_pulls = self.mercy_manager.add_pulls(user_id, sub_type, pulls_to_add)
+                totals = await self.mercy_manager.add_pulls_many(user_id, PRIMAL_SUBTYPES, pulls_to_add)
+                for sub_type, new_pulls in totals.items():
                     chance, guaranteed_at, remaining = calc_chance_and_guarantee(sub_type, new_pulls)
                     messages.append(f"✅ Added {pulls_to_add} pulls to **{sub_type.replace('_', ' ').title()}**: {new_pulls}/{guaranteed_at} → {chance:.1f}% ({remaining} remaining)")
                 await ctx.send("\n".join(messages))
             else:
-                new_pulls = self.mercy_manager.add_pulls(user_id, shard_type, pulls_to_add)
+                new_pulls = await self.mercy_manager.add_pulls(user_id, shard_type, pulls_to_add)
                 chance, guaranteed_at, remaining = calc_chance_and_guarantee(shard_type, new_pulls)
                 await ctx.send(f"✅ Added {pulls_to_add} pulls to **{shard_type}** mercy. Now: **{new_pulls}/{guaranteed_at}** pulls → {chance:.1f}% chance ({remaining} remaining)")
 
@@ -87,15 +117,15 @@ class Mercy(commands.Cog):
 
             if shard_type == "primal":
                 if sub_type == "legendary":
-                    self.mercy_manager.reset_pulls(user_id, "primal_legendary")
+                    await self.mercy_manager.reset_pulls(user_id, "primal_legendary", clan)
                     await ctx.send("🧾 Mercy for Primal Legendary has been reset.")
                 elif sub_type == "mythical":
-                    self.mercy_manager.reset_pulls(user_id, "primal_mythical")
+                    await self.mercy_manager.reset_pulls(user_id, "primal_mythical", clan)
                     await ctx.send("🧾 Mercy for Primal Mythical has been reset.")
                 elif sub_type is None:
                     messages = []
-                    for s in ["primal_legendary", "primal_mythical"]:
-                        self.mercy_manager.reset_pulls(user_id, s)
+                    await self.mercy_manager.reset_pulls_many(user_id, PRIMAL_SUBTYPES, clan)
+                    for s in PRIMAL_SUBTYPES:
                         messages.append(f"🧾 Mercy for {s.replace('_', ' ').title()} has been reset.")
                     await ctx.send("\n".join(messages))
                 else:
@@ -104,12 +134,102 @@ class Mercy(commands.Cog):
                 if shard_type not in VALID_SHARDS:
                     await ctx.send(f"❌ Invalid shard type. Available: {', '.join(VALID_SHARDS)}")
                     return
-                self.mercy_manager.reset_pulls(user_id, shard_type)
+                await self.mercy_manager.reset_pulls(user_id, shard_type, clan)
                 await ctx.send(f"🧾 Mercy for **{shard_type}** has been reset.")
 
+        # ----- FORECAST -----
+        elif action == "forecast" and arg1:
+            shard_type = arg1.lower()
+            if shard_type not in VALID_SHARDS:
+                await ctx.send(f"❌ Invalid shard type. Available: {', '.join(VALID_SHARDS)}")
+                return
+            if not mercy_forecast.is_available():
+                await ctx.send("⚠️ Forecast is not available on this bot.")
+                return
+
+            pulls_override = None
+            if arg2:
+                try:
+                    pulls_override = int(arg2)
+                except ValueError:
+                    await ctx.send("❌ Number of pulls must be an integer.")
+                    return
+                if pulls_override < 0:
+                    await ctx.send("❌ Number of pulls cannot be negative.")
+                    return
+
+            sub_types = PRIMAL_SUBTYPES if shard_type == "primal" else [shard_type]
+            embed = discord.Embed(
+                title=f"🔮 Mercy Forecast for {ctx.author.display_name}",
+                description="Shards needed before the next drop (Monte Carlo simulation)",
+                color=0x00bfff
+            )
+            for sub_type in sub_types:
+                pulls = pulls_override if pulls_override is not None else await self.mercy_manager.get_pulls(user_id, sub_type)
+                # Simulation hors de la boucle d'événements (instantané si déjà mémorisée)
+                result = await asyncio.to_thread(mercy_forecast.forecast, sub_type, max(0, pulls))
+                percentiles = " • ".join(
+                    f"{p}%: **{shards}**" for p, shards in result['percentiles'].items()
+                )
+                embed.add_field(
+                    name=f"{sub_type.replace('_', ' ').title()} ({pulls} pulls)",
+                    value=f"{percentiles}\nExpected: **{result['expected']:.1f}** shards • Guaranteed within **{result['worst_case']}**",
+                    inline=False
+                )
+            await ctx.send(embed=embed)
+
+        # ----- STATS -----
+        elif action == "stats":
+            stats = await self.mercy_manager.get_user_stats(user_id)
+            if not stats:
+                await ctx.send("ℹ️ You don't have any mercy history yet.")
+                return
+
+            embed = discord.Embed(
+                title=f"📊 Mercy History for {ctx.author.display_name}",
+                color=0x00bfff
+            )
+            for shard_type, (pulls_logged, drops, drop_pulls_sum, best_drop, worst_drop) in sorted(stats.items()):
+                if drops:
+                    value = (f"Pulls logged: **{pulls_logged}** • Drops: **{drops}**\n"
+                             f"Average drop at **{drop_pulls_sum / drops:.1f}** • Best: **{best_drop}** • Worst: **{worst_drop}**")
+                else:
+                    value = f"Pulls logged: **{pulls_logged}** • No drop recorded yet"
+                embed.add_field(name=shard_type.replace("_", " ").title(), value=value, inline=False)
+            await ctx.send(embed=embed)
+
+        # ----- COMMUNITY -----
+        elif action == "community" and arg1:
+            shard_type = arg1.lower()
+            if shard_type not in VALID_SHARDS:
+                await ctx.send(f"❌ Invalid shard type. Available: {', '.join(VALID_SHARDS)}")
+                return
+            clan_filter = arg2.upper() if arg2 else None
+            if clan_filter and clan_filter not in CLAN_CONFIG:
+                await ctx.send(f"❌ Invalid clan. Available: {', '.join(CLAN_CONFIG.keys())}")
+                return
+
+            scope = CLAN_CONFIG[clan_filter]['name'] if clan_filter else "Community"
+            embed = discord.Embed(
+                title=f"🌍 {scope} Mercy Drops - {shard_type.title()}",
+                description="Pull count at which drops happened (from `!mercy reset`)",
+                color=CLAN_CONFIG[clan_filter]['color'] if clan_filter else 0x00bfff
+            )
+            sub_types = PRIMAL_SUBTYPES if shard_type == "primal" else [shard_type]
+            for sub_type in sub_types:
+                summary = summarize_distribution(await self.mercy_manager.get_drop_distribution(sub_type, clan_filter))
+                if summary:
+                    total, mean, quantiles = summary
+                    value = (f"Drops: **{total}** • Average: **{mean:.1f}** pulls\n"
+                             f"P10: **{quantiles[10]}** • Median: **{quantiles[50]}** • P90: **{quantiles[90]}**")
+                else:
+                    value = "No drop recorded yet"
+                embed.add_field(name=sub_type.replace("_", " ").title(), value=value, inline=False)
+            await ctx.send(embed=embed)
+
         # ----- HELP -----
         else:
-            await ctx.send("ℹ️ Usage: `!mercy add <nb> <type>`, `!mercy reset <type> [subtype]`, `!mercy show`")
+            await ctx.send("ℹ️ Usage: `!mercy add <nb> <type>`, `!mercy reset <type> [subtype]`, `!mercy show`, `!mercy forecast <type> [pulls]`, `!mercy stats`, `!mercy community <type> [clan]`")
 
 
 async def setup(bot):
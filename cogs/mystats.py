@@ -2,8 +2,8 @@
 import discord
 from discord.ext import commands
 from config import AUTHORIZED_CHANNEL_ID, BOSS_CONFIG
-from utils.helpers import format_damage_display, format_date_only
-from utils.pb_handler import db_manager  # Assurez-vous que db_manager est initialisé correctement
+from utils.helpers import format_damage_display, format_date_only, format_rank
+from utils.pb_handler import resolve_target_user
 
 class MyStats(commands.Cog):
     """Cog pour afficher tous les PB d'un utilisateur"""
@@ -18,15 +18,24 @@ class MyStats(commands.Cog):
             return
 
         try:
-            username = target_user if target_user else ctx.author.id
-            user_data = db_manager.get_user_all_pbs(username)
+            target = await resolve_target_user(ctx, target_user or ctx.author.display_name)
+            if not target:
+                return
+            user_id, display_name = target
+            user_data = await self.bot.db_manager.get_user_all_pbs(user_id)
 
             if not user_data:
-                await ctx.send(f"❌ No data found for **{ctx.author.display_name}**.")
+                await ctx.send(f"❌ No data found for **{display_name}**.")
                 return
 
+            # Rangs servis par l'index en mémoire (un bisect par PB)
+            boss_keys = [('hydra', d) for d in BOSS_CONFIG['hydra']['difficulties']]
+            boss_keys += [('chimera', d) for d in BOSS_CONFIG['chimera']['difficulties']]
+            boss_keys.append(('cvc', None))
+            ranks = await self.bot.db_manager.get_user_ranks(user_id, boss_keys)
+
             embed = discord.Embed(
-                title=f"📊 {ctx.author.display_name}'s Complete Stats",
+                title=f"📊 {display_name}'s Complete Stats",
                 color=0x00bfff
             )
 
@@ -40,7 +49,8 @@ class MyStats(commands.Cog):
                     pb_value = user_data[pb_key]
                     pb_date = user_data.get(date_key)
                     date_text = f" • {format_date_only(pb_date)}" if pb_date else ""
-                    hydra_stats.append(f"**{difficulty.title()}:** {format_damage_display(pb_value)}{date_text}")
+                    rank_text = f" • {format_rank(*ranks[('hydra', difficulty)])}" if ('hydra', difficulty) in ranks else ""
+                    hydra_stats.append(f"**{difficulty.title()}:** {format_damage_display(pb_value)}{date_text}{rank_text}")
 
             hydra_text = "\n".join(hydra_stats) if hydra_stats else "No records"
             embed.add_field(name="⚔️ Hydra PBs", value=hydra_text, inline=False)
@@ -55,8 +65,9 @@ class MyStats(commands.Cog):
                     pb_value = user_data[pb_key]
                     pb_date = user_data.get(date_key)
                     date_text = f" • {format_date_only(pb_date)}" if pb_date else ""
-                    display_name = "Ultra Nightmare" if difficulty == "ultra" else difficulty.title()
-                    chimera_stats.append(f"**{display_name}:** {format_damage_display(pb_value)}{date_text}")
+                    rank_text = f" • {format_rank(*ranks[('chimera', difficulty)])}" if ('chimera', difficulty) in ranks else ""
+                    difficulty_name = "Ultra Nightmare" if difficulty == "ultra" else difficulty.title()
+                    chimera_stats.append(f"**{difficulty_name}:** {format_damage_display(pb_value)}{date_text}{rank_text}")
 
             chimera_text = "\n".join(chimera_stats) if chimera_stats else "No records"
             embed.add_field(name="🛡️ Chimera PBs", value=chimera_text, inline=False)
@@ -69,6 +80,8 @@ class MyStats(commands.Cog):
                 formatted_date = format_date_only(cvc_date)
                 if formatted_date:
                     cvc_text += f" • {formatted_date}"
+            if ('cvc', None) in ranks:
+                cvc_text += f" • {format_rank(*ranks[('cvc', None)])}"
             embed.add_field(name="🗡️ CvC PB", value=cvc_text, inline=False)
 
             # Total combiné
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import discord
+from discord.ext import commands
+from config import AUTHORIZED_CHANNEL_ID, BOSS_CONFIG, CLAN_CONFIG
+from utils.helpers import normalize_difficulty, get_difficulty_display_name, format_damage_display, format_rank, get_user_clan
+from utils.pb_handler import resolve_target_user
+
+class Rank(commands.Cog):
+    """Cog pour afficher le rang et le percentile d'un joueur"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name="rank")
+    async def rank(self, ctx, boss_type: str = None, arg1: str = None, arg2: str = None):
+        """Commande !rank <boss> <difficulty> [user] (!rank cvc [user] pour CvC)"""
+        if ctx.channel.id != AUTHORIZED_CHANNEL_ID:
+            return
+
+        boss_type = boss_type.lower() if boss_type else None
+        if boss_type not in BOSS_CONFIG:
+            await ctx.send(
+                f"⚠️ Usage: `!rank <boss> <difficulty> [user]` or `!rank cvc [user]`\n"
+                f"**Bosses:** {' | '.join(BOSS_CONFIG.keys())}"
+            )
+            return
+
+        boss_info = BOSS_CONFIG[boss_type]
+        difficulties = boss_info['difficulties']
+
+        try:
+            if difficulties:
+                difficulty = normalize_difficulty(arg1)
+                if difficulty not in difficulties:
+                    await ctx.send(f"⚠️ Please specify difficulty: `!rank {boss_type} <difficulty> [user]`\n**Available:** {' | '.join(difficulties)}")
+                    return
+                target_user = arg2
+            else:
+                difficulty = None
+                target_user = arg1
+
+            target = await resolve_target_user(ctx, target_user or ctx.author.display_name)
+            if not target:
+                return
+            user_id, display_name = target
+
+            db_manager = self.bot.db_manager
+            difficulty_name = get_difficulty_display_name(difficulty) if difficulty else ""
+            global_rank = await db_manager.get_user_rank(user_id, boss_type, difficulty)
+            if not global_rank:
+                await ctx.send(f"⚠️ No PB found for **{display_name}** on {difficulty_name} {boss_info['name']}.")
+                return
+
+            current_pb, _, _ = await db_manager.get_user_pb(user_id, boss_type, difficulty)
+            embed = discord.Embed(
+                title=f"🏆 {display_name}'s {difficulty_name} {boss_info['name']} Rank".replace("  ", " "),
+                description=f"**{format_damage_display(current_pb)} damage**",
+                color=boss_info['color']
+            )
+            embed.add_field(name="🌍 Global", value=format_rank(*global_rank), inline=True)
+
+            # Rang dans le clan si l'utilisateur en a un
+            clan = get_user_clan(display_name)
+            if clan:
+                clan_rank = await db_manager.get_user_rank(user_id, boss_type, difficulty, clan)
+                if clan_rank:
+                    clan_info = CLAN_CONFIG.get(clan, {'name': clan, 'emoji': '🏛️'})
+                    embed.add_field(name=f"{clan_info['emoji']} {clan_info['name']}", value=format_rank(*clan_rank), inline=True)
+
+            await ctx.send(embed=embed)
+
+        except Exception as e:
+            await ctx.send(f"⚠️ Error: {e}")
+
+async def setup(bot):
+    await bot.add_cog(Rank(bot))
@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 import discord
 from discord.ext import commands
-from utils.leaderboard_handler import show_leaderboard
+from utils.leaderboard_handler import show_leaderboard, show_all_leaderboards
 from utils.helpers import normalize_difficulty
-from config import BOSS_CONFIG
+from config import BOSS_CONFIG, CLAN_CONFIG
 
 class Top10(commands.Cog):
     """Cog regroupant toutes les commandes de leaderboard globales et par clan"""
@@ -32,6 +32,18 @@ class Top10(commands.Cog):
     async def top10cvc(self, ctx):
         await show_leaderboard(ctx, 'cvc')
 
+    @commands.command()
+    async def top10all(self, ctx, boss_type: str = None, clan: str = None):
+        """Toutes les difficultés d'un boss en un seul message"""
+        boss_type = boss_type.lower() if boss_type else None
+        clan = clan.upper() if clan else None
+        if boss_type not in ('hydra', 'chimera'):
+            await ctx.send("❌ Usage: `!top10all <hydra|chimera> [clan]`")
+        elif clan and clan not in CLAN_CONFIG:
+            await ctx.send(f"❌ Invalid clan. Available: {', '.join(CLAN_CONFIG.keys())}")
+        else:
+            await show_all_leaderboards(ctx, boss_type, clan)
+
     # --- Commandes par clan RTF ---
     @commands.command()
     async def rtfhydra(self, ctx, difficulty: str = None):
@@ -12,6 +12,64 @@ AUTHORIZED_CHANNEL_ID = int(os.getenv("AUTHORIZED_CHANNEL_ID"))
 SCREENSHOTS_BASE_PATH = "/app/screenshots"
 DATABASE_PATH = "/app/data/bot_data.db"
 
+# Base de données
+DB_MAX_WORKERS = 4  # Threads dédiés aux requêtes SQLite (hors boucle d'événements)
+DB_POOL_READERS = 4                 # Connexions de lecture persistantes (1 écrivain en plus)
+DB_CACHE_SIZE_KB = 4000             # Cache de pages par connexion (~4 Mo)
+DB_MMAP_SIZE = 0                    # Pas de mmap : chaque connexion compterait le fichier dans la RSS
+DB_BUSY_TIMEOUT = 5.0               # Secondes d'attente sur un verrou SQLite
+
+# Index chargés en mémoire au démarrage (classements, hash de screenshots, pseudos)
+INDEX_MEMORY_BUDGET_MB = 48             # Budget commun : un index qui ne rentre pas est servi par SQLite
+LEADERBOARD_CACHE_MAX_ENTRIES = 20_000  # Entrées max par boss/difficulté
+LEADERBOARD_RANK_BUCKETS = 512          # Tranches de dégâts des classements hors cache (rangs en mémoire)
+
+# Pagination des classements
+LEADERBOARD_PAGE_SIZE = 10
+LEADERBOARD_VIEW_TIMEOUT = 180  # Secondes avant désactivation des boutons
+LIVE_BOARD_UPDATE_SECONDS = 30  # Au plus une édition par classement en direct sur cet intervalle
+
+# Recherche de pseudos
+USERNAME_CACHE_SIZE = 1024        # Résolutions nom -> utilisateur mémorisées (LRU)
+USERNAME_FUZZY_THRESHOLD = 0.35   # Similarité minimale (trigrammes) pour une correspondance approchante
+USERNAME_SYNC_INTERVAL = 60       # Secondes entre deux écritures groupées des changements de pseudo
+
+# Téléchargement des screenshots
+SCREENSHOT_MAX_BYTES = 10 * 1024 * 1024  # Taille max acceptée (téléchargement interrompu au-delà)
+SCREENSHOT_CHUNK_SIZE = 64 * 1024        # Taille des blocs écrits sur disque
+SCREENSHOT_DOWNLOAD_TIMEOUT = 30         # Secondes
+SCREENSHOT_HTTP_CONNECTIONS = 8          # Connexions simultanées de la session partagée
+CDN_URL_EXPIRY_MARGIN = 3600             # Secondes : URL CDN considérée expirée un peu avant son échéance
+
+# File des soumissions de PB (téléchargements bornés, un seul écrivain en base)
+SUBMISSION_WORKERS = 3         # Soumissions traitées simultanément (téléchargement, traitement, envoi)
+SUBMISSION_QUEUE_SIZE = 50     # Soumissions en attente au-delà desquelles les nouvelles sont refusées
+SUBMISSION_QUEUED_EMOJI = "⏳"  # Réaction posée dès la mise en file
+
+# Traitement des screenshots (WebP compact + miniature, hors boucle d'événements)
+IMAGE_PROCESS_WORKERS = 1          # Processus dédiés au décodage/encodage
+SCREENSHOT_MAX_DIMENSION = 1920    # Plus grand côté en pixels
+SCREENSHOT_WEBP_QUALITY = 80
+SCREENSHOT_THUMBNAIL_SIZE = 320
+SCREENSHOT_KEEP_ORIGINAL = False   # Conserver l'original à côté de la version compacte
+SCREENSHOT_PHASH_MAX_DISTANCE = 6  # Bits différents (sur 64) en dessous desquels deux screenshots sont jugés identiques
+
+# Nettoyage des screenshots orphelins
+SWEEP_INTERVAL_HOURS = 6
+SWEEP_GRACE_SECONDS = 3600     # Fichiers plus récents ignorés (soumissions en cours)
+SWEEP_BATCH_SIZE = 500         # Noms vérifiés par requête
+SWEEP_MAX_DELETIONS = 200      # Suppressions max par passage
+SWEEP_DELETE_DELAY = 0.05      # Pause entre deux suppressions (secondes)
+SWEEP_DRY_RUN = False          # True : signaler sans supprimer
+
+# Mercy
+MERCY_CACHE_MAX_USERS = 5000   # Compteurs gardés en mémoire (LRU par utilisateur)
+MERCY_FORECAST_TRIALS = 200_000  # Trajectoires simulées par prévision
+MERCY_FORECAST_BATCH = 50_000    # Trajectoires par lot vectorisé (borne la mémoire)
+MERCY_FORECAST_CACHE_SIZE = 512  # Prévisions mémorisées par (shard, pulls actuels)
+MERCY_EVENT_BATCH_SIZE = 50      # Événements mercy tamponnés avant écriture
+MERCY_EVENT_FLUSH_SECONDS = 30   # Écriture périodique des événements en attente
+
 # Configuration des clans
 CLAN_CONFIG = {
     'RTF':  {'name': 'RTF',  'emoji': '🛡️', 'color': 0x00ff00},
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from config import DB_MAX_WORKERS, BOSS_CONFIG, SCREENSHOT_PHASH_MAX_DISTANCE
+from utils.LeaderboardCache_class import LeaderboardCache
+from utils.UsernameIndex_class import UsernameIndex
+from utils.ScreenshotHashIndex_class import ScreenshotHashIndex
+from utils.MemoryBudget_class import MemoryBudget
+from utils.RankBuckets_class import RankBuckets
+
+class AsyncDatabaseManager:
+    """Façade asynchrone du DatabaseManager : toutes les requêtes SQLite passent par un pool de threads dédié"""
+
+    def __init__(self, db_manager, executor=None):
+        self.db_manager = db_manager
+        # Pool borné partagé : SQLite ne tourne jamais sur la boucle d'événements
+        self.executor = executor or ThreadPoolExecutor(max_workers=DB_MAX_WORKERS, thread_name_prefix="sqlite")
+        # Un seul budget mémoire pour tous les index chargés au démarrage
+        self.memory_budget = MemoryBudget()
+        self.leaderboard_cache = LeaderboardCache(budget=self.memory_budget)
+        self.username_index = UsernameIndex(budget=self.memory_budget)
+        self.screenshot_index = ScreenshotHashIndex(budget=self.memory_budget)
+        self._pending_usernames = {}  # discord_id -> dernier pseudo vu (regroupés avant écriture)
+        self.data_version = 0  # Incrémenté à chaque changement visible dans les classements
+
+    async def _run(self, func, *args, **kwargs):
+        """Exécute une fonction synchrone dans le pool de threads de la base"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def warm_leaderboard_cache(self):
+        """Charge en mémoire les classements qui tiennent dans le budget (appelé depuis setup_hook)"""
+        sizes = await self._run(self.db_manager.get_pb_board_sizes)
+        keys = self.leaderboard_cache.plan(sizes)
+        rows = await self._run(self.db_manager.get_all_pb_records, keys)
+        self.leaderboard_cache.load(rows, keys)
+        print(f"[OK] Cache des classements chargé ({len(rows)} PB)")
+        # Classements hors cache : rang global par compteurs de tranches (quelques Ko chacun)
+        overflow = self.leaderboard_cache.overflow_keys()
+        if overflow:
+            buckets = await self._run(self._build_rank_buckets, overflow)
+            for key, rank_buckets in buckets.items():
+                self.leaderboard_cache.set_rank_buckets(key, rank_buckets)
+
+    def _build_rank_buckets(self, keys):
+        return {key: RankBuckets.from_damages(self.db_manager.get_board_damages(*key)) for key in keys}
+
+    async def warm_username_index(self):
+        """Charge tous les pseudos dans l'index de recherche (appelé depuis setup_hook)"""
+        count = await self._run(self.db_manager.count_users)
+        if not self.username_index.reserve(count):
+            print(f"[INFO] Index des pseudos hors budget ({count} utilisateurs) : recherche via SQLite")
+            return
+        rows = await self._run(self.db_manager.get_all_usernames)
+        self.username_index.load(rows)
+        print(f"[OK] Index des pseudos chargé ({len(rows)} utilisateurs)")
+
+    async def warm_screenshot_index(self):
+        """Charge les hash perceptuels dans l'index si le budget le permet (appelé depuis setup_hook)"""
+        count = await self._run(self.db_manager.count_screenshot_hashes)
+        if not self.screenshot_index.reserve(count):
+            print(f"[INFO] Index des screenshots hors budget mémoire ({count} hash) : recherche via SQLite")
+            return
+        rows = await self._run(self.db_manager.get_screenshot_hashes)
+        self.screenshot_index.load(rows)
+        print(f"[OK] Index des screenshots chargé ({len(rows)} hash)")
+
+    async def get_user_pb(self, user_id, boss_type, difficulty=None):
+        """Récupère le PB d'un utilisateur pour un boss et difficulté spécifique"""
+        return await self._run(self.db_manager.get_user_pb, user_id, boss_type, difficulty)
+
+    async def get_user_pb_record(self, user_id, boss_type, difficulty=None):
+        """Récupère (damage, screenshot, date, screenshot_url) d'un PB"""
+        return await self._run(self.db_manager.get_user_pb_record, user_id, boss_type, difficulty)
+
+    async def set_screenshot_url(self, user_id, boss_type, difficulty, screenshot, url):
+        """Mémorise l'URL CDN Discord d'un screenshot"""
+        return await self._run(self.db_manager.set_screenshot_url, user_id, boss_type, difficulty, screenshot, url)
+
+    async def update_user_pb(self, user_id, username, boss_type, damage, screenshot_filename, difficulty=None):
+        """Met à jour le PB d'un utilisateur et retourne l'ancien screenshot
+
+        Lève StalePBError (caches inchangés) si un PB supérieur a été enregistré entre-temps.
+        """
+        old_screenshot, old_damage = await self._run(
+            self.db_manager.write_user_pb, user_id, username, boss_type, damage, screenshot_filename, difficulty
+        )
+        # Écriture réussie : mise à jour incrémentale du cache
+        self.leaderboard_cache.update(user_id, username, boss_type, damage, difficulty, previous=old_damage)
+        self.username_index.set_username(str(user_id), username)
+        self.data_version += 1
+        return old_screenshot
+
+    async def get_leaderboard(self, boss_type, difficulty=None, limit=10, clan=None):
+        """Récupère le classement pour un boss et difficulté spécifique (mémoire d'abord)"""
+        cached = self.leaderboard_cache.get_leaderboard(boss_type, difficulty, limit, clan)
+        if cached is not None:
+            return cached
+        return await self._run(self.db_manager.get_leaderboard, boss_type, difficulty, limit, clan)
+
+    async def get_leaderboard_page(self, boss_type, difficulty=None, limit=10, clan=None, after=None, before=None):
+        """Page de classement keyset [(discord_id, username, damage, date, clan), ...]"""
+        page = self.leaderboard_cache.get_leaderboard_page(boss_type, difficulty, limit, clan, after, before)
+        if page is not None:
+            return page
+        return await self._run(self.db_manager.get_leaderboard_page, boss_type, difficulty, limit, clan, after, before)
+
+    async def get_leaderboard_size(self, boss_type, difficulty=None, clan=None):
+        """Nombre de joueurs classés pour un boss et difficulté"""
+        size = self.leaderboard_cache.get_leaderboard_size(boss_type, difficulty, clan)
+        if size is not None:
+            return size
+        return await self._run(self.db_manager.get_leaderboard_size, boss_type, difficulty, clan)
+
+    async def get_all_leaderboards(self, boss_type, limit=10, clan=None):
+        """Top de chaque difficulté d'un boss : {difficulty: (lignes, total)} (mémoire d'abord, sinon une requête)"""
+        difficulties = BOSS_CONFIG[boss_type]['difficulties'] or [None]
+        if all(self.leaderboard_cache.is_cached(boss_type, difficulty) for difficulty in difficulties):
+            boards = {}
+            for difficulty in difficulties:
+                rows = self.leaderboard_cache.get_leaderboard_page(boss_type, difficulty, limit, clan)
+                if rows:
+                    boards[difficulty] = (rows, self.leaderboard_cache.get_leaderboard_size(boss_type, difficulty, clan))
+            return boards
+        return await self._run(self.db_manager.get_all_leaderboards, boss_type, limit, clan)
+
+    async def get_leaderboard_page_around(self, user_id, boss_type, difficulty=None, limit=10, clan=None):
+        """Retourne (rang de début, lignes) de la page contenant l'utilisateur, ou None s'il n'est pas classé"""
+        rank = await self.get_user_rank(user_id, boss_type, difficulty, clan)
+        if not rank:
+            return None
+        damage, _, _ = await self.get_user_pb(user_id, boss_type, difficulty)
+        start_rank = rank[0] - (rank[0] - 1) % limit
+
+        # Dernière ligne de la page précédente = curseur keyset de la page de l'utilisateur
+        after = None
+        if start_rank > 1:
+            preceding = await self.get_leaderboard_page(
+                boss_type, difficulty, rank[0] - start_rank + 1, clan, before=(damage, str(user_id))
+            )
+            after = (preceding[0][2], preceding[0][0])
+        rows = await self.get_leaderboard_page(boss_type, difficulty, limit, clan, after=after)
+        return start_rank, rows
+
+    async def get_user_rank(self, user_id, boss_type, difficulty=None, clan=None):
+        """Retourne (rang, total) d'un utilisateur, ou None s'il n'a pas de PB"""
+        ranks = await self.get_user_ranks(user_id, [(boss_type, difficulty)], clan)
+        return ranks.get((boss_type, difficulty))
+
+    async def get_user_ranks(self, user_id, boss_keys, clan=None):
+        """Retourne {(boss, difficulté): (rang, total)} pour tous les PB demandés"""
+        ranks = {}
+        uncached = []
+        buckets = {}
+        for boss_type, difficulty in boss_keys:
+            rank = self.leaderboard_cache.get_rank(user_id, boss_type, difficulty, clan)
+            if rank is False:
+                uncached.append((boss_type, difficulty))
+                rank_buckets = self.leaderboard_cache.get_rank_buckets(boss_type, difficulty, clan)
+                if rank_buckets:
+                    buckets[(boss_type, difficulty)] = rank_buckets
+            elif rank:
+                ranks[(boss_type, difficulty)] = rank
+        if uncached:
+            # Classements hors cache : un seul passage par le pool de threads
+            results = await self._run(self._get_db_ranks, user_id, uncached, clan, buckets)
+            for key, rank in results.items():
+                if key in buckets:
+                    # (damage, devant dans la tranche) : tranches supérieures comptées en mémoire
+                    damage, ahead = rank
+                    rank = buckets[key].ahead(damage) + ahead + 1, buckets[key].total
+                ranks[key] = rank
+        return ranks
+
+    def _get_db_ranks(self, user_id, boss_keys, clan, buckets):
+        ranks = {}
+        for boss_type, difficulty in boss_keys:
+            rank_buckets = buckets.get((boss_type, difficulty))
+            if rank_buckets:
+                # Seul le reste de la tranche du joueur est compté par SQLite
+                damage = self.db_manager.get_user_pb(user_id, boss_type, difficulty)[0]
+                rank = None
+                if damage > 0:
+                    upper = rank_buckets.upper(damage)
+                    rank = damage, self.db_manager.count_pb_ahead(user_id, boss_type, difficulty, damage, upper)
+            else:
+                rank = self.db_manager.get_user_rank(user_id, boss_type, difficulty, clan)
+            if rank:
+                ranks[(boss_type, difficulty)] = rank
+        return ranks
+
+    async def get_user_all_pbs(self, user_id):
+        """Récupère tous les PB d'un utilisateur"""
+        return await self._run(self.db_manager.get_user_all_pbs, user_id)
+
+    async def add_live_board(self, message_id, channel_id, boss_type, difficulty=None, clan=None):
+        """Enregistre un message de classement en direct"""
+        return await self._run(self.db_manager.add_live_board, message_id, channel_id, boss_type, difficulty, clan)
+
+    async def remove_live_board(self, message_id):
+        """Supprime un classement en direct"""
+        return await self._run(self.db_manager.remove_live_board, message_id)
+
+    async def get_live_boards(self):
+        """Liste des classements en direct enregistrés"""
+        return await self._run(self.db_manager.get_live_boards)
+
+    async def find_similar_screenshots(self, phash, max_distance=SCREENSHOT_PHASH_MAX_DISTANCE):
+        """Screenshots déjà soumis proches d'un hash : [(distance, (filename, discord_id, boss, difficulté, date)), ...]"""
+        if phash is None:
+            return []
+        if self.screenshot_index.warmed:
+            return self.screenshot_index.find(phash, max_distance)
+        return await self._run(self.db_manager.find_similar_screenshots, phash, max_distance)
+
+    async def record_screenshot_hash(self, filename, phash, user_id, boss_type, difficulty=None):
+        """Enregistre le hash d'un screenshot en base et dans l'index"""
+        if phash is None:
+            return
+        entry = await self._run(self.db_manager.add_screenshot_hash, filename, phash, user_id, boss_type, difficulty)
+        if entry:
+            self.screenshot_index.add(phash, entry)
+
+    async def get_unhashed_screenshots(self):
+        """PB courants dont le screenshot n'a pas encore de hash perceptuel"""
+        return await self._run(self.db_manager.get_unhashed_screenshots)
+
+    def queue_username(self, user_id, username):
+        """Met en attente un changement de pseudo d'un utilisateur connu (écrit au prochain flush)"""
+        discord_id = str(user_id)
+        if not self.username_index.warmed:
+            # Index froid : SQLite ne modifiera que les utilisateurs connus au flush
+            if self._pending_usernames.get(discord_id) == username:
+                return False
+            self._pending_usernames[discord_id] = username
+            return True
+        known = self.username_index.get_username(discord_id)
+        if known is None:
+            return False
+        if known == username:
+            # Revenu au pseudo connu avant le flush : plus rien à écrire
+            self._pending_usernames.pop(discord_id, None)
+            return False
+        self._pending_usernames[discord_id] = username
+        return True
+
+    async def flush_usernames(self):
+        """Écrit les pseudos en attente en une transaction puis met à jour les caches en place
+
+        Retourne les [(discord_id, username), ...] réellement renommés.
+        """
+        if not self._pending_usernames:
+            return []
+        changes, self._pending_usernames = self._pending_usernames, {}
+        try:
+            renamed = await self._run(self.db_manager.update_usernames, list(changes.items()))
+        except Exception as e:
+            # Les plus récents l'emportent sur le lot en échec
+            self._pending_usernames = {**changes, **self._pending_usernames}
+            print(f"[ERREUR] Synchronisation des pseudos: {e}")
+            return []
+        for discord_id, username in renamed:
+            self.leaderboard_cache.set_username(discord_id, username)
+            self.username_index.set_username(discord_id, username)
+        if renamed:
+            self.data_version += 1
+        return renamed
+
+    async def get_username(self, user_id):
+        """Pseudo connu d'un utilisateur (index si chargé, sinon SQLite)"""
+        if self.username_index.warmed:
+            return self.username_index.get_username(str(user_id))
+        return await self._run(self.db_manager.get_username, user_id)
+
+    async def find_user_by_name(self, username):
+        """Trouve un utilisateur par son nom : meilleures correspondances [(discord_id, username), ...]"""
+        if self.username_index.warmed:
+            return self.username_index.resolve(username)
+        return await self._run(self.db_manager.find_user_by_name, username)
+
+    def shutdown(self):
+        """Arrête le pool de threads (appelé à la fermeture du bot)"""
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import functools
+from collections import OrderedDict
+from datetime import datetime
+from config import MERCY_CACHE_MAX_USERS, MERCY_EVENT_BATCH_SIZE
+from utils.KeyedLock_class import KeyedLock
+
+class AsyncMercyManager:
+    """Façade asynchrone du MercyManager, partage le pool de threads de la base
+
+    Les compteurs lus sont gardés en mémoire (LRU par utilisateur) et mis à jour
+    après chaque écriture réussie ; cache et verrous ne sont manipulés que depuis
+    la boucle d'événements. Les événements (ajouts, resets) sont tamponnés et
+    écrits par lots avec leurs agrégats.
+    """
+
+    def __init__(self, mercy_manager, executor, max_users=MERCY_CACHE_MAX_USERS):
+        self.mercy_manager = mercy_manager
+        self.executor = executor
+        self.max_users = max_users
+        self._counters = OrderedDict()  # user_id -> {shard_type: pulls}
+        self._user_locks = KeyedLock()  # Sérialise les écritures d'un même utilisateur (mises à jour du cache dans l'ordre des commits)
+        self._events = []
+
+    async def _run(self, func, *args, **kwargs):
+        """Exécute une fonction synchrone dans le pool de threads de la base"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def _store(self, user_id, counters):
+        """Met en cache les compteurs d'un utilisateur en évinçant le moins récemment utilisé"""
+        self._counters[user_id] = counters
+        self._counters.move_to_end(user_id)
+        while len(self._counters) > self.max_users:
+            self._counters.popitem(last=False)
+
+    async def get_pulls(self, user_id, shard_type):
+        """Retourne le nombre de pulls actuels pour un utilisateur et un type de shard"""
+        return (await self.get_all_pulls(user_id)).get(shard_type, 0)
+
+    async def add_pulls(self, user_id, shard_type, pulls):
+        """Ajoute des pulls pour un utilisateur"""
+        return (await self.add_pulls_many(user_id, [shard_type], pulls))[shard_type]
+
+    async def add_pulls_many(self, user_id, shard_types, pulls):
+        """Ajoute des pulls sur plusieurs shards en une transaction"""
+        async with self._user_locks(user_id):
+            totals = await self._run(self.mercy_manager.add_pulls_many, user_id, shard_types, pulls)
+            if user_id in self._counters:
+                self._counters[user_id].update(totals)
+                self._counters.move_to_end(user_id)
+        now = datetime.utcnow()
+        await self._log_events([(user_id, shard_type, 'add', pulls, None, now) for shard_type in shard_types])
+        return totals
+
+    async def reset_pulls(self, user_id, shard_type, clan=None):
+        """Réinitialise les pulls d'un utilisateur pour un shard"""
+        return (await self.reset_pulls_many(user_id, [shard_type], clan)).get(shard_type)
+
+    async def reset_pulls_many(self, user_id, shard_types, clan=None):
+        """Réinitialise plusieurs shards d'un utilisateur en une transaction (chaque reset compte comme un loot)"""
+        async with self._user_locks(user_id):
+            previous = await self._run(self.mercy_manager.reset_pulls_many, user_id, shard_types)
+            counters = self._counters.get(user_id)
+            if counters is not None:
+                # Comme en base : seul un compteur existant est remis à zéro
+                for shard_type in previous:
+                    counters[shard_type] = 0
+        now = datetime.utcnow()
+        await self._log_events([
+            (user_id, shard_type, 'reset', pulls, clan, now)
+            for shard_type, pulls in previous.items() if pulls > 0
+        ])
+        return previous
+
+    async def _log_events(self, events):
+        """Tamponne des événements, écrits dès que le lot est plein"""
+        self._events.extend(events)
+        if len(self._events) >= MERCY_EVENT_BATCH_SIZE:
+            await self.flush_events()
+
+    async def flush_events(self):
+        """Écrit les événements en attente et leurs agrégats en une transaction"""
+        if not self._events:
+            return
+        events, self._events = self._events, []
+        try:
+            await self._run(self.mercy_manager.record_events, events)
+        except Exception as e:
+            # Remis en tête du tampon pour le prochain lot
+            self._events[:0] = events
+            print(f"[ERREUR] Écriture des événements mercy: {e}")
+
+    async def get_user_stats(self, user_id):
+        """Statistiques de loot d'un utilisateur par shard (événements en attente inclus)"""
+        await self.flush_events()
+        return await self._run(self.mercy_manager.get_user_stats, user_id)
+
+    async def get_drop_distribution(self, shard_type, clan=None):
+        """Distribution communautaire (ou d'un clan) du pull auquel le loot est tombé"""
+        await self.flush_events()
+        return await self._run(self.mercy_manager.get_drop_distribution, shard_type, clan)
+
+    async def get_all_pulls(self, user_id):
+        """Retourne tous les pulls d'un utilisateur pour tous les shards"""
+        counters = self._counters.get(user_id)
+        if counters is None:
+            async with self._user_locks(user_id):
+                counters = self._counters.get(user_id)
+                if counters is None:
+                    counters = await self._run(self.mercy_manager.get_all_pulls, user_id)
+                    self._store(user_id, counters)
+        else:
+            self._counters.move_to_end(user_id)
+        return dict(counters)
+
+    def get_mercy_chance(self, shard_type, pulls):
+        """Calcul pur, pas d'accès à la base"""
+        return self.mercy_manager.get_mercy_chance(shard_type, pulls)
+
+    def pulls_until_guaranteed(self, shard_type, pulls):
+        """Calcul pur, pas d'accès à la base"""
+        return self.mercy_manager.pulls_until_guaranteed(shard_type, pulls)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import os, queue, sqlite3, threading
+from contextlib import contextmanager
+from config import DATABASE_PATH, DB_POOL_READERS, DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_BUSY_TIMEOUT
+
+class ConnectionPool:
+    """Pool de connexions SQLite persistantes : un écrivain unique et N lecteurs, en mode WAL"""
+
+    def __init__(self, db_path=DATABASE_PATH, readers=DB_POOL_READERS):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+
+        # L'écrivain est créé en premier : c'est lui qui bascule la base en WAL
+        self._writer = self._connect()
+        self._writer_lock = threading.Lock()
+
+        self._readers = queue.Queue()
+        for _ in range(readers):
+            self._readers.put(self._connect())
+
+    def _connect(self):
+        """Ouvre une connexion configurée (WAL, cache, mmap)"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=DB_BUSY_TIMEOUT,
+            check_same_thread=False,  # Les connexions circulent entre les threads du pool
+            cached_statements=256,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(DB_CACHE_SIZE_KB)}")
+        conn.execute(f"PRAGMA mmap_size={int(DB_MMAP_SIZE)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @contextmanager
+    def reader(self):
+        """Emprunte une connexion de lecture (ne bloque jamais derrière l'écrivain en WAL)"""
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def writer(self):
+        """Connexion d'écriture exclusive : commit en sortie, rollback en cas d'erreur"""
+        with self._writer_lock:
+            try:
+                yield self._writer
+                self._writer.commit()
+            except Exception:
+                self._writer.rollback()
+                raise
+
+    def close(self):
+        """Ferme toutes les connexions du pool"""
+        with self._writer_lock:
+            self._writer.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
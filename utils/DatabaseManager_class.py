@@ -1,77 +1,102 @@
 # -*- coding: utf-8 -*-
-from config import DATABASE_PATH
-import sqlite3, os
+import json
+import sqlite3
+from config import DATABASE_PATH, BOSS_CONFIG
+from utils.ConnectionPool_class import ConnectionPool
+from utils.helpers import get_user_clan
+from utils.UsernameIndex_class import best_matches
+
+# Version du schéma (PRAGMA user_version)
+SCHEMA_VERSION = 7
+
+# Longueur minimale d'une recherche servie par l'index plein texte (tokenizer trigram)
+FTS_MIN_QUERY = 3
+
+# Difficulté stockée pour les boss sans difficultés (CvC), identique à pb_history
+NO_DIFFICULTY = 'none'
+
+def _difficulty_key(difficulty):
+    """Valeur stockée en base pour une difficulté (None -> 'none')"""
+    return difficulty or NO_DIFFICULTY
+
+def _pb_keys():
+    """Liste de tous les couples (boss, difficulté) définis dans BOSS_CONFIG"""
+    keys = []
+    for boss_type, boss_info in BOSS_CONFIG.items():
+        keys.extend([(boss_type, d) for d in boss_info['difficulties']] or [(boss_type, None)])
+    return keys
+
+def _to_signed64(value):
+    """Hash 64 bits non signé -> INTEGER SQLite (signé)"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def _from_signed64(value):
+    """INTEGER SQLite (signé) -> hash 64 bits non signé"""
+    return value + (1 << 64) if value < 0 else value
+
+def _column_prefix(boss_type, difficulty=None):
+    """Préfixe de colonne de l'ancien schéma large (pb_hydra_normal, pb_cvc...)"""
+    return f"pb_{boss_type}_{difficulty}" if difficulty else f"pb_{boss_type}"
+
+class StalePBError(Exception):
+    """Un PB supérieur ou égal a été enregistré entre la lecture et l'écriture"""
 
 class DatabaseManager:
-    def __init__(self, db_path=DATABASE_PATH):
+    def __init__(self, db_path=DATABASE_PATH, pool=None):
         self.db_path = db_path
+        self.pool = pool or ConnectionPool(db_path)
         self.init_database()
-    
+
     def init_database(self):
-        """Initialise la base de données avec les nouvelles colonnes pour les difficultés"""
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Table principale avec toutes les difficultés
+        """Initialise la base de données et applique les migrations de schéma"""
+        with self.pool.writer() as conn:
+            self._create_tables(conn.cursor())
+        self._migrate()
+        with self.pool.reader() as conn:
+            self.username_fts = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_fts'"
+            ).fetchone() is not None
+
+    def _create_tables(self, cursor):
+        """Crée les tables si elles n'existent pas encore"""
+        # Table des utilisateurs (les PB sont dans pb_records)
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             discord_id TEXT UNIQUE,
             discord_username TEXT,
-            
-            -- Hydra difficulties
-            pb_hydra_normal INTEGER DEFAULT 0,
-            pb_hydra_normal_screenshot TEXT,
-            pb_hydra_normal_date TIMESTAMP,
-            pb_hydra_hard INTEGER DEFAULT 0,
-            pb_hydra_hard_screenshot TEXT,
-            pb_hydra_hard_date TIMESTAMP,
-            pb_hydra_brutal INTEGER DEFAULT 0,
-            pb_hydra_brutal_screenshot TEXT,
-            pb_hydra_brutal_date TIMESTAMP,
-            pb_hydra_nightmare INTEGER DEFAULT 0,
-            pb_hydra_nightmare_screenshot TEXT,
-            pb_hydra_nightmare_date TIMESTAMP,
-            
-            -- Chimera difficulties
-            pb_chimera_easy INTEGER DEFAULT 0,
-            pb_chimera_easy_screenshot TEXT,
-            pb_chimera_easy_date TIMESTAMP,
-            pb_chimera_normal INTEGER DEFAULT 0,
-            pb_chimera_normal_screenshot TEXT,
-            pb_chimera_normal_date TIMESTAMP,
-            pb_chimera_hard INTEGER DEFAULT 0,
-            pb_chimera_hard_screenshot TEXT,
-            pb_chimera_hard_date TIMESTAMP,
-            pb_chimera_brutal INTEGER DEFAULT 0,
-            pb_chimera_brutal_screenshot TEXT,
-            pb_chimera_brutal_date TIMESTAMP,
-            pb_chimera_nightmare INTEGER DEFAULT 0,
-            pb_chimera_nightmare_screenshot TEXT,
-            pb_chimera_nightmare_date TIMESTAMP,
-            pb_chimera_ultra INTEGER DEFAULT 0,
-            pb_chimera_ultra_screenshot TEXT,
-            pb_chimera_ultra_date TIMESTAMP,
-            
-            -- CvC (inchangé)
-            pb_cvc INTEGER DEFAULT 0,
-            pb_cvc_screenshot TEXT,
-            pb_cvc_date TIMESTAMP,
-            
             total_attempts INTEGER DEFAULT 0,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
         ''')
-        
+
         # Migration des données existantes (si nécessaire)
         cursor.execute("PRAGMA table_info(users)")
         columns = [row[1] for row in cursor.fetchall()]
-        
+
         if 'discord_id' not in columns:
             cursor.execute('ALTER TABLE users ADD COLUMN discord_id TEXT')
             # Note: Vous devrez peut-être faire une migration manuelle pour les données existantes
-        
+
+        # Un PB par (utilisateur, boss, difficulté)
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pb_records (
+            discord_id TEXT NOT NULL,
+            boss_type TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            damage INTEGER NOT NULL DEFAULT 0,
+            screenshot TEXT,
+            date TIMESTAMP,
+            PRIMARY KEY (discord_id, boss_type, difficulty)
+        )
+        ''')
+
+        # Index couvrant pour les classements : parcours de plage au lieu d'un scan complet
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_pb_records_leaderboard
+        ON pb_records (boss_type, difficulty, damage DESC, discord_id, date)
+        ''')
+
         # Table pour l'historique global
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS pb_history (
@@ -85,119 +110,671 @@ class DatabaseManager:
             date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
         ''')
-        
-        conn.commit()
-        conn.close()
-    
+
+    def _migrate(self):
+        """Applique dans l'ordre les migrations dont la version dépasse PRAGMA user_version"""
+        migrations = [
+            (1, self._migrate_wide_users_to_pb_records),
+            (2, self._migrate_add_clan_column),
+            (3, self._migrate_add_screenshot_url),
+            (4, self._migrate_add_screenshot_blobs),
+            (5, self._migrate_add_live_boards),
+            (6, self._migrate_add_screenshot_hashes),
+            (7, self._migrate_add_username_search),
+        ]
+        with self.pool.writer() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for target, migration in migrations:
+                if version >= target:
+                    continue
+                conn.execute("BEGIN IMMEDIATE")
+                migration(conn.cursor())
+                conn.execute(f"PRAGMA user_version = {target}")
+                conn.commit()
+                print(f"[OK] Migration de la base vers la version {target}")
+
+    def _migrate_wide_users_to_pb_records(self, cursor):
+        """v1 : déplace les colonnes pb_* de l'ancienne table users vers pb_records"""
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(users)").fetchall()]
+        legacy_columns = [c for c in columns if c.startswith('pb_')]
+        if not legacy_columns:
+            return
+
+        for boss_type, difficulty in _pb_keys():
+            column_prefix = _column_prefix(boss_type, difficulty)
+            if column_prefix not in columns:
+                continue
+            cursor.execute(f'''
+            INSERT OR IGNORE INTO pb_records (discord_id, boss_type, difficulty, damage, screenshot, date)
+            SELECT discord_id, ?, ?, {column_prefix}, {column_prefix}_screenshot, {column_prefix}_date
+            FROM users
+            WHERE discord_id IS NOT NULL AND {column_prefix} > 0
+            ''', (boss_type, _difficulty_key(difficulty)))
+
+        # Reconstruction de users sans les colonnes larges
+        cursor.execute('''
+        CREATE TABLE users_v1 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            discord_id TEXT UNIQUE,
+            discord_username TEXT,
+            total_attempts INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        cursor.execute('''
+        INSERT INTO users_v1 (id, discord_id, discord_username, total_attempts, created_at)
+        SELECT id, discord_id, discord_username, total_attempts, created_at FROM users
+        ''')
+        cursor.execute('DROP TABLE users')
+        cursor.execute('ALTER TABLE users_v1 RENAME TO users')
+
+    def _migrate_add_clan_column(self, cursor):
+        """v2 : clan matérialisé et indexé (calculé une fois à l'écriture du pseudo)"""
+        for table in ('users', 'pb_records'):
+            columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()]
+            if 'clan' not in columns:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN clan TEXT')
+
+        # Backfill depuis les pseudos existants
+        users = cursor.execute('SELECT discord_id, discord_username FROM users').fetchall()
+        cursor.executemany(
+            'UPDATE users SET clan = ? WHERE discord_id = ?',
+            [(get_user_clan(username), discord_id) for discord_id, username in users]
+        )
+        cursor.execute('''
+        UPDATE pb_records SET clan = (SELECT u.clan FROM users u WHERE u.discord_id = pb_records.discord_id)
+        ''')
+
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_clan ON users (clan)')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_pb_records_clan_leaderboard
+        ON pb_records (boss_type, difficulty, clan, damage DESC, discord_id, date)
+        ''')
+
+    def _migrate_add_screenshot_url(self, cursor):
+        """v3 : URL CDN Discord du screenshot déjà envoyé (évite de le renvoyer à chaque affichage)"""
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(pb_records)").fetchall()]
+        if 'screenshot_url' not in columns:
+            cursor.execute('ALTER TABLE pb_records ADD COLUMN screenshot_url TEXT')
+
+    def _migrate_add_screenshot_blobs(self, cursor):
+        """v4 : compteur de références des screenshots (un fichier n'est supprimé qu'à sa dernière référence)
+
+        Seuls les PB courants (pb_records) comptent : pb_history garde le nom du fichier
+        à titre d'archive, sans empêcher sa suppression.
+        """
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS screenshot_blobs (
+            filename TEXT PRIMARY KEY,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        cursor.execute('''
+        INSERT OR REPLACE INTO screenshot_blobs (filename, refcount)
+        SELECT screenshot, COUNT(*) FROM pb_records WHERE screenshot IS NOT NULL GROUP BY screenshot
+        ''')
+
+    def _migrate_add_live_boards(self, cursor):
+        """v5 : messages de classement épinglés mis à jour en direct (survivent aux redémarrages)"""
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS live_boards (
+            message_id TEXT PRIMARY KEY,
+            channel_id TEXT NOT NULL,
+            boss_type TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            clan TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+
+    def _migrate_add_screenshot_hashes(self, cursor):
+        """v6 : hash perceptuel de chaque screenshot soumis (conservé après suppression du fichier)"""
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS screenshot_hashes (
+            filename TEXT PRIMARY KEY,
+            phash INTEGER NOT NULL,
+            discord_id TEXT NOT NULL,
+            boss_type TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+
+    def _migrate_add_username_search(self, cursor):
+        """v7 : index plein texte (trigrammes) des pseudos, tenu à jour par triggers
+
+        Sert la recherche de pseudos quand l'index mémoire est hors budget. Sans FTS5
+        trigram (SQLite < 3.34), la recherche reste un LIKE.
+        """
+        try:
+            cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS users_fts
+            USING fts5(discord_username, content='users', content_rowid='id', tokenize='trigram')
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"[INFO] FTS5 trigram indisponible ({e}) : recherche des pseudos via LIKE")
+            return
+        cursor.execute("INSERT INTO users_fts(users_fts) VALUES ('rebuild')")
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+            INSERT INTO users_fts (rowid, discord_username) VALUES (new.id, new.discord_username);
+        END
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+            INSERT INTO users_fts (users_fts, rowid, discord_username) VALUES ('delete', old.id, old.discord_username);
+        END
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF discord_username ON users BEGIN
+            INSERT INTO users_fts (users_fts, rowid, discord_username) VALUES ('delete', old.id, old.discord_username);
+            INSERT INTO users_fts (rowid, discord_username) VALUES (new.id, new.discord_username);
+        END
+        ''')
+
     def get_user_pb(self, user_id, boss_type, difficulty=None):
         """Récupère le PB d'un utilisateur pour un boss et difficulté spécifique"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        if difficulty:
-            column_prefix = f"pb_{boss_type}_{difficulty}"
-        else:
-            column_prefix = f"pb_{boss_type}"
-            
-        cursor.execute(
-            f"SELECT {column_prefix}, {column_prefix}_screenshot, {column_prefix}_date FROM users WHERE discord_id = ?",
-            (str(user_id),)
-        )
-        result = cursor.fetchone()
-        conn.close()
-        
+        with self.pool.reader() as conn:
+            result = conn.execute(
+                'SELECT damage, screenshot, date FROM pb_records WHERE discord_id = ? AND boss_type = ? AND difficulty = ?',
+                (str(user_id), boss_type, _difficulty_key(difficulty))
+            ).fetchone()
+
         return result if result else (0, None, None)
-    
+
+    def get_user_pb_record(self, user_id, boss_type, difficulty=None):
+        """Comme get_user_pb, avec l'URL CDN du screenshot : (damage, screenshot, date, screenshot_url)"""
+        with self.pool.reader() as conn:
+            result = conn.execute(
+                'SELECT damage, screenshot, date, screenshot_url FROM pb_records WHERE discord_id = ? AND boss_type = ? AND difficulty = ?',
+                (str(user_id), boss_type, _difficulty_key(difficulty))
+            ).fetchone()
+
+        return result if result else (0, None, None, None)
+
+    def set_screenshot_url(self, user_id, boss_type, difficulty, screenshot, url):
+        """Mémorise l'URL CDN d'un screenshot (seulement s'il s'agit toujours du PB courant)"""
+        with self.pool.writer() as conn:
+            conn.execute(
+                'UPDATE pb_records SET screenshot_url = ? WHERE discord_id = ? AND boss_type = ? AND difficulty = ? AND screenshot = ?',
+                (url, str(user_id), boss_type, _difficulty_key(difficulty), screenshot)
+            )
+
     def update_user_pb(self, user_id, username, boss_type, damage, screenshot_filename, difficulty=None):
-        """Met à jour le PB d'un utilisateur et supprime l'ancien screenshot"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Récupérer l'ancien screenshot pour le supprimer
-        old_data = self.get_user_pb(user_id, boss_type, difficulty)
-        old_screenshot = old_data[1] if old_data else None
-        
-        if difficulty:
-            column_prefix = f"pb_{boss_type}_{difficulty}"
-        else:
-            column_prefix = f"pb_{boss_type}"
-        
-        # Créer l'utilisateur s'il n'existe pas, sinon mettre à jour
-        cursor.execute(f'''
-        INSERT INTO users (discord_id, discord_username, {column_prefix}, {column_prefix}_screenshot, {column_prefix}_date, total_attempts)
-        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, 1)
-        ON CONFLICT(discord_id) 
-        DO UPDATE SET 
-            discord_username = ?,
-            {column_prefix} = ?,
-            {column_prefix}_screenshot = ?,
-            {column_prefix}_date = CURRENT_TIMESTAMP,
-            total_attempts = total_attempts + 1
-        ''', (str(user_id), username, damage, screenshot_filename, username, damage, screenshot_filename))
-        
-        # Ajouter à l'historique
-        cursor.execute('''
-        INSERT INTO pb_history (discord_id, username, boss_type, difficulty, damage, screenshot_filename)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ''', (str(user_id), username, boss_type, difficulty or 'none', damage, screenshot_filename))
-        
-        conn.commit()
-        conn.close()
-        
-        return old_screenshot
-    
+        """Met à jour le PB d'un utilisateur
+
+        Retourne l'ancien screenshot uniquement s'il n'est plus référencé (fichier à supprimer).
+        """
+        return self.write_user_pb(user_id, username, boss_type, damage, screenshot_filename, difficulty)[0]
+
+    def write_user_pb(self, user_id, username, boss_type, damage, screenshot_filename, difficulty=None):
+        """Comme update_user_pb, en retournant (ancien screenshot à supprimer, ancien dégât ou None)"""
+        difficulty_key = _difficulty_key(difficulty)
+        clan = get_user_clan(username)
+
+        with self.pool.writer() as conn:
+            cursor = conn.cursor()
+
+            # Récupérer l'ancien PB dans la même transaction (pas de seconde connexion)
+            old_data = cursor.execute(
+                'SELECT screenshot, damage FROM pb_records WHERE discord_id = ? AND boss_type = ? AND difficulty = ?',
+                (str(user_id), boss_type, difficulty_key)
+            ).fetchone()
+            old_screenshot, old_damage = old_data if old_data else (None, None)
+
+            # Créer l'utilisateur s'il n'existe pas, sinon mettre à jour
+            cursor.execute('''
+            INSERT INTO users (discord_id, discord_username, clan, total_attempts)
+            VALUES (?, ?, ?, 1)
+            ON CONFLICT(discord_id)
+            DO UPDATE SET
+                discord_username = excluded.discord_username,
+                clan = excluded.clan,
+                total_attempts = total_attempts + 1
+            ''', (str(user_id), username, clan))
+
+            # Le clan peut avoir changé avec le pseudo : on le répercute sur les autres PB
+            cursor.execute(
+                'UPDATE pb_records SET clan = ? WHERE discord_id = ? AND clan IS NOT ?',
+                (clan, str(user_id), clan)
+            )
+
+            cursor.execute('''
+            INSERT INTO pb_records (discord_id, boss_type, difficulty, damage, screenshot, date, clan)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
+            ON CONFLICT(discord_id, boss_type, difficulty)
+            DO UPDATE SET
+                damage = excluded.damage,
+                screenshot = excluded.screenshot,
+                screenshot_url = NULL,
+                date = excluded.date,
+                clan = excluded.clan
+            WHERE excluded.damage > pb_records.damage
+            RETURNING discord_id
+            ''', (str(user_id), boss_type, difficulty_key, damage, screenshot_filename, clan))
+            # Écriture conditionnelle : aucune ligne si le PB en base est déjà meilleur (toute la transaction est annulée)
+            if cursor.fetchone() is None:
+                raise StalePBError(f"PB {boss_type} {difficulty_key} déjà supérieur ou égal à {damage}")
+
+            # Ajouter à l'historique
+            cursor.execute('''
+            INSERT INTO pb_history (discord_id, username, boss_type, difficulty, damage, screenshot_filename)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', (str(user_id), username, boss_type, difficulty_key, damage, screenshot_filename))
+
+            # Compteurs de références : +1 pour le nouveau screenshot, -1 pour l'ancien
+            if screenshot_filename:
+                cursor.execute('''
+                INSERT INTO screenshot_blobs (filename, refcount) VALUES (?, 1)
+                ON CONFLICT(filename) DO UPDATE SET refcount = refcount + 1
+                ''', (screenshot_filename,))
+            if old_screenshot and not self._release_screenshot(cursor, old_screenshot):
+                old_screenshot = None
+
+        return old_screenshot, old_damage
+
+    def _release_screenshot(self, cursor, filename):
+        """Décrémente les références d'un screenshot ; True s'il n'est plus référencé"""
+        row = cursor.execute(
+            'UPDATE screenshot_blobs SET refcount = refcount - 1 WHERE filename = ? RETURNING refcount',
+            (filename,)
+        ).fetchone()
+        if row is None:
+            # Fichier non suivi (antérieur au comptage) : comportement historique
+            return True
+        if row[0] <= 0:
+            cursor.execute('DELETE FROM screenshot_blobs WHERE filename = ?', (filename,))
+            return True
+        return False
+
     def get_leaderboard(self, boss_type, difficulty=None, limit=10, clan=None):
         """Récupère le classement pour un boss et difficulté spécifique"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        if difficulty:
-            column_prefix = f"pb_{boss_type}_{difficulty}"
+        query = '''
+        SELECT u.discord_username, p.damage, p.date, p.clan
+        FROM pb_records p
+        JOIN users u ON u.discord_id = p.discord_id
+        WHERE p.boss_type = ? AND p.difficulty = ? AND p.damage > 0
+        '''
+        params = [boss_type, _difficulty_key(difficulty)]
+
+        if clan:
+            # Égalité sur la colonne indexée (boss_type, difficulty, clan, damage DESC)
+            query += ' AND p.clan = ?'
+            params.append(clan)
+
+        query += ' ORDER BY p.damage DESC, p.discord_id LIMIT ?'
+        params.append(limit)
+
+        with self.pool.reader() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def get_leaderboard_page(self, boss_type, difficulty=None, limit=10, clan=None, after=None, before=None):
+        """Page de classement par pagination keyset sur (damage, discord_id), sans OFFSET
+
+        after/before sont des curseurs (damage, discord_id) exclusifs.
+        Retourne [(discord_id, username, damage, date, clan), ...] dans l'ordre du classement.
+        """
+        query = '''
+        SELECT p.discord_id, u.discord_username, p.damage, p.date, p.clan
+        FROM pb_records p
+        JOIN users u ON u.discord_id = p.discord_id
+        WHERE p.boss_type = ? AND p.difficulty = ?
+        '''
+        params = [boss_type, _difficulty_key(difficulty)]
+
+        if clan:
+            query += ' AND p.clan = ?'
+            params.append(clan)
+
+        # Bornes redondantes sur damage : sans elles SQLite applique le OR comme filtre
+        # et parcourt l'index depuis un bout du classement (coût linéaire en profondeur)
+        if before:
+            # Page précédente : on remonte l'index puis on remet dans l'ordre
+            # (damage >= curseur > 0 : pas de seconde borne basse qui masquerait la première)
+            query += ' AND p.damage >= ? AND (p.damage > ? OR (p.damage = ? AND p.discord_id < ?)) ORDER BY p.damage ASC, p.discord_id DESC LIMIT ?'
+            params += [before[0], before[0], before[0], str(before[1]), limit]
         else:
-            column_prefix = f"pb_{boss_type}"
-        
-        base_query = f'''
-        SELECT discord_username, {column_prefix}, {column_prefix}_date 
-        FROM users 
-        WHERE {column_prefix} > 0
+            query += ' AND p.damage > 0'
+            if after:
+                query += ' AND p.damage <= ? AND (p.damage < ? OR (p.damage = ? AND p.discord_id > ?))'
+                params += [after[0], after[0], after[0], str(after[1])]
+            query += ' ORDER BY p.damage DESC, p.discord_id LIMIT ?'
+            params.append(limit)
+
+        with self.pool.reader() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        return rows[::-1] if before else rows
+
+    def get_all_leaderboards(self, boss_type, limit=10, clan=None):
+        """Top de chaque difficulté d'un boss en une seule requête (fonctions de fenêtrage)
+
+        Retourne {difficulty: ([(discord_id, username, damage, date, clan), ...], total)}.
+        """
+        query = '''
+        SELECT difficulty, discord_id, discord_username, damage, date, clan, total FROM (
+            SELECT p.difficulty, p.discord_id, u.discord_username, p.damage, p.date, p.clan,
+                   ROW_NUMBER() OVER (PARTITION BY p.difficulty ORDER BY p.damage DESC, p.discord_id) AS position,
+                   COUNT(*) OVER (PARTITION BY p.difficulty) AS total
+            FROM pb_records p
+            JOIN users u ON u.discord_id = p.discord_id
+            WHERE p.boss_type = ? AND p.damage > 0
         '''
-        
+        params = [boss_type]
+        if clan:
+            query += ' AND p.clan = ?'
+            params.append(clan)
+        query += ') WHERE position <= ? ORDER BY difficulty, position'
+        params.append(limit)
+
+        with self.pool.reader() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        boards = {}
+        for difficulty, discord_id, username, damage, date, user_clan, total in rows:
+            key = None if difficulty == NO_DIFFICULTY else difficulty
+            boards.setdefault(key, ([], total))[0].append((discord_id, username, damage, date, user_clan))
+        return boards
+
+    def get_leaderboard_size(self, boss_type, difficulty=None, clan=None):
+        """Nombre de joueurs classés pour un boss et difficulté"""
+        query = 'SELECT COUNT(*) FROM pb_records WHERE boss_type = ? AND difficulty = ? AND damage > 0'
+        params = [boss_type, _difficulty_key(difficulty)]
         if clan:
-            base_query += ''' AND (
-                discord_username LIKE '[''' + clan + '''] %' OR
-                discord_username LIKE '[''' + clan + ''']%'
-            )'''
-        
-        base_query += f' ORDER BY {column_prefix} DESC LIMIT ?'
-        
-        cursor.execute(base_query, (limit,))
-        results = cursor.fetchall()
-        conn.close()
-        return results
-    
+            query += ' AND clan = ?'
+            params.append(clan)
+
+        with self.pool.reader() as conn:
+            return conn.execute(query, params).fetchone()[0]
+
+    def get_user_rank(self, user_id, boss_type, difficulty=None, clan=None):
+        """Retourne (rang, total) d'un utilisateur, ou None s'il n'a pas de PB"""
+        difficulty_key = _difficulty_key(difficulty)
+        clan_filter = ' AND clan = ?' if clan else ''
+        clan_params = [clan] if clan else []
+
+        with self.pool.reader() as conn:
+            row = conn.execute(
+                'SELECT damage FROM pb_records WHERE discord_id = ? AND boss_type = ? AND difficulty = ? AND damage > 0' + clan_filter,
+                [str(user_id), boss_type, difficulty_key] + clan_params
+            ).fetchone()
+            if not row:
+                return None
+            # Comptages sur plages de l'index (même ordre que le classement : damage DESC, discord_id)
+            # Deux plages plutôt qu'un OR, qui empêcherait SQLite de borner le parcours sur damage
+            ahead = conn.execute(
+                'SELECT COUNT(*) FROM pb_records WHERE boss_type = ? AND difficulty = ?' + clan_filter + ' AND damage > ?',
+                [boss_type, difficulty_key] + clan_params + [row[0]]
+            ).fetchone()[0]
+            ahead += conn.execute(
+                'SELECT COUNT(*) FROM pb_records WHERE boss_type = ? AND difficulty = ?' + clan_filter +
+                ' AND damage = ? AND discord_id < ?',
+                [boss_type, difficulty_key] + clan_params + [row[0], str(user_id)]
+            ).fetchone()[0]
+            total = conn.execute(
+                'SELECT COUNT(*) FROM pb_records WHERE boss_type = ? AND difficulty = ? AND damage > 0' + clan_filter,
+                [boss_type, difficulty_key] + clan_params
+            ).fetchone()[0]
+
+        return ahead + 1, total
+
+    def count_pb_ahead(self, user_id, boss_type, difficulty, damage, upper=None):
+        """Nombre de PB classés devant (damage, user_id) dont les dégâts restent sous `upper` (exclu)
+
+        Sert au reste d'un rang par tranches : seule la plage [damage, upper) est parcourue.
+        """
+        difficulty_key = _difficulty_key(difficulty)
+        upper_filter = ' AND damage < ?' if upper is not None else ''
+        upper_params = [upper] if upper is not None else []
+        with self.pool.reader() as conn:
+            ahead = conn.execute(
+                'SELECT COUNT(*) FROM pb_records WHERE boss_type = ? AND difficulty = ? AND damage > ?' + upper_filter,
+                [boss_type, difficulty_key, damage] + upper_params
+            ).fetchone()[0]
+            ahead += conn.execute(
+                'SELECT COUNT(*) FROM pb_records WHERE boss_type = ? AND difficulty = ? AND damage = ? AND discord_id < ?',
+                (boss_type, difficulty_key, damage, str(user_id))
+            ).fetchone()[0]
+        return ahead
+
+    def get_board_damages(self, boss_type, difficulty=None):
+        """Dégâts (> 0) d'un classement par ordre croissant (tranches de rang des classements hors cache)"""
+        with self.pool.reader() as conn:
+            rows = conn.execute(
+                'SELECT damage FROM pb_records WHERE boss_type = ? AND difficulty = ? AND damage > 0 ORDER BY damage',
+                (boss_type, _difficulty_key(difficulty))
+            ).fetchall()
+        return [damage for damage, in rows]
+
+    def get_pb_board_sizes(self):
+        """Nombre de PB par classement {(boss, difficulté): n} (choix des classements gardés en mémoire)"""
+        with self.pool.reader() as conn:
+            rows = conn.execute(
+                'SELECT boss_type, difficulty, COUNT(*) FROM pb_records WHERE damage > 0 GROUP BY boss_type, difficulty'
+            ).fetchall()
+        return {(boss_type, None if difficulty == NO_DIFFICULTY else difficulty): count
+                for boss_type, difficulty, count in rows}
+
+    def get_all_pb_records(self, keys=None):
+        """Récupère les PB (discord_id, username, clan, boss, difficulté, damage, date) pour le cache mémoire
+
+        keys limite la lecture à certains classements [(boss, difficulté), ...], un par requête.
+        """
+        query = '''
+            SELECT p.discord_id, u.discord_username, u.clan, p.boss_type, p.difficulty, p.damage, p.date
+            FROM pb_records p
+            JOIN users u ON u.discord_id = p.discord_id
+            WHERE p.damage > 0
+            '''
+        records = []
+        with self.pool.reader() as conn:
+            if keys is None:
+                cursors = [conn.execute(query)]
+            else:
+                cursors = (conn.execute(query + ' AND p.boss_type = ? AND p.difficulty = ?',
+                                        (boss_type, _difficulty_key(difficulty)))
+                           for boss_type, difficulty in keys)
+            # Conversion ligne à ligne : pas de seconde copie de toute la table
+            for cursor in cursors:
+                for discord_id, username, clan, boss_type, difficulty, damage, date in cursor:
+                    records.append((discord_id, username, clan, boss_type,
+                                    None if difficulty == NO_DIFFICULTY else difficulty, damage, date))
+        return records
+
+    def get_referenced_screenshots(self, filenames):
+        """Parmi les noms donnés, retourne l'ensemble de ceux référencés par un PB courant"""
+        referenced = set()
+        filenames = list(filenames)
+        with self.pool.reader() as conn:
+            for i in range(0, len(filenames), 500):
+                batch = filenames[i:i + 500]
+                placeholders = ", ".join("?" * len(batch))
+                rows = conn.execute(
+                    f'SELECT screenshot FROM pb_records WHERE screenshot IN ({placeholders})', batch
+                ).fetchall()
+                referenced.update(row[0] for row in rows)
+        return referenced
+
+    def get_pb_screenshots_page(self, after_rowid=0, limit=500):
+        """Page de (rowid, boss_type, difficulty, screenshot) des PB courants, par rowid croissant"""
+        with self.pool.reader() as conn:
+            rows = conn.execute(
+                'SELECT rowid, boss_type, difficulty, screenshot FROM pb_records '
+                'WHERE rowid > ? AND screenshot IS NOT NULL ORDER BY rowid LIMIT ?',
+                (after_rowid, limit)
+            ).fetchall()
+        return [
+            (rowid, boss_type, None if difficulty == NO_DIFFICULTY else difficulty, screenshot)
+            for rowid, boss_type, difficulty, screenshot in rows
+        ]
+
     def get_user_all_pbs(self, user_id):
-        """Récupère tous les PB d'un utilisateur"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Récupérer toutes les colonnes de PB
-        cursor.execute('SELECT * FROM users WHERE discord_id = ?', (str(user_id),))
-        result = cursor.fetchone()
-        columns = [desc[0] for desc in cursor.description]
-        conn.close()
-        
-        if not result:
-            return None
-        
-        return dict(zip(columns, result))
-    
+        """Récupère tous les PB d'un utilisateur (même forme de dict que l'ancienne table large)"""
+        with self.pool.reader() as conn:
+            cursor = conn.execute('SELECT * FROM users WHERE discord_id = ?', (str(user_id),))
+            result = cursor.fetchone()
+            if not result:
+                return None
+            columns = [desc[0] for desc in cursor.description]
+            records = conn.execute(
+                'SELECT boss_type, difficulty, damage, screenshot, date FROM pb_records WHERE discord_id = ?',
+                (str(user_id),)
+            ).fetchall()
+
+        user_data = dict(zip(columns, result))
+
+        # Couche de compatibilité : pb_<boss>[_<difficulté>], _screenshot, _date
+        for boss_type, difficulty in _pb_keys():
+            column_prefix = _column_prefix(boss_type, difficulty)
+            user_data[column_prefix] = 0
+            user_data[f"{column_prefix}_screenshot"] = None
+            user_data[f"{column_prefix}_date"] = None
+        for boss_type, difficulty, damage, screenshot, date in records:
+            column_prefix = _column_prefix(boss_type, None if difficulty == NO_DIFFICULTY else difficulty)
+            user_data[column_prefix] = damage
+            user_data[f"{column_prefix}_screenshot"] = screenshot
+            user_data[f"{column_prefix}_date"] = date
+
+        return user_data
+
+    def update_usernames(self, changes):
+        """Applique un lot de changements de pseudo [(user_id, username), ...] en une transaction
+
+        Seuls les utilisateurs déjà connus sont mis à jour ; le clan suit le pseudo.
+        Retourne les [(discord_id, username), ...] réellement renommés.
+        """
+        latest = {str(user_id): username for user_id, username in changes}
+        with self.pool.writer() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Pseudos actuels lus dans la transaction d'écriture : les renommés sont déduits en Python
+            current = dict(conn.execute(
+                'SELECT discord_id, discord_username FROM users WHERE discord_id IN (SELECT value FROM json_each(?))',
+                (json.dumps(list(latest)),)
+            ).fetchall())
+            renamed = [(discord_id, username) for discord_id, username in latest.items()
+                       if discord_id in current and current[discord_id] != username]
+            rows = [(username, get_user_clan(username), discord_id) for discord_id, username in renamed]
+            conn.executemany('UPDATE users SET discord_username = ?, clan = ? WHERE discord_id = ?', rows)
+            conn.executemany(
+                'UPDATE pb_records SET clan = ? WHERE discord_id = ? AND clan IS NOT ?',
+                [(clan, discord_id, clan) for _, clan, discord_id in rows]
+            )
+        return renamed
+
+    def add_live_board(self, message_id, channel_id, boss_type, difficulty=None, clan=None):
+        """Enregistre un message de classement en direct"""
+        with self.pool.writer() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO live_boards (message_id, channel_id, boss_type, difficulty, clan) VALUES (?, ?, ?, ?, ?)',
+                (str(message_id), str(channel_id), boss_type, _difficulty_key(difficulty), clan)
+            )
+
+    def remove_live_board(self, message_id):
+        """Supprime un classement en direct, retourne True s'il existait"""
+        with self.pool.writer() as conn:
+            return conn.execute('DELETE FROM live_boards WHERE message_id = ?', (str(message_id),)).rowcount > 0
+
+    def get_live_boards(self):
+        """Retourne [(message_id, channel_id, boss_type, difficulty, clan), ...]"""
+        with self.pool.reader() as conn:
+            rows = conn.execute(
+                'SELECT message_id, channel_id, boss_type, difficulty, clan FROM live_boards'
+            ).fetchall()
+        return [
+            (int(message_id), int(channel_id), boss_type, None if difficulty == NO_DIFFICULTY else difficulty, clan)
+            for message_id, channel_id, boss_type, difficulty, clan in rows
+        ]
+
+    def add_screenshot_hash(self, filename, phash, user_id, boss_type, difficulty=None):
+        """Enregistre le hash perceptuel d'un screenshot, retourne (filename, discord_id, boss, difficulté, date) ou None s'il était connu"""
+        with self.pool.writer() as conn:
+            row = conn.execute(
+                '''
+                INSERT INTO screenshot_hashes (filename, phash, discord_id, boss_type, difficulty)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(filename) DO NOTHING
+                RETURNING created_at
+                ''',
+                (filename, _to_signed64(phash), str(user_id), boss_type, _difficulty_key(difficulty))
+            ).fetchone()
+        return (filename, str(user_id), boss_type, difficulty, row[0]) if row else None
+
+    def get_screenshot_hashes(self):
+        """Retourne [(phash, (filename, discord_id, boss_type, difficulty, created_at)), ...]"""
+        with self.pool.reader() as conn:
+            rows = conn.execute(
+                'SELECT phash, filename, discord_id, boss_type, difficulty, created_at FROM screenshot_hashes'
+            ).fetchall()
+        return [
+            (_from_signed64(phash), (filename, discord_id, boss_type, None if difficulty == NO_DIFFICULTY else difficulty, created_at))
+            for phash, filename, discord_id, boss_type, difficulty, created_at in rows
+        ]
+
+    def count_screenshot_hashes(self):
+        """Nombre de hash perceptuels enregistrés"""
+        with self.pool.reader() as conn:
+            return conn.execute('SELECT COUNT(*) FROM screenshot_hashes').fetchone()[0]
+
+    def find_similar_screenshots(self, phash, max_distance):
+        """Parcours complet des hash (index mémoire hors budget) : [(distance, entrée), ...] triés"""
+        matches = []
+        with self.pool.reader() as conn:
+            cursor = conn.execute(
+                'SELECT phash, filename, discord_id, boss_type, difficulty, created_at FROM screenshot_hashes'
+            )
+            for stored, filename, discord_id, boss_type, difficulty, created_at in cursor:
+                distance = bin(phash ^ _from_signed64(stored)).count("1")
+                if distance <= max_distance:
+                    difficulty = None if difficulty == NO_DIFFICULTY else difficulty
+                    matches.append((distance, (filename, discord_id, boss_type, difficulty, created_at)))
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+    def get_unhashed_screenshots(self):
+        """PB courants dont le screenshot n'a pas encore de hash perceptuel [(discord_id, boss, difficulté, screenshot), ...]"""
+        with self.pool.reader() as conn:
+            rows = conn.execute(
+                '''
+                SELECT p.discord_id, p.boss_type, p.difficulty, p.screenshot
+                FROM pb_records p
+                LEFT JOIN screenshot_hashes h ON h.filename = p.screenshot
+                WHERE p.screenshot IS NOT NULL AND h.filename IS NULL
+                '''
+            ).fetchall()
+        return [
+            (discord_id, boss_type, None if difficulty == NO_DIFFICULTY else difficulty, screenshot)
+            for discord_id, boss_type, difficulty, screenshot in rows
+        ]
+
+    def count_users(self):
+        """Nombre d'utilisateurs connus"""
+        with self.pool.reader() as conn:
+            return conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+    def get_username(self, user_id):
+        """Pseudo connu d'un utilisateur, ou None"""
+        with self.pool.reader() as conn:
+            row = conn.execute('SELECT discord_username FROM users WHERE discord_id = ?', (str(user_id),)).fetchone()
+        return row[0] if row else None
+
+    def get_all_usernames(self):
+        """Retourne [(discord_id, discord_username), ...] pour l'index des pseudos"""
+        with self.pool.reader() as conn:
+            return conn.execute('SELECT discord_id, discord_username FROM users').fetchall()
+
     def find_user_by_name(self, username):
-        """Trouve un utilisateur par son nom (pour rétrocompatibilité)"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT discord_id, discord_username FROM users WHERE discord_username LIKE ?', (f'%{username}%',))
-        results = cursor.fetchall()
-        conn.close()
-        
-        return results
\ No newline at end of file
+        """Trouve un utilisateur par son nom : meilleures correspondances (exact > préfixe > sous-chaîne)"""
+        query = username.strip()
+        with self.pool.reader() as conn:
+            if self.username_fts and len(query) >= FTS_MIN_QUERY:
+                # Phrase entre guillemets : la requête est cherchée telle quelle, sans syntaxe FTS5
+                rows = conn.execute(
+                    'SELECT u.discord_id, u.discord_username FROM users_fts f JOIN users u ON u.id = f.rowid '
+                    'WHERE users_fts MATCH ?', ('"' + query.replace('"', '""') + '"',)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    'SELECT discord_id, discord_username FROM users WHERE discord_username LIKE ?', (f'%{query}%',)
+                ).fetchall()
+        return best_matches(query, rows)
\ No newline at end of file
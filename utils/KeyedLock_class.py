@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from contextlib import asynccontextmanager
+
+class KeyedLock:
+    """Verrous asyncio par clé : même clé sérialisée, clés différentes en parallèle
+
+    Les verrous sont créés à la demande et oubliés dès que personne ne les tient
+    ni ne les attend. Utilisé uniquement depuis la boucle d'événements.
+    """
+
+    def __init__(self):
+        self._locks = {}  # clé -> [asyncio.Lock, nombre de détenteurs + attentes]
+
+    @asynccontextmanager
+    async def __call__(self, key):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def locked(self, key):
+        """Indique si la clé est actuellement tenue"""
+        entry = self._locks.get(key)
+        return entry is not None and entry[0].locked()
+
+    def __len__(self):
+        return len(self._locks)
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+import bisect
+from datetime import datetime, timezone
+from config import BOSS_CONFIG, LEADERBOARD_CACHE_MAX_ENTRIES
+from utils.helpers import get_user_clan
+from utils.MemoryBudget_class import MemoryBudget
+from utils.RankBuckets_class import RankBuckets, BUDGET_NAME as BUCKETS_BUDGET_NAME
+
+BUDGET_NAME = "leaderboards"
+
+def _all_keys():
+    """Tous les couples (boss, difficulté) des classements (None pour les boss sans difficulté)"""
+    return [(boss_type, difficulty)
+            for boss_type, info in BOSS_CONFIG.items() for difficulty in (info['difficulties'] or [None])]
+
+class LeaderboardCache:
+    """Index des classements en mémoire : une liste triée par (boss, difficulté, clan)
+
+    Chaque liste contient des clés (-damage, discord_id), soit exactement l'ordre
+    de la requête SQL (damage DESC, discord_id). Les classements hors cache gardent
+    des compteurs par tranche de dégâts (RankBuckets) pour le rang global. Toutes les
+    méthodes sont appelées depuis la boucle d'événements : aucun verrou n'est nécessaire.
+    """
+
+    ENTRY_BYTES = 300  # Estimation mesurée par PB (entrée, positions dans les listes, pseudo)
+
+    def __init__(self, max_entries=LEADERBOARD_CACHE_MAX_ENTRIES, budget=None):
+        self.max_entries = max_entries
+        self.budget = budget or MemoryBudget()
+        self.warmed = False
+        self._boards = {}      # (boss, difficulté, clan) -> [(-damage, discord_id), ...] trié
+        self._records = {}     # (boss, difficulté) -> {discord_id: (damage, date)}
+        self._usernames = {}   # discord_id -> discord_username
+        self._clans = {}       # discord_id -> clan (colonne matérialisée en base)
+        self._overflow = set() # (boss, difficulté) trop volumineux : servis par SQLite
+        self._buckets = {}     # (boss, difficulté) hors cache -> RankBuckets
+
+    def plan(self, sizes):
+        """Réserve le budget des classements à charger d'après {(boss, difficulté): taille} ; retourne leurs clés
+
+        Les classements trop volumineux (ou hors budget) ne sont jamais lus en mémoire.
+        """
+        self.budget.release(BUDGET_NAME)
+        keys = []
+        for key in _all_keys():
+            size = sizes.get(key, 0)
+            if size <= self.max_entries and self.budget.reserve(BUDGET_NAME, size * self.ENTRY_BYTES):
+                keys.append(key)
+            else:
+                print(f"[INFO] Classement {key[0]}/{key[1]} trop volumineux pour le cache mémoire ({size} PB)")
+        return keys
+
+    def load(self, rows, keys=None):
+        """Construit l'index depuis (discord_id, username, clan, boss_type, difficulty, damage, date)
+
+        Seuls les classements `keys` (voir plan) sont en mémoire ; les autres sont servis par SQLite.
+        """
+        self._boards.clear()
+        self._records.clear()
+        self._usernames.clear()
+        self._clans.clear()
+        self._buckets.clear()
+        self.budget.release(BUCKETS_BUDGET_NAME)
+        self._overflow = set(_all_keys()) - set(_all_keys() if keys is None else keys)
+
+        for discord_id, username, clan, boss_type, difficulty, damage, date in rows:
+            key = (boss_type, difficulty)
+            if key in self._overflow:
+                continue
+            records = self._records.setdefault(key, {})
+            if len(records) >= self.max_entries:
+                self._drop(key)
+                continue
+            records[discord_id] = (damage, date)
+            self._usernames[discord_id] = username
+            self._clans[discord_id] = clan
+
+        for (boss_type, difficulty), records in self._records.items():
+            for discord_id, (damage, _) in records.items():
+                clan = self._clans.get(discord_id)
+                self._board(boss_type, difficulty, None).append((-damage, discord_id))
+                if clan:
+                    self._board(boss_type, difficulty, clan).append((-damage, discord_id))
+        for board in self._boards.values():
+            board.sort()
+
+        self.warmed = True
+
+    def overflow_keys(self):
+        """Classements (boss, difficulté) servis par SQLite"""
+        return [key for key in _all_keys() if key in self._overflow]
+
+    def set_rank_buckets(self, key, buckets):
+        """Installe les compteurs par tranche d'un classement hors cache ; False si hors budget"""
+        if not self.budget.reserve(BUCKETS_BUDGET_NAME, buckets.nbytes):
+            print(f"[INFO] Tranches de rang {key[0]}/{key[1]} hors budget mémoire : rangs via SQLite")
+            return False
+        self._buckets[key] = buckets
+        return True
+
+    def get_rank_buckets(self, boss_type, difficulty=None, clan=None):
+        """Compteurs par tranche du classement global hors cache, None s'il n'y en a pas"""
+        if clan or not self.warmed:
+            return None
+        return self._buckets.get((boss_type, difficulty))
+
+    def is_cached(self, boss_type, difficulty=None):
+        """Indique si le classement peut être servi depuis la mémoire"""
+        return self.warmed and (boss_type, difficulty) not in self._overflow
+
+    def get_leaderboard(self, boss_type, difficulty=None, limit=10, clan=None):
+        """Retourne [(username, damage, date, clan), ...] ou None si le classement n'est pas en cache"""
+        if not self.is_cached(boss_type, difficulty):
+            return None
+        records = self._records.get((boss_type, difficulty), {})
+        board = self._boards.get((boss_type, difficulty, clan), [])
+        results = []
+        for _, discord_id in board[:limit]:
+            damage, date = records[discord_id]
+            results.append((self._usernames.get(discord_id), damage, date, self._clans.get(discord_id)))
+        return results
+
+    def get_leaderboard_page(self, boss_type, difficulty=None, limit=10, clan=None, after=None, before=None):
+        """Page keyset (curseurs (damage, discord_id) exclusifs), None si le classement n'est pas en cache"""
+        if not self.is_cached(boss_type, difficulty):
+            return None
+        records = self._records.get((boss_type, difficulty), {})
+        board = self._boards.get((boss_type, difficulty, clan), [])
+        if before:
+            end = bisect.bisect_left(board, (-before[0], str(before[1])))
+            entries = board[max(0, end - limit):end]
+        else:
+            start = bisect.bisect_right(board, (-after[0], str(after[1]))) if after else 0
+            entries = board[start:start + limit]
+        results = []
+        for _, discord_id in entries:
+            damage, date = records[discord_id]
+            results.append((discord_id, self._usernames.get(discord_id), damage, date, self._clans.get(discord_id)))
+        return results
+
+    def get_leaderboard_size(self, boss_type, difficulty=None, clan=None):
+        """Nombre de joueurs classés, None si le classement n'est pas en cache"""
+        if not self.is_cached(boss_type, difficulty):
+            return None
+        return len(self._boards.get((boss_type, difficulty, clan), []))
+
+    def get_rank(self, user_id, boss_type, difficulty=None, clan=None):
+        """Retourne (rang, total) en O(log n) par bisect, None si pas de PB, False si pas en cache"""
+        if not self.is_cached(boss_type, difficulty):
+            return False
+        discord_id = str(user_id)
+        record = self._records.get((boss_type, difficulty), {}).get(discord_id)
+        if not record:
+            return None
+        board = self._boards.get((boss_type, difficulty, clan), [])
+        index = bisect.bisect_left(board, (-record[0], discord_id))
+        if index >= len(board) or board[index][1] != discord_id:
+            return None
+        return index + 1, len(board)
+
+    def update(self, user_id, username, boss_type, damage, difficulty=None, date=None, previous=None):
+        """Applique un PB validé en base (mise à jour incrémentale, pas de reconstruction)
+
+        previous est l'ancien dégât en base, utilisé par les classements hors cache.
+        """
+        if not self.warmed:
+            return
+        discord_id = str(user_id)
+        self.set_username(discord_id, username)
+
+        key = (boss_type, difficulty)
+        if key in self._overflow:
+            buckets = self._buckets.get(key)
+            if buckets:
+                buckets.move(previous, damage)
+            return
+        records = self._records.setdefault(key, {})
+        clan = self._clans.get(discord_id)
+
+        previous = records.get(discord_id)
+        if previous:
+            self._remove(boss_type, difficulty, clan, (-previous[0], discord_id))
+        elif len(records) >= self.max_entries or not self.budget.reserve(BUDGET_NAME, self.ENTRY_BYTES):
+            damages = sorted([record[0] for record in records.values()] + [damage])
+            self._drop(key)
+            # Le rang global reste servi en mémoire, par tranches
+            self.set_rank_buckets(key, RankBuckets.from_damages(damages))
+            return
+
+        records[discord_id] = (damage, date or datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"))
+        self._insert(boss_type, difficulty, clan, (-damage, discord_id))
+
+    def set_username(self, user_id, username, clan=None):
+        """Met à jour le pseudo et déplace l'utilisateur entre les classements de clan si besoin"""
+        discord_id = str(user_id)
+        known = discord_id in self._usernames
+        old_clan = self._clans.get(discord_id)
+        new_clan = clan or get_user_clan(username)
+        self._usernames[discord_id] = username
+        self._clans[discord_id] = new_clan
+        if not known or old_clan == new_clan:
+            return
+        for (boss_type, difficulty), records in self._records.items():
+            if discord_id not in records:
+                continue
+            entry = (-records[discord_id][0], discord_id)
+            if old_clan:
+                self._discard(self._boards.get((boss_type, difficulty, old_clan)), entry)
+            if new_clan:
+                bisect.insort(self._board(boss_type, difficulty, new_clan), entry)
+
+    def _board(self, boss_type, difficulty, clan):
+        return self._boards.setdefault((boss_type, difficulty, clan), [])
+
+    def _insert(self, boss_type, difficulty, clan, entry):
+        bisect.insort(self._board(boss_type, difficulty, None), entry)
+        if clan:
+            bisect.insort(self._board(boss_type, difficulty, clan), entry)
+
+    def _remove(self, boss_type, difficulty, clan, entry):
+        self._discard(self._boards.get((boss_type, difficulty, None)), entry)
+        if clan:
+            self._discard(self._boards.get((boss_type, difficulty, clan)), entry)
+
+    @staticmethod
+    def _discard(board, entry):
+        if not board:
+            return
+        index = bisect.bisect_left(board, entry)
+        if index < len(board) and board[index] == entry:
+            del board[index]
+
+    def _drop(self, key):
+        """Retire un classement trop volumineux du cache pour borner la mémoire"""
+        boss_type, difficulty = key
+        self._overflow.add(key)
+        records = self._records.pop(key, None)
+        if records:
+            self.budget.release(BUDGET_NAME, len(records) * self.ENTRY_BYTES)
+        for board_key in [k for k in self._boards if k[:2] == (boss_type, difficulty)]:
+            del self._boards[board_key]
+        print(f"[INFO] Classement {boss_type}/{difficulty} trop volumineux pour le cache mémoire")
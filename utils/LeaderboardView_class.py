@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import discord
+from config import LEADERBOARD_VIEW_TIMEOUT
+
+class LeaderboardView(discord.ui.View):
+    """Boutons de pagination d'un classement : les pages sont chargées par keyset et le message est édité"""
+
+    def __init__(self, db_manager, boss_type, difficulty, clan, page_size, rows, total, render, start_rank=1):
+        super().__init__(timeout=LEADERBOARD_VIEW_TIMEOUT)
+        self.db_manager = db_manager
+        self.boss_type = boss_type
+        self.difficulty = difficulty
+        self.clan = clan
+        self.page_size = page_size
+        self.rows = rows
+        self.total = total
+        self.render = render  # (rows, start_rank, total) -> discord.Embed
+        self.start_rank = start_rank
+        self.message = None
+        self._refresh_buttons()
+
+    def _refresh_buttons(self):
+        """Active/désactive les boutons selon la position dans le classement"""
+        self.previous_page.disabled = self.start_rank <= 1
+        self.next_page.disabled = self.start_rank + len(self.rows) - 1 >= self.total
+
+    async def _show(self, interaction, rows, start_rank):
+        """Édite le message existant avec la nouvelle page"""
+        self.total = await self.db_manager.get_leaderboard_size(self.boss_type, self.difficulty, self.clan)
+        self.rows = rows
+        self.start_rank = max(1, start_rank)
+        self._refresh_buttons()
+        await interaction.response.edit_message(embed=self.render(self.rows, self.start_rank, self.total), view=self)
+
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        first_discord_id, _, first_damage = self.rows[0][:3]
+        rows = await self.db_manager.get_leaderboard_page(
+            self.boss_type, self.difficulty, self.page_size, self.clan, before=(first_damage, first_discord_id)
+        )
+        if not rows:
+            await interaction.response.defer()
+            return
+        await self._show(interaction, rows, self.start_rank - len(rows))
+
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        last_discord_id, _, last_damage = self.rows[-1][:3]
+        rows = await self.db_manager.get_leaderboard_page(
+            self.boss_type, self.difficulty, self.page_size, self.clan, after=(last_damage, last_discord_id)
+        )
+        if not rows:
+            await interaction.response.defer()
+            return
+        await self._show(interaction, rows, self.start_rank + len(self.rows))
+
+    @discord.ui.button(label="Me", emoji="📍", style=discord.ButtonStyle.primary)
+    async def jump_to_me(self, interaction, button):
+        page = await self.db_manager.get_leaderboard_page_around(
+            interaction.user.id, self.boss_type, self.difficulty, self.page_size, self.clan
+        )
+        if not page:
+            await interaction.response.send_message("⚠️ You are not ranked on this leaderboard yet.", ephemeral=True)
+            return
+        start_rank, rows = page
+        await self._show(interaction, rows, start_rank)
+
+    async def on_timeout(self):
+        """Désactive les boutons à l'expiration"""
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
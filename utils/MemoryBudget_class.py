@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from config import INDEX_MEMORY_BUDGET_MB
+
+class MemoryBudget:
+    """Budget mémoire commun aux index chargés au démarrage (estimé en octets par entrée)
+
+    Chaque index réserve sa part avant de se charger ou de grossir ; ce qui ne rentre
+    pas reste froid et ses lectures passent par SQLite.
+    """
+
+    def __init__(self, limit_bytes=INDEX_MEMORY_BUDGET_MB * 1024 * 1024):
+        self.limit = limit_bytes
+        self._reserved = {}  # nom de l'index -> octets réservés
+
+    @property
+    def used(self):
+        return sum(self._reserved.values())
+
+    def reserve(self, name, nbytes):
+        """Réserve nbytes pour un index ; False (rien de réservé) si le budget serait dépassé"""
+        if self.used + nbytes > self.limit:
+            return False
+        self._reserved[name] = self._reserved.get(name, 0) + nbytes
+        return True
+
+    def release(self, name, nbytes=None):
+        """Libère une partie (ou la totalité) de la réservation d'un index"""
+        if nbytes is None:
+            self._reserved.pop(name, None)
+        else:
+            self._reserved[name] = max(0, self._reserved.get(name, 0) - nbytes)
+
+    def usage(self):
+        """Octets réservés par index"""
+        return dict(self._reserved)
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
-import sqlite3
+from collections import Counter
 from datetime import datetime
 from config import DATABASE_PATH
+from utils.ConnectionPool_class import ConnectionPool
 
 # Règles de mercy pour stockage
 MERCY_RULES = {
@@ -14,88 +15,186 @@ MERCY_RULES = {
 }
 
 class MercyManager:
-    def __init__(self, db_path=DATABASE_PATH):
+    def __init__(self, db_path=DATABASE_PATH, pool=None):
         self.db_path = db_path
+        self.pool = pool or ConnectionPool(db_path)
         self.init_table()
 
     def init_table(self):
         """Initialise la table des compteurs de mercy"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS mercy_counters (
-                user_id TEXT,
-                shard_type TEXT,
-                pulls INTEGER DEFAULT 0,
-                last_reset TIMESTAMP,
-                PRIMARY KEY(user_id, shard_type)
-            )
-        """)
-        conn.commit()
-        conn.close()
+        with self.pool.writer() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS mercy_counters (
+                    user_id TEXT,
+                    shard_type TEXT,
+                    pulls INTEGER DEFAULT 0,
+                    last_reset TIMESTAMP,
+                    PRIMARY KEY(user_id, shard_type)
+                )
+            """)
+            # Journal append-only des ajouts et des resets (un reset = un loot obtenu)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS mercy_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL,
+                    shard_type TEXT NOT NULL,
+                    event TEXT NOT NULL,
+                    pulls INTEGER NOT NULL,
+                    clan TEXT,
+                    created_at TIMESTAMP NOT NULL
+                )
+            """)
+            # Agrégats maintenus à chaque lot d'événements (jamais recalculés depuis le journal)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS mercy_drop_stats (
+                    shard_type TEXT NOT NULL,
+                    clan TEXT NOT NULL DEFAULT '',
+                    drop_at INTEGER NOT NULL,
+                    drops INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY(shard_type, clan, drop_at)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS mercy_user_stats (
+                    user_id TEXT NOT NULL,
+                    shard_type TEXT NOT NULL,
+                    pulls_logged INTEGER NOT NULL DEFAULT 0,
+                    drops INTEGER NOT NULL DEFAULT 0,
+                    drop_pulls_sum INTEGER NOT NULL DEFAULT 0,
+                    best_drop INTEGER,
+                    worst_drop INTEGER,
+                    PRIMARY KEY(user_id, shard_type)
+                )
+            """)
 
     def get_pulls(self, user_id, shard_type):
         """Retourne le nombre de pulls actuels pour un utilisateur et un type de shard"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT pulls FROM mercy_counters WHERE user_id = ? AND shard_type = ?",
-            (user_id, shard_type)
-        )
-        row = cursor.fetchone()
-        conn.close()
+        with self.pool.reader() as conn:
+            row = conn.execute(
+                "SELECT pulls FROM mercy_counters WHERE user_id = ? AND shard_type = ?",
+                (user_id, shard_type)
+            ).fetchone()
         return row[0] if row else 0
 
     def add_pulls(self, user_id, shard_type, pulls):
-        """Ajoute des pulls pour un utilisateur en gérant correctement l'INSERT/UPDATE"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """Ajoute des pulls pour un utilisateur (upsert atomique) et retourne le nouveau total"""
+        return self.add_pulls_many(user_id, [shard_type], pulls)[shard_type]
+
+    def add_pulls_many(self, user_id, shard_types, pulls):
+        """Ajoute des pulls sur plusieurs shards en une transaction, retourne {shard_type: total}"""
+        now = datetime.utcnow()
+        totals = {}
+        with self.pool.writer() as conn:
+            for shard_type in shard_types:
+                totals[shard_type] = conn.execute(
+                    """
+                    INSERT INTO mercy_counters (user_id, shard_type, pulls, last_reset)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(user_id, shard_type) DO UPDATE SET
+                        pulls = pulls + excluded.pulls,
+                        last_reset = excluded.last_reset
+                    RETURNING pulls
+                    """,
+                    (user_id, shard_type, pulls, now)
+                ).fetchone()[0]
+        return totals
+
+    def reset_pulls(self, user_id, shard_type):
+        """Réinitialise les pulls d'un utilisateur pour un shard, retourne les pulls avant reset (None si aucun compteur)"""
+        return self.reset_pulls_many(user_id, [shard_type]).get(shard_type)
 
-        # Vérifie si l'enregistrement existe
-        cursor.execute(
-            "SELECT pulls FROM mercy_counters WHERE user_id = ? AND shard_type = ?",
-            (user_id, shard_type)
-        )
-        row = cursor.fetchone()
+    def reset_pulls_many(self, user_id, shard_types):
+        """Réinitialise plusieurs shards d'un utilisateur en une transaction, retourne {shard_type: pulls avant reset}"""
+        now = datetime.utcnow()
+        previous = {}
+        with self.pool.writer() as conn:
+            for shard_type in shard_types:
+                row = conn.execute(
+                    "SELECT pulls FROM mercy_counters WHERE user_id = ? AND shard_type = ?",
+                    (user_id, shard_type)
+                ).fetchone()
+                if row is None:
+                    continue
+                previous[shard_type] = row[0]
+                conn.execute(
+                    "UPDATE mercy_counters SET pulls = 0, last_reset = ? WHERE user_id = ? AND shard_type = ?",
+                    (now, user_id, shard_type)
+                )
+        return previous
 
-        if row:
-            new_pulls = row[0] + pulls
-            cursor.execute(
-                "UPDATE mercy_counters SET pulls = ?, last_reset = ? WHERE user_id = ? AND shard_type = ?",
-                (new_pulls, datetime.utcnow(), user_id, shard_type)
+    def record_events(self, events):
+        """Écrit un lot d'événements [(user_id, shard_type, event, pulls, clan, created_at), ...] et met à jour les agrégats"""
+        added = Counter()
+        drops = Counter()
+        user_drops = {}
+        for user_id, shard_type, event, pulls, clan, _ in events:
+            if event == 'add':
+                added[(user_id, shard_type)] += pulls
+            elif event == 'reset':
+                drops[(shard_type, clan or '', pulls)] += 1
+                count, total, best, worst = user_drops.get((user_id, shard_type), (0, 0, pulls, pulls))
+                user_drops[(user_id, shard_type)] = (count + 1, total + pulls, min(best, pulls), max(worst, pulls))
+
+        with self.pool.writer() as conn:
+            conn.executemany(
+                "INSERT INTO mercy_events (user_id, shard_type, event, pulls, clan, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                events
+            )
+            conn.executemany(
+                """
+                INSERT INTO mercy_drop_stats (shard_type, clan, drop_at, drops) VALUES (?, ?, ?, ?)
+                ON CONFLICT(shard_type, clan, drop_at) DO UPDATE SET drops = drops + excluded.drops
+                """,
+                [(shard_type, clan, drop_at, count) for (shard_type, clan, drop_at), count in drops.items()]
             )
-        else:
-            new_pulls = pulls
-            cursor.execute(
-                "INSERT INTO mercy_counters (user_id, shard_type, pulls, last_reset) VALUES (?, ?, ?, ?)",
-                (user_id, shard_type, new_pulls, datetime.utcnow())
+            conn.executemany(
+                """
+                INSERT INTO mercy_user_stats (user_id, shard_type, pulls_logged) VALUES (?, ?, ?)
+                ON CONFLICT(user_id, shard_type) DO UPDATE SET pulls_logged = pulls_logged + excluded.pulls_logged
+                """,
+                [(user_id, shard_type, pulls) for (user_id, shard_type), pulls in added.items()]
+            )
+            conn.executemany(
+                """
+                INSERT INTO mercy_user_stats (user_id, shard_type, drops, drop_pulls_sum, best_drop, worst_drop)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(user_id, shard_type) DO UPDATE SET
+                    drops = drops + excluded.drops,
+                    drop_pulls_sum = drop_pulls_sum + excluded.drop_pulls_sum,
+                    best_drop = MIN(COALESCE(best_drop, excluded.best_drop), excluded.best_drop),
+                    worst_drop = MAX(COALESCE(worst_drop, excluded.worst_drop), excluded.worst_drop)
+                """,
+                [(user_id, shard_type, *stats) for (user_id, shard_type), stats in user_drops.items()]
             )
 
-        conn.commit()
-        conn.close()
-        return new_pulls
+    def get_user_stats(self, user_id):
+        """Retourne {shard_type: (pulls_logged, drops, drop_pulls_sum, best_drop, worst_drop)}"""
+        with self.pool.reader() as conn:
+            rows = conn.execute(
+                "SELECT shard_type, pulls_logged, drops, drop_pulls_sum, best_drop, worst_drop "
+                "FROM mercy_user_stats WHERE user_id = ?",
+                (user_id,)
+            ).fetchall()
+        return {row[0]: row[1:] for row in rows}
 
-    def reset_pulls(self, user_id, shard_type):
-        """Réinitialise les pulls d'un utilisateur pour un shard"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE mercy_counters SET pulls = 0, last_reset = ? WHERE user_id = ? AND shard_type = ?",
-            (datetime.utcnow(), user_id, shard_type)
-        )
-        conn.commit()
-        conn.close()
+    def get_drop_distribution(self, shard_type, clan=None):
+        """Retourne [(drop_at, drops), ...] par pull croissant, pour la communauté ou un clan"""
+        query = "SELECT drop_at, SUM(drops) FROM mercy_drop_stats WHERE shard_type = ?"
+        params = [shard_type]
+        if clan:
+            query += " AND clan = ?"
+            params.append(clan)
+        query += " GROUP BY drop_at ORDER BY drop_at"
+        with self.pool.reader() as conn:
+            return conn.execute(query, params).fetchall()
 
     def get_all_pulls(self, user_id):
         """Retourne tous les pulls d'un utilisateur pour tous les shards"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT shard_type, pulls FROM mercy_counters WHERE user_id = ?",
-            (user_id,)
-        )
-        rows = cursor.fetchall()
-        conn.close()
+        with self.pool.reader() as conn:
+            rows = conn.execute(
+                "SELECT shard_type, pulls FROM mercy_counters WHERE user_id = ?",
+                (user_id,)
+            ).fetchall()
         return {shard_type: pulls for shard_type, pulls in rows}
 
     def get_mercy_chance(self, shard_type, pulls):
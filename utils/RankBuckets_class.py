@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import bisect
+from array import array
+from config import LEADERBOARD_RANK_BUCKETS
+
+BUDGET_NAME = "rank_buckets"
+
+class RankBuckets:
+    """Compteurs de PB par tranche de dégâts (arbre de Fenwick) d'un classement hors cache
+
+    Les tranches sont des quantiles des dégâts au chargement. Le rang d'un joueur est le
+    nombre de PB des tranches supérieures (en mémoire, O(log n)) plus sa position dans sa
+    propre tranche, comptée par SQLite sur une plage courte. Quelques Ko par classement.
+    Les compteurs ne sont modifiés que depuis la boucle d'événements ; les bornes sont
+    fixes et peuvent être lues depuis le pool de threads.
+    """
+
+    def __init__(self, edges):
+        self.edges = array('q', edges)  # Bornes basses croissantes : tranche i = [edges[i], edges[i + 1])
+        self._tree = array('q', bytes(8 * (len(edges) + 1)))  # Fenwick 1-indexé, tranche du haut en premier
+        self.total = 0
+
+    @classmethod
+    def from_damages(cls, damages, buckets=LEADERBOARD_RANK_BUCKETS):
+        """Construit les tranches depuis les dégâts (> 0) triés par ordre croissant d'un classement"""
+        count = len(damages)
+        # 1 en plancher : un PB plus faible que tous ceux du chargement a toujours sa tranche
+        edges = sorted({1} | {damages[i * count // buckets] for i in range(buckets)} if count else {1})
+        rank_buckets = cls(edges)
+        tree = rank_buckets._tree
+        for damage in damages:
+            tree[rank_buckets._position(damage)] += 1
+        # Construction linéaire de l'arbre depuis les compteurs
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        rank_buckets.total = count
+        return rank_buckets
+
+    @property
+    def nbytes(self):
+        """Mémoire occupée par les bornes et l'arbre"""
+        return (len(self.edges) + len(self._tree)) * self.edges.itemsize
+
+    def _position(self, damage):
+        # Position Fenwick de la tranche de `damage` (1 = tranche des dégâts les plus élevés)
+        return len(self.edges) - bisect.bisect_right(self.edges, damage) + 1
+
+    def upper(self, damage):
+        """Borne haute (exclue) de la tranche de `damage`, None pour la tranche du haut"""
+        index = bisect.bisect_right(self.edges, damage)
+        return self.edges[index] if index < len(self.edges) else None
+
+    def ahead(self, damage):
+        """Nombre de PB des tranches strictement supérieures à celle de `damage`"""
+        count = 0
+        i = self._position(damage) - 1
+        while i > 0:
+            count += self._tree[i]
+            i -= i & -i
+        return count
+
+    def move(self, previous, damage):
+        """Applique un PB validé : retiré de la tranche de l'ancien dégât (s'il y en avait un), ajouté à la nouvelle"""
+        if previous:
+            self._add(previous, -1)
+        if damage:
+            self._add(damage, 1)
+
+    def _add(self, damage, delta):
+        self.total += delta
+        i = self._position(damage)
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
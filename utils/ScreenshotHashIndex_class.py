@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from config import SCREENSHOT_PHASH_MAX_DISTANCE
+from utils.MemoryBudget_class import MemoryBudget
+
+HASH_BITS = 64
+BUDGET_NAME = "screenshot_hashes"
+
+def hamming_distance(a, b):
+    """Nombre de bits différents entre deux hash"""
+    return bin(a ^ b).count("1")
+
+class ScreenshotHashIndex:
+    """Index multi-tables des hash perceptuels (multi-index hashing)
+
+    Le hash est découpé en max_distance + 1 segments, chacun indexé dans sa propre
+    table. Deux hash à max_distance bits au plus ont forcément un segment identique
+    (principe des tiroirs) : seuls les hash partageant un segment sont comparés.
+    Appelé uniquement depuis la boucle d'événements.
+    """
+
+    ENTRY_BYTES = 300  # Estimation mesurée par hash (entrée, positions dans les tables)
+
+    def __init__(self, max_distance=SCREENSHOT_PHASH_MAX_DISTANCE, budget=None):
+        self.max_distance = max_distance
+        self.budget = budget or MemoryBudget()
+        count = max_distance + 1
+        # Segments (décalage, masque) couvrant les 64 bits, tailles aussi égales que possible
+        self._segments = []
+        offset = 0
+        for i in range(count):
+            width = HASH_BITS // count + (1 if i < HASH_BITS % count else 0)
+            self._segments.append((offset, (1 << width) - 1))
+            offset += width
+        self._tables = [{} for _ in self._segments]  # segment -> [indices dans _hashes]
+        self._hashes = []   # [(phash, entrée), ...]
+        self.warmed = False
+
+    @property
+    def size(self):
+        return len(self._hashes)
+
+    def reserve(self, count):
+        """Réserve le budget de `count` hash avant chargement ; False si l'index doit rester froid"""
+        self.budget.release(BUDGET_NAME)
+        return self.budget.reserve(BUDGET_NAME, count * self.ENTRY_BYTES)
+
+    def load(self, rows):
+        """Construit l'index depuis [(phash, entrée), ...] (budget réservé au préalable)"""
+        self._hashes = []
+        self._tables = [{} for _ in self._segments]
+        for phash, entry in rows:
+            self._add(phash, entry)
+        self.warmed = True
+
+    def add(self, phash, entry):
+        """Ajoute un hash et son entrée ; l'index est abandonné (recherche par SQLite) si le budget est épuisé"""
+        if not self.warmed:
+            return
+        if not self.budget.reserve(BUDGET_NAME, self.ENTRY_BYTES):
+            self.clear()
+            print("[INFO] Budget mémoire atteint : recherche des screenshots similaires via SQLite")
+            return
+        self._add(phash, entry)
+
+    def clear(self):
+        """Vide l'index et rend son budget (lectures servies par SQLite)"""
+        self._hashes = []
+        self._tables = [{} for _ in self._segments]
+        self.warmed = False
+        self.budget.release(BUDGET_NAME)
+
+    def _add(self, phash, entry):
+        position = len(self._hashes)
+        self._hashes.append((phash, entry))
+        for table, (offset, mask) in zip(self._tables, self._segments):
+            table.setdefault((phash >> offset) & mask, []).append(position)
+
+    def find(self, phash, max_distance=None):
+        """Retourne [(distance, entrée), ...] triés, pour tous les hash à max_distance au plus"""
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+        candidates = set()
+        for table, (offset, mask) in zip(self._tables, self._segments):
+            candidates.update(table.get((phash >> offset) & mask, ()))
+        matches = []
+        for position in candidates:
+            stored, entry = self._hashes[position]
+            distance = hamming_distance(phash, stored)
+            if distance <= max_distance:
+                matches.append((distance, entry))
+        matches.sort(key=lambda match: match[0])
+        return matches
@@ -1,12 +1,35 @@
 # -*- coding: utf-8 -*-
-import sqlite3, os
+import asyncio, glob, hashlib, multiprocessing, os, re, threading, uuid
 import aiohttp
-from datetime import datetime
-from config import SCREENSHOTS_BASE_PATH, BOSS_CONFIG
+from concurrent.futures import ProcessPoolExecutor
+from config import (
+    SCREENSHOTS_BASE_PATH, BOSS_CONFIG,
+    SCREENSHOT_MAX_BYTES, SCREENSHOT_CHUNK_SIZE, SCREENSHOT_DOWNLOAD_TIMEOUT, SCREENSHOT_HTTP_CONNECTIONS,
+    IMAGE_PROCESS_WORKERS, SCREENSHOT_MAX_DIMENSION, SCREENSHOT_WEBP_QUALITY, SCREENSHOT_THUMBNAIL_SIZE,
+    SCREENSHOT_KEEP_ORIGINAL,
+)
+from utils import image_processing
+from utils.KeyedLock_class import KeyedLock
+
+# Dossier du stock adressé par contenu (blobs/<2 hex>/<2 hex>/<sha256>.<ext>)
+BLOBS_FOLDER = "blobs"
+_BLOB_NAME = re.compile(r'^[0-9a-f]{64}\.')
+
+def is_blob_name(filename):
+    """Indique si un nom de screenshot désigne un blob adressé par contenu"""
+    return bool(filename and _BLOB_NAME.match(filename))
 
 class ScreenshotManager:
-    def __init__(self, base_path=SCREENSHOTS_BASE_PATH):
+    def __init__(self, base_path=SCREENSHOTS_BASE_PATH, max_bytes=SCREENSHOT_MAX_BYTES):
         self.base_path = base_path
+        self.max_bytes = max_bytes
+        self.session = None
+        self.image_executor = None
+        # Un blob (empreinte) n'est écrit ou ré-encodé que par une soumission à la fois
+        self.blob_locks = KeyedLock()
+        self._pinned = {}  # empreinte -> soumissions en cours (blob pas encore référencé en base)
+        # Épingles, réutilisation et suppressions de blobs : partagé avec le nettoyage (thread)
+        self._disk_lock = threading.Lock()
         # Créer les dossiers pour chaque boss et difficulté
         for boss_type in BOSS_CONFIG.keys():
             boss_path = os.path.join(base_path, boss_type)
@@ -17,49 +40,276 @@ class ScreenshotManager:
                 difficulty_path = os.path.join(boss_path, difficulty)
                 os.makedirs(difficulty_path, exist_ok=True)
     
+    async def start(self):
+        """Ouvre la session HTTP partagée (appelée depuis setup_hook)"""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=SCREENSHOT_HTTP_CONNECTIONS),
+                timeout=aiohttp.ClientTimeout(total=SCREENSHOT_DOWNLOAD_TIMEOUT),
+            )
+        if self.image_executor is None and image_processing.is_available():
+            # forkserver : les workers partent d'un processus neuf qui n'a chargé que Pillow,
+            # sans copier la mémoire du bot (ni ses threads, sockets et connexions SQLite)
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["utils.image_processing"])
+            self.image_executor = ProcessPoolExecutor(max_workers=IMAGE_PROCESS_WORKERS, mp_context=context)
+
+    async def close(self):
+        """Ferme la session HTTP partagée et le pool de traitement d'images (fermeture du bot)"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+        if self.image_executor:
+            self.image_executor.shutdown(wait=True)
+            self.image_executor = None
+
     async def save_screenshot(self, attachment, username, damage, boss_type, difficulty=None):
-        """Sauvegarde le screenshot localement"""
+        """Sauvegarde le screenshot dans le stock adressé par contenu (flux, écriture atomique hors boucle)
+
+        Le nom retourné est <sha256>.<ext> : une image déjà stockée n'est jamais réécrite.
+        Le blob reste épinglé (jamais supprimé) jusqu'à unpin(), appelé après l'écriture du PB.
+        """
+        temp_path = None
         try:
-            timestamp = int(datetime.now().timestamp())
+            # Refus immédiat si Discord annonce déjà une taille excessive
+            if getattr(attachment, 'size', 0) > self.max_bytes:
+                print(f"Screenshot trop volumineux: {attachment.size} octets")
+                return None
+
             file_extension = attachment.filename.split('.')[-1].lower()
-            filename = f"{username.lower()}_{damage}_{timestamp}.{file_extension}"
+            temp_dir = os.path.join(self.base_path, BLOBS_FOLDER, "tmp")
+            await asyncio.to_thread(os.makedirs, temp_dir, exist_ok=True)
+            temp_path = os.path.join(temp_dir, f"{uuid.uuid4().hex}.part")
+
+            await self.start()
+            digest = hashlib.sha256()
+            async with self.session.get(attachment.url) as resp:
+                if resp.status != 200:
+                    return None
+                if (resp.content_length or 0) > self.max_bytes:
+                    print(f"Screenshot trop volumineux: {resp.content_length} octets")
+                    return None
+
+                # Flux par blocs vers un fichier temporaire : mémoire constante quelle que soit l'image
+                f = await asyncio.to_thread(open, temp_path, 'wb')
+                try:
+                    received = 0
+                    async for chunk in resp.content.iter_chunked(SCREENSHOT_CHUNK_SIZE):
+                        received += len(chunk)
+                        if received > self.max_bytes:
+                            print(f"Screenshot trop volumineux: plus de {self.max_bytes} octets")
+                            return None
+                        await asyncio.to_thread(self._write_chunk, f, digest, chunk)
+                finally:
+                    await asyncio.to_thread(f.close)
+
+            content_hash = digest.hexdigest()
+            async with self.blob_locks(content_hash):
+                existing = await asyncio.to_thread(self._claim_blob, content_hash)
+                if existing:
+                    # Image déjà stockée (re-soumission, nouvel essai...) : aucune écriture en double
+                    return existing
+
+                filename = f"{content_hash}.{file_extension}"
+                filepath = self.get_screenshot_path(filename, boss_type, difficulty)
+                await asyncio.to_thread(os.makedirs, os.path.dirname(filepath), exist_ok=True)
+
+                # Renommage atomique : jamais de fichier partiel sous le nom final
+                await asyncio.to_thread(os.replace, temp_path, filepath)
+                temp_path = None
+                self._pin(content_hash)
+                return filename
             
-            if difficulty:
-                boss_path = os.path.join(self.base_path, boss_type, difficulty)
+        except Exception as e:
+            print(f"Erreur sauvegarde screenshot: {str(e)}")
+            return None
+
+        finally:
+            if temp_path:
+                await asyncio.to_thread(self._remove_quietly, temp_path)
+
+    def _pin(self, content_hash):
+        with self._disk_lock:
+            self._pinned[content_hash] = self._pinned.get(content_hash, 0) + 1
+
+    def _claim_blob(self, content_hash):
+        """Réutilise un blob déjà stocké (exécuté hors boucle) : épinglé et rajeuni pour le nettoyage"""
+        with self._disk_lock:
+            existing = self._find_blob(content_hash)
+            if existing:
+                # mtime récent : le nettoyage laisse le blob dans son délai de grâce
+                os.utime(os.path.join(self._blob_folder(content_hash), existing))
+                self._pinned[content_hash] = self._pinned.get(content_hash, 0) + 1
+            return existing
+
+    def unpin(self, filename):
+        """Libère l'épingle posée par save_screenshot (PB écrit ou soumission abandonnée)"""
+        if not is_blob_name(filename):
+            return
+        content_hash = filename[:64]
+        with self._disk_lock:
+            count = self._pinned.get(content_hash, 0) - 1
+            if count > 0:
+                self._pinned[content_hash] = count
             else:
-                boss_path = os.path.join(self.base_path, boss_type)
-            
-            filepath = os.path.join(boss_path, filename)
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(attachment.url) as resp:
-                    if resp.status == 200:
-                        # Ouverture en binaire, pas de problème d'encodage
-                        with open(filepath, 'wb') as f:
-                            f.write(await resp.read())
-                        return filename
+                self._pinned.pop(content_hash, None)
+
+    def is_in_use(self, filename):
+        """Blob épinglé par une soumission en cours : sa suppression doit attendre"""
+        return is_blob_name(filename) and filename[:64] in self._pinned
+
+    def remove_orphan(self, path, owner, cutoff):
+        """Supprime un fichier orphelin pour le nettoyage (thread) ; False si son blob vient d'être réutilisé
+
+        Épingle et date du fichier référent sont relues sous le verrou de _claim_blob : une
+        réutilisation concurrente est soit vue ici, soit postérieure à la suppression.
+        """
+        with self._disk_lock:
+            if self.is_in_use(owner):
+                return False
+            try:
+                if os.stat(os.path.join(os.path.dirname(path), owner)).st_mtime > cutoff:
+                    return False
+            except FileNotFoundError:
+                pass
+            os.remove(path)
+            return True
+
+    @staticmethod
+    def _write_chunk(f, digest, chunk):
+        """Écrit un bloc et met à jour l'empreinte (exécuté hors boucle)"""
+        digest.update(chunk)
+        f.write(chunk)
+
+    def _blob_folder(self, content_hash):
+        """Dossier shardé d'un blob : blobs/ab/cd/"""
+        return os.path.join(self.base_path, BLOBS_FOLDER, content_hash[:2], content_hash[2:4])
+
+    def _find_blob(self, content_hash):
+        """Retourne le nom du blob déjà stocké pour cette empreinte (version compacte en priorité)"""
+        folder = self._blob_folder(content_hash)
+        if not os.path.isdir(folder):
             return None
-            
+        candidates = [
+            name for name in os.listdir(folder)
+            if name.startswith(content_hash + ".")
+            and not name.endswith((".part", image_processing.THUMBNAIL_SUFFIX))
+            and image_processing.ORIGINAL_SUFFIX + "." not in name
+        ]
+        if not candidates:
+            return None
+        compact = [name for name in candidates if name.endswith(image_processing.COMPACT_EXTENSION)]
+        return (compact or candidates)[0]
+
+    async def process_screenshot(self, filename, boss_type, difficulty=None):
+        """Ré-encode le screenshot (WebP, résolution bornée, miniature) dans le pool de processus
+
+        Retourne le nom du fichier compact, ou le nom d'origine si le traitement est impossible.
+        Sérialisé par empreinte : le ré-encodage supprime la source qu'une soumission
+        concurrente de la même image s'apprêterait à traiter.
+        """
+        if not filename or not image_processing.is_available():
+            return filename
+        blob = is_blob_name(filename)
+        async with self.blob_locks(filename[:64] if blob else filename):
+            if blob:
+                # Une soumission précédente a pu ré-encoder le blob pendant l'attente du verrou
+                filename = await asyncio.to_thread(self._find_blob, filename[:64]) or filename
+            # Blob déjà traité lors d'une soumission précédente
+            if filename.endswith(image_processing.COMPACT_EXTENSION) and await asyncio.to_thread(
+                os.path.exists, self.get_thumbnail_path(filename, boss_type, difficulty)
+            ):
+                return filename
+            await self.start()
+            source_path = self.get_screenshot_path(filename, boss_type, difficulty)
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(
+                    self.image_executor,
+                    image_processing.transcode_screenshot,
+                    source_path, SCREENSHOT_MAX_DIMENSION, SCREENSHOT_WEBP_QUALITY,
+                    SCREENSHOT_THUMBNAIL_SIZE, SCREENSHOT_KEEP_ORIGINAL,
+                )
+            except Exception as e:
+                print(f"Erreur traitement screenshot: {str(e)}")
+                return filename
+
+    async def compute_phash(self, filename, boss_type, difficulty=None):
+        """Hash perceptuel du screenshot calculé dans le pool de processus (None si impossible)"""
+        if not filename or not image_processing.is_available():
+            return None
+        path = await asyncio.to_thread(self._phash_source, filename, boss_type, difficulty)
+        if path is None:
+            return None
+        await self.start()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.image_executor, image_processing.dhash, path)
         except Exception as e:
-            print(f"Erreur sauvegarde screenshot: {str(e)}")
+            print(f"Erreur hash perceptuel screenshot: {str(e)}")
             return None
+
+    def _phash_source(self, filename, boss_type, difficulty=None):
+        """Fichier à hacher (exécuté hors boucle) : la miniature donne le même dHash pour un décodage bien moins coûteux"""
+        for path in (self.get_thumbnail_path(filename, boss_type, difficulty),
+                     self.get_screenshot_path(filename, boss_type, difficulty)):
+            if path and os.path.exists(path):
+                return path
+        return None
+
+    def get_thumbnail_path(self, filename, boss_type, difficulty=None):
+        """Retourne le chemin complet de la miniature d'un screenshot"""
+        if filename:
+            return self.get_screenshot_path(image_processing.thumbnail_name(filename), boss_type, difficulty)
+        return None
+
+    @staticmethod
+    def _remove_quietly(path):
+        """Supprime un fichier temporaire s'il existe"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
     
     def get_screenshot_path(self, filename, boss_type, difficulty=None):
-        """Retourne le chemin complet du screenshot"""
+        """Retourne le chemin complet du screenshot (blob shardé ou ancien dossier boss/difficulté)"""
         if filename:
+            if is_blob_name(filename):
+                return os.path.join(self._blob_folder(filename[:64]), filename)
             if difficulty:
                 return os.path.join(self.base_path, boss_type, difficulty, filename)
             else:
                 return os.path.join(self.base_path, boss_type, filename)
         return None
     
-    def delete_old_screenshot(self, filename, boss_type, difficulty=None):
-        """Supprime l'ancien screenshot"""
+    async def delete_old_screenshot(self, filename, boss_type, difficulty=None):
+        """Supprime l'ancien screenshot, sa miniature et l'original éventuellement conservé (hors boucle)
+
+        Un blob libéré par le compteur de références mais réutilisé par une soumission en
+        cours est conservé : le nettoyage périodique le reprendra s'il reste orphelin.
+        """
+        if not filename:
+            return
+        async with self.blob_locks(filename[:64] if is_blob_name(filename) else filename):
+            if self.is_in_use(filename):
+                print(f"Screenshot conservé (soumission en cours): {filename}")
+                return
+            await asyncio.to_thread(self._delete_files, filename, boss_type, difficulty)
+
+    def _delete_files(self, filename, boss_type, difficulty=None):
+        """Suppression des fichiers d'un screenshot (exécuté hors boucle)"""
         if filename:
             old_path = self.get_screenshot_path(filename, boss_type, difficulty)
+            related = [self.get_thumbnail_path(filename, boss_type, difficulty)]
+            related += glob.glob(glob.escape(os.path.splitext(old_path)[0]) + image_processing.ORIGINAL_SUFFIX + ".*")
             if old_path and os.path.exists(old_path):
                 try:
                     os.remove(old_path)
                     print(f"Ancien screenshot supprimé: {filename}")
                 except Exception as e:
                     print(f"Erreur suppression screenshot: {str(e)}")
+            for path in related:
+                if path and os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except Exception as e:
+                        print(f"Erreur suppression screenshot: {str(e)}")
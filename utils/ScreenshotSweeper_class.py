@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+import os, time
+from datetime import datetime
+from config import (
+    BOSS_CONFIG, SWEEP_GRACE_SECONDS, SWEEP_BATCH_SIZE, SWEEP_MAX_DELETIONS, SWEEP_DELETE_DELAY, SWEEP_DRY_RUN,
+)
+from utils import image_processing
+from utils.ScreenshotManager_class import BLOBS_FOLDER
+
+class ScreenshotSweeper:
+    """Ramasse-miettes des screenshots orphelins et contrôle de cohérence disque/base
+
+    Un fichier est référencé s'il est le screenshot d'un PB courant (pb_records) ;
+    miniatures et originaux conservés suivent le sort de leur version compacte.
+    Un blob réutilisé par une soumission en cours (épinglé ou rajeuni) n'est jamais supprimé.
+    sweep() est synchrone et doit tourner hors de la boucle d'événements.
+    """
+
+    def __init__(self, db_manager, screenshot_manager, dry_run=SWEEP_DRY_RUN):
+        self.db_manager = db_manager
+        self.screenshot_manager = screenshot_manager
+        self.dry_run = dry_run
+        self.counters = {
+            'sweeps': 0,
+            'files_scanned': 0,
+            'orphans_found': 0,
+            'orphans_deleted': 0,
+            'bytes_freed': 0,
+            'missing_files': 0,
+            'errors': 0,
+            'last_sweep': None,
+            'last_duration': None,
+        }
+
+    def sweep(self):
+        """Un passage complet : fichiers orphelins puis PB pointant vers un fichier absent"""
+        started = time.monotonic()
+        self._deletions = 0
+        cutoff = self._cutoff = time.time() - SWEEP_GRACE_SECONDS
+
+        # Seuls les dossiers gérés sont parcourus (blobs + anciens dossiers par boss)
+        roots = [os.path.join(self.screenshot_manager.base_path, folder) for folder in [BLOBS_FOLDER, *BOSS_CONFIG]]
+        batch = []
+        for entry in (entry for root in roots if os.path.isdir(root) for entry in self._scan(root)):
+            self.counters['files_scanned'] += 1
+            try:
+                if entry.stat().st_mtime > cutoff:
+                    continue
+            except OSError:
+                continue
+            if entry.name.endswith(".part"):
+                # Téléchargement interrompu
+                self._orphan(entry)
+                continue
+            batch.append(entry)
+            if len(batch) >= SWEEP_BATCH_SIZE:
+                self._check_batch(batch)
+                batch = []
+        if batch:
+            self._check_batch(batch)
+
+        self._check_missing_files()
+
+        self.counters['sweeps'] += 1
+        self.counters['last_sweep'] = datetime.now()
+        self.counters['last_duration'] = time.monotonic() - started
+        return dict(self.counters)
+
+    def _scan(self, path):
+        """Parcours récursif en flux des fichiers (os.scandir, pas de liste complète en mémoire)"""
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        yield from self._scan(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+        except OSError as e:
+            self.counters['errors'] += 1
+            print(f"[ERREUR] Nettoyage screenshots: {e}")
+
+    @staticmethod
+    def _owner_name(filename):
+        """Nom du screenshot référencé en base auquel un fichier est rattaché"""
+        if filename.endswith(image_processing.THUMBNAIL_SUFFIX):
+            return filename[:-len(image_processing.THUMBNAIL_SUFFIX)] + image_processing.COMPACT_EXTENSION
+        base, extension = os.path.splitext(filename)
+        if base.endswith(image_processing.ORIGINAL_SUFFIX):
+            return base[:-len(image_processing.ORIGINAL_SUFFIX)] + image_processing.COMPACT_EXTENSION
+        return filename
+
+    def _check_batch(self, entries):
+        """Compare un lot de fichiers aux noms référencés (une requête par lot)"""
+        owners = {entry.path: self._owner_name(entry.name) for entry in entries}
+        try:
+            referenced = self.db_manager.get_referenced_screenshots(set(owners.values()))
+        except Exception as e:
+            self.counters['errors'] += 1
+            print(f"[ERREUR] Nettoyage screenshots: {e}")
+            return
+        for entry in entries:
+            owner = owners[entry.path]
+            if owner not in referenced and not self.screenshot_manager.is_in_use(owner):
+                self._orphan(entry, owner)
+
+    def _orphan(self, entry, owner=None):
+        """Signale et supprime (avec limite de débit) un fichier orphelin"""
+        if self.dry_run or self._deletions >= SWEEP_MAX_DELETIONS:
+            self.counters['orphans_found'] += 1
+            return
+        try:
+            size = entry.stat().st_size
+            if owner is None:
+                os.remove(entry.path)
+            elif not self.screenshot_manager.remove_orphan(entry.path, owner, self._cutoff):
+                # Réutilisé par une soumission depuis la requête du lot : plus orphelin
+                return
+            self.counters['orphans_found'] += 1
+            self._deletions += 1
+            self.counters['orphans_deleted'] += 1
+            self.counters['bytes_freed'] += size
+            time.sleep(SWEEP_DELETE_DELAY)
+        except OSError as e:
+            self.counters['errors'] += 1
+            print(f"[ERREUR] Suppression screenshot orphelin {entry.name}: {e}")
+
+    def _check_missing_files(self):
+        """Compte les PB dont le screenshot n'existe plus sur le disque"""
+        missing = 0
+        after_rowid = 0
+        while True:
+            try:
+                rows = self.db_manager.get_pb_screenshots_page(after_rowid, SWEEP_BATCH_SIZE)
+            except Exception as e:
+                self.counters['errors'] += 1
+                print(f"[ERREUR] Nettoyage screenshots: {e}")
+                break
+            if not rows:
+                break
+            for rowid, boss_type, difficulty, screenshot in rows:
+                path = self.screenshot_manager.get_screenshot_path(screenshot, boss_type, difficulty)
+                if not os.path.exists(path):
+                    missing += 1
+            after_rowid = rows[-1][0]
+        self.counters['missing_files'] = missing
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from collections import deque
+from config import SUBMISSION_WORKERS, SUBMISSION_QUEUE_SIZE
+
+class SubmissionPipeline:
+    """File bornée de soumissions : N workers (téléchargement, traitement, envoi) et un seul écrivain en base
+
+    Les soumissions d'une même clé (voir key) sont traitées l'une après l'autre : tant qu'une
+    est en file ou en cours, les suivantes attendent hors file, sans occuper de worker.
+    Les files asyncio sont créées dans start() : l'objet peut être construit hors boucle d'événements.
+    """
+
+    def __init__(self, handler, writer, workers=SUBMISSION_WORKERS, maxsize=SUBMISSION_QUEUE_SIZE, key=None):
+        self._handler = handler  # coroutine(job) exécutée par les workers
+        self._writer = writer    # coroutine(*args) exécutée en série par l'écrivain
+        self._key = key or id    # job -> clé de sérialisation (par défaut : aucune)
+        self._chains = {}        # clé en file ou en cours -> soumissions suivantes en attente
+        self._parked = 0         # Soumissions en attente hors file (derrière une de même clé)
+        self.workers = workers
+        self.maxsize = maxsize
+        self.queue = None
+        self._writes = None
+        self._tasks = []
+        self.active = 0  # Soumissions en cours de traitement
+        self.counters = {'submitted': 0, 'completed': 0, 'failed': 0, 'shed': 0, 'peak_queue': 0}
+
+    @property
+    def started(self):
+        return bool(self._tasks)
+
+    def start(self):
+        """Lance les workers et l'écrivain (appelée depuis setup_hook)"""
+        if self.started:
+            return
+        self.queue = asyncio.Queue(self.maxsize)
+        # Une écriture en attente par worker au plus : l'écrivain freine les workers
+        self._writes = asyncio.Queue(self.workers)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._write_loop()))
+
+    async def close(self):
+        """Arrête les workers ; les soumissions encore en file sont abandonnées (fermeture du bot)"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._chains.clear()
+        self._parked = 0
+
+    def submit(self, job):
+        """Met une soumission en file : position dans la file (0 = traitée tout de suite), None si pleine"""
+        self.start()
+        # Les soumissions en attente derrière leur clé comptent dans la capacité de la file
+        if self.queue.qsize() + self._parked >= self.maxsize:
+            self.counters['shed'] += 1
+            return None
+        key = self._key(job)
+        chain = self._chains.get(key)
+        if chain is None:
+            self._chains[key] = deque()
+            self.queue.put_nowait(job)
+        else:
+            # Même clé déjà en file ou en cours : reprise par _work quand elle sera terminée
+            chain.append(job)
+            self._parked += 1
+        self.counters['submitted'] += 1
+        waiting = self.queue.qsize()
+        self.counters['peak_queue'] = max(self.counters['peak_queue'], waiting + self._parked)
+        # Les workers libres prendront les premières soumissions de la file immédiatement ;
+        # une soumission en attente derrière sa clé n'est jamais traitée tout de suite
+        return max(int(chain is not None), self.active + waiting - self.workers)
+
+    async def write(self, *args):
+        """Confie une écriture à l'écrivain unique et attend son résultat (exceptions comprises)"""
+        future = asyncio.get_running_loop().create_future()
+        await self._writes.put((args, future))
+        return await future
+
+    async def _work(self):
+        while True:
+            job = await self.queue.get()
+            self.active += 1
+            try:
+                await self._handler(job)
+                self.counters['completed'] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.counters['failed'] += 1
+                print(f"[ERREUR] Traitement d'une soumission: {e}")
+            finally:
+                self.active -= 1
+                self._release(job)
+                self.queue.task_done()
+
+    def _release(self, job):
+        """Fin d'une soumission : la suivante de même clé (s'il y en a) passe en file"""
+        key = self._key(job)
+        chain = self._chains.get(key)
+        if chain:
+            self._parked -= 1
+            # La file garde la place réservée dans submit() : jamais pleine ici
+            self.queue.put_nowait(chain.popleft())
+        else:
+            self._chains.pop(key, None)
+
+    async def _write_loop(self):
+        while True:
+            args, future = await self._writes.get()
+            try:
+                result = await self._writer(*args)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
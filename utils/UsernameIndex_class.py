@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+import bisect
+import math
+import re
+from collections import OrderedDict
+from config import USERNAME_CACHE_SIZE, USERNAME_FUZZY_THRESHOLD
+from utils.MemoryBudget_class import MemoryBudget
+
+BUDGET_NAME = "usernames"
+
+# Tag de clan en tête de pseudo : "[RTF] Bob" est aussi cherché comme "bob"
+CLAN_TAG_PATTERN = re.compile(r"^\[[^\]]*\]\s*")
+
+# Rangs de correspondance, du plus fort au plus faible
+MATCH_EXACT, MATCH_PREFIX, MATCH_SUBSTRING, MATCH_FUZZY = range(4)
+
+def _normalize(name):
+    """Forme de comparaison d'un pseudo (insensible à la casse)"""
+    return name.strip().casefold()
+
+def _name_keys(username):
+    """Formes comparées d'un pseudo : complet et sans tag de clan"""
+    full = _normalize(username)
+    return {full, CLAN_TAG_PATTERN.sub("", full) or full}
+
+def match_rank(query, username):
+    """Rang exact/préfixe/sous-chaîne d'un pseudo pour une requête normalisée (None si aucun)"""
+    best = None
+    for key in _name_keys(username):
+        if key == query:
+            return MATCH_EXACT
+        if key.startswith(query):
+            best = MATCH_PREFIX
+        elif query in key and best is None:
+            best = MATCH_SUBSTRING
+    return best
+
+def best_matches(query, rows, limit=10):
+    """Filtre [(discord_id, username), ...] comme resolve() : seul le meilleur rang est retenu"""
+    query = _normalize(query)
+    if not query:
+        return []
+    ranked = [(match_rank(query, username), discord_id, username) for discord_id, username in rows if username]
+    ranked = [match for match in ranked if match[0] is not None]
+    if not ranked:
+        return []
+    best_rank = min(rank for rank, _, _ in ranked)
+    best = sorted((match for match in ranked if match[0] == best_rank), key=lambda m: (len(m[2]), m[2]))
+    return [(discord_id, username) for _, discord_id, username in best[:limit]]
+
+def _trigrams(text):
+    """Trigrammes d'un texte, bornés par des espaces pour favoriser début et fin de mot"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class UsernameIndex:
+    """Index mémoire des pseudos (trigrammes + préfixes triés) avec résolution classée
+
+    Un cache LRU mémorise les résolutions nom -> utilisateurs ; il est vidé à
+    chaque changement de pseudo. Hors budget mémoire, l'index reste froid et les
+    recherches passent par SQLite. Appelé uniquement depuis la boucle d'événements.
+    """
+
+    ENTRY_BYTES = 1600  # Estimation mesurée par utilisateur (trigrammes, préfixes, pseudo)
+
+    def __init__(self, cache_size=USERNAME_CACHE_SIZE, budget=None):
+        self.cache_size = cache_size
+        self.budget = budget or MemoryBudget()
+        self.warmed = False
+        self._names = {}      # discord_id -> discord_username
+        self._keys = {}       # discord_id -> formes normalisées (pseudo complet, sans tag de clan)
+        self._prefixes = []   # [(forme normalisée, discord_id), ...] trié
+        self._postings = {}   # trigramme -> {discord_id, ...}
+        self._sizes = {}      # discord_id -> nombre de trigrammes du pseudo sans tag
+        self._cache = OrderedDict()
+
+    def reserve(self, count):
+        """Réserve le budget de `count` utilisateurs avant chargement ; False si l'index doit rester froid"""
+        self.budget.release(BUDGET_NAME)
+        return self.budget.reserve(BUDGET_NAME, count * self.ENTRY_BYTES)
+
+    def clear(self):
+        """Vide l'index et rend son budget (recherches servies par SQLite)"""
+        self._names.clear()
+        self._keys.clear()
+        self._prefixes = []
+        self._postings.clear()
+        self._sizes.clear()
+        self._cache.clear()
+        self.warmed = False
+        self.budget.release(BUDGET_NAME)
+
+    def load(self, rows):
+        """Construit l'index depuis [(discord_id, username), ...] (budget réservé au préalable)"""
+        self._names.clear()
+        self._keys.clear()
+        self._postings.clear()
+        self._sizes.clear()
+        self._cache.clear()
+        prefixes = []
+        for discord_id, username in rows:
+            if not username:
+                continue
+            self._index(discord_id, username)
+            prefixes.extend((key, discord_id) for key in self._keys[discord_id])
+        prefixes.sort()
+        self._prefixes = prefixes
+        self.warmed = True
+
+    def get_username(self, discord_id):
+        """Pseudo connu d'un utilisateur, ou None s'il n'est pas en base"""
+        return self._names.get(discord_id)
+
+    def set_username(self, discord_id, username):
+        """Ajoute ou renomme un utilisateur (sans effet si l'index est froid)"""
+        if not self.warmed or not username or self._names.get(discord_id) == username:
+            return
+        if discord_id not in self._names and not self.budget.reserve(BUDGET_NAME, self.ENTRY_BYTES):
+            self.clear()
+            print("[INFO] Budget mémoire atteint : recherche des pseudos via SQLite")
+            return
+        self._unindex(discord_id)
+        self._index(discord_id, username)
+        for key in self._keys[discord_id]:
+            bisect.insort(self._prefixes, (key, discord_id))
+        self._cache.clear()
+
+    def _index(self, discord_id, username):
+        full = _normalize(username)
+        bare = CLAN_TAG_PATTERN.sub("", full) or full
+        self._names[discord_id] = username
+        self._keys[discord_id] = {full, bare}
+        self._sizes[discord_id] = len(_trigrams(bare))
+        for trigram in _trigrams(full) | _trigrams(bare):
+            self._postings.setdefault(trigram, set()).add(discord_id)
+
+    def _unindex(self, discord_id):
+        keys = self._keys.pop(discord_id, None)
+        if keys is None:
+            return
+        self._names.pop(discord_id, None)
+        self._sizes.pop(discord_id, None)
+        for key in keys:
+            i = bisect.bisect_left(self._prefixes, (key, discord_id))
+            if i < len(self._prefixes) and self._prefixes[i] == (key, discord_id):
+                del self._prefixes[i]
+            for trigram in _trigrams(key):
+                postings = self._postings.get(trigram)
+                if postings is not None:
+                    postings.discard(discord_id)
+                    if not postings:
+                        del self._postings[trigram]
+
+    def search(self, query, limit=10):
+        """Retourne [(discord_id, username, rang), ...] classés du meilleur au moins bon"""
+        query = _normalize(query)
+        if not query:
+            return []
+        scored = {}
+
+        # Exact et préfixe : plage contiguë de la liste triée
+        i = bisect.bisect_left(self._prefixes, (query,))
+        while i < len(self._prefixes) and self._prefixes[i][0].startswith(query):
+            key, discord_id = self._prefixes[i]
+            rank = MATCH_EXACT if key == query else MATCH_PREFIX
+            scored[discord_id] = min(scored.get(discord_id, rank), rank)
+            i += 1
+
+        # Sous-chaîne : intersection des trigrammes intérieurs, listes les plus courtes d'abord
+        interior = sorted(
+            (self._postings.get(query[i:i + 3], set()) for i in range(len(query) - 2)), key=len
+        )
+        if interior:
+            for discord_id in set.intersection(*interior):
+                if discord_id not in scored and any(query in key for key in self._keys[discord_id]):
+                    scored[discord_id] = MATCH_SUBSTRING
+
+        # Approchant (fautes de frappe), seulement à défaut de mieux
+        similarity = {}
+        if not scored:
+            query_trigrams = sorted(_trigrams(query), key=lambda t: len(self._postings.get(t, ())))
+            # Jaccard >= seuil impose au moins `required` trigrammes communs : tout candidat
+            # figure donc dans l'une des listes les plus rares (filtrage par préfixe)
+            required = max(1, math.ceil(USERNAME_FUZZY_THRESHOLD * len(query_trigrams)))
+            rare = query_trigrams[:len(query_trigrams) - required + 1]
+            candidates = set().union(*(self._postings.get(t, ()) for t in rare))
+            for discord_id in candidates:
+                count = sum(1 for t in query_trigrams if discord_id in self._postings.get(t, ()))
+                score = count / (len(query_trigrams) + self._sizes[discord_id] - count)
+                if score >= USERNAME_FUZZY_THRESHOLD:
+                    scored[discord_id] = MATCH_FUZZY
+                    similarity[discord_id] = score
+
+        ranked = sorted(
+            scored.items(),
+            key=lambda item: (item[1], -similarity.get(item[0], 1), len(self._names[item[0]]), self._names[item[0]])
+        )
+        return [(discord_id, self._names[discord_id], rank) for discord_id, rank in ranked[:limit]]
+
+    def resolve(self, query):
+        """Meilleures correspondances [(discord_id, username), ...] : seul le meilleur rang est retenu"""
+        key = _normalize(query)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return list(cached)
+
+        results = self.search(query)
+        if results:
+            best_rank = results[0][2]
+            results = [(discord_id, username) for discord_id, username, rank in results if rank == best_rank]
+            # En approchant, un seul candidat : le plus proche
+            if best_rank == MATCH_FUZZY:
+                results = results[:1]
+
+        self._cache[key] = results
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return list(results)
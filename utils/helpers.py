@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
+import math
 import re
-from datetime import datetime
-from config import AUTHORIZED_CHANNEL_ID, DIFFICULTY_SHORTCUTS 
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qs
+from config import AUTHORIZED_CHANNEL_ID, DIFFICULTY_SHORTCUTS, CDN_URL_EXPIRY_MARGIN
 
 def parse_damage_amount(damage_str):
     """Convertit les montants avec suffixes (K, M, B) en nombres entiers"""
@@ -34,6 +36,11 @@ def format_damage_display(damage):
         return f"{int(thousands)}K" if thousands == int(thousands) else f"{thousands:.1f}K"
     return str(damage)
 
+def format_rank(rank, total):
+    """Formate un rang avec son percentile (#3/40 • Top 8%)"""
+    percentile = max(1, math.ceil(rank / total * 100))
+    return f"#{rank}/{total} • Top {percentile}%"
+
 def normalize_difficulty(difficulty):
     """Normalise une difficulté en gérant les diminutifs"""
     if not difficulty:
@@ -94,6 +101,18 @@ def get_difficulty_display_name(difficulty):
     }
     return difficulty_names.get(difficulty, difficulty.title())
 
+def is_cdn_url_valid(url, margin=CDN_URL_EXPIRY_MARGIN):
+    """Vérifie qu'une URL CDN Discord n'est pas expirée (paramètre ex= en hexadécimal)"""
+    if not url:
+        return False
+    expires = parse_qs(urlparse(url).query).get('ex')
+    if not expires:
+        return True
+    try:
+        return int(expires[0], 16) - margin > datetime.now(timezone.utc).timestamp()
+    except ValueError:
+        return False
+
 def is_authorized_channel(ctx):
     return ctx.channel.id == AUTHORIZED_CHANNEL_ID
 
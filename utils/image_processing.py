@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Traitements d'images exécutés dans un ProcessPoolExecutor (fonctions de module, sérialisables)"""
+import os
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow absent : les screenshots sont conservés tels quels
+    Image = None
+
+COMPACT_EXTENSION = ".webp"
+THUMBNAIL_SUFFIX = ".thumb.webp"
+ORIGINAL_SUFFIX = ".orig"
+
+def is_available():
+    """Indique si Pillow est installé"""
+    return Image is not None
+
+def thumbnail_name(filename):
+    """Nom de la miniature associée à un screenshot"""
+    return os.path.splitext(filename)[0] + THUMBNAIL_SUFFIX
+
+def original_name(filename, extension):
+    """Nom de l'original conservé à côté de la version compacte"""
+    return os.path.splitext(filename)[0] + ORIGINAL_SUFFIX + extension
+
+def transcode_screenshot(source_path, max_dimension, quality, thumbnail_size, keep_original):
+    """Ré-encode un screenshot en WebP sans métadonnées, borne sa résolution et crée une miniature
+
+    Retourne le nom du fichier compact (dans le même dossier que la source).
+    """
+    folder, source_name = os.path.split(source_path)
+    base, extension = os.path.splitext(source_name)
+    compact_path = os.path.join(folder, base + COMPACT_EXTENSION)
+
+    with Image.open(source_path) as img:
+        # Orientation EXIF appliquée, puis aucune métadonnée n'est recopiée à l'encodage
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+        img.thumbnail((max_dimension, max_dimension))
+
+        if keep_original:
+            os.replace(source_path, os.path.join(folder, original_name(source_name, extension)))
+
+        temp_path = compact_path + ".part"
+        img.save(temp_path, "WEBP", quality=quality, method=4)
+        os.replace(temp_path, compact_path)
+
+        img.thumbnail((thumbnail_size, thumbnail_size))
+        temp_path = os.path.join(folder, thumbnail_name(source_name)) + ".part"
+        img.save(temp_path, "WEBP", quality=quality, method=4)
+        os.replace(temp_path, temp_path[:-len(".part")])
+
+    if not keep_original and source_path != compact_path and os.path.exists(source_path):
+        os.remove(source_path)
+
+    return os.path.basename(compact_path)
+
+def dhash(path, hash_size=8):
+    """Hash perceptuel (dHash) sur 64 bits : gradient horizontal d'une vignette en niveaux de gris"""
+    with Image.open(path) as img:
+        img = ImageOps.exif_transpose(img).convert("L").resize(
+            (hash_size + 1, hash_size), Image.Resampling.LANCZOS
+        )
+        pixels = list(img.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
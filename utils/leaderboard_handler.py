@@ -1,16 +1,98 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import os
 import discord
 from discord.ext import commands
-from config import AUTHORIZED_CHANNEL_ID, BOSS_CONFIG, CLAN_CONFIG
-from utils.helpers import normalize_difficulty, get_difficulty_display_name, format_damage_display, format_date_only, get_user_clan
+from config import AUTHORIZED_CHANNEL_ID, BOSS_CONFIG, CLAN_CONFIG, LEADERBOARD_PAGE_SIZE
+from utils.helpers import normalize_difficulty, get_difficulty_display_name, format_damage_display, format_date_only
+from utils.LeaderboardView_class import LeaderboardView
 
 db_manager = None
 
+# Première page rendue par (boss, difficulté, clan) : (version des données, lignes, total, embed.to_dict())
+_first_pages = {}
+# Calculs en cours : les demandes identiques simultanées attendent le même
+_inflight = {}
+
 def set_db_manager(db):
     global db_manager
     db_manager = db
 
+def build_leaderboard_embed(boss_type, difficulty, clan, rows, start_rank=1, total=None):
+    """Construit l'embed d'une page de classement [(discord_id, username, damage, date, clan), ...]"""
+    boss_info = BOSS_CONFIG[boss_type]
+    end_rank = start_rank + len(rows) - 1
+    range_text = "Top 10" if start_rank == 1 and len(rows) <= 10 else f"#{start_rank}-{end_rank}"
+    
+    # Titre avec clan et difficulté si spécifiés
+    difficulty_name = get_difficulty_display_name(difficulty) if difficulty else ""
+    title = f"🏆 {difficulty_name} {boss_info['name']} Leaderboard - {range_text}"
+    
+    if clan:
+        clan_info = CLAN_CONFIG.get(clan, {'name': clan, 'emoji': '🏛️'})
+        title = f"{clan_info['emoji']} {clan_info['name']} - {difficulty_name} {boss_info['name']} {range_text}"
+    
+    embed = discord.Embed(
+        title=title,
+        color=boss_info['color'] if not clan else CLAN_CONFIG.get(clan, {'color': boss_info['color']})['color']
+    )
+    
+    medals = {1: "🥇", 2: "🥈", 3: "🥉"}
+    
+    for rank, (_, username, damage, date, user_clan) in enumerate(rows, start=start_rank):
+        date_text = ""
+        if date:
+            formatted_date = format_date_only(date)
+            if formatted_date:
+                date_text = f" • {formatted_date}"
+        
+        # Afficher le clan dans le nom si pas de filtre par clan (colonne matérialisée)
+        display_name = username
+        if not clan:
+            if user_clan:
+                clan_emoji = CLAN_CONFIG.get(user_clan, {'emoji': '🏛️'})['emoji']
+                display_name = f"{clan_emoji} {username}"
+        
+        embed.add_field(
+            name=f"{medals.get(rank, '🏅')} #{rank} {display_name}",
+            value=f"**{format_damage_display(damage)} damage**{date_text}",
+            inline=False
+        )
+    
+    if total and total > len(rows):
+        page_count = -(-total // LEADERBOARD_PAGE_SIZE)
+        embed.set_footer(text=f"Page {(start_rank - 1) // LEADERBOARD_PAGE_SIZE + 1}/{page_count} • {total} players")
+    
+    return embed
+
+async def _render_first_page(boss_type, difficulty, clan):
+    """Charge et rend la première page d'un classement"""
+    version = db_manager.data_version
+    rows = await db_manager.get_leaderboard_page(boss_type, difficulty, LEADERBOARD_PAGE_SIZE, clan)
+    if not rows:
+        return version, rows, 0, None
+    total = await db_manager.get_leaderboard_size(boss_type, difficulty, clan)
+    embed = build_leaderboard_embed(boss_type, difficulty, clan, rows, 1, total)
+    return version, rows, total, embed.to_dict()
+
+async def get_first_page(boss_type, difficulty=None, clan=None):
+    """Retourne (lignes, total, embed) de la première page, en cache tant qu'aucun PB n'a changé"""
+    key = (boss_type, difficulty, clan)
+    cached = _first_pages.get(key)
+    if cached is None or cached[0] != db_manager.data_version:
+        task = _inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(_render_first_page(boss_type, difficulty, clan))
+            _inflight[key] = task
+            task.add_done_callback(lambda _: _inflight.pop(key, None))
+        # shield : l'annulation d'un demandeur n'interrompt pas le calcul partagé
+        cached = await asyncio.shield(task)
+        _first_pages[key] = cached
+    _, rows, total, embed_data = cached
+    # Un Embed neuf par envoi : l'objet n'est jamais partagé entre messages
+    embed = discord.Embed.from_dict(embed_data) if embed_data else None
+    return rows, total, embed
+
 async def show_leaderboard(ctx, boss_type, difficulty=None, clan=None):
     """Fonction générique pour afficher les classements"""
     if ctx.channel.id != AUTHORIZED_CHANNEL_ID:
@@ -26,51 +108,55 @@ async def show_leaderboard(ctx, boss_type, difficulty=None, clan=None):
                 return
         
         boss_info = BOSS_CONFIG[boss_type]
-        leaderboard = db_manager.get_leaderboard(boss_type, difficulty, 10, clan)
+        rows, total, embed = await get_first_page(boss_type, difficulty, clan)
         
-        if not leaderboard:
+        if not rows:
             clan_text = f" for clan {clan}" if clan else ""
             difficulty_text = f" {get_difficulty_display_name(difficulty)}" if difficulty else ""
             await ctx.send(f"⚠️ No{difficulty_text} {boss_info['name']} records found{clan_text} yet!")
             return
         
-        # Titre avec clan et difficulté si spécifiés
-        difficulty_name = get_difficulty_display_name(difficulty) if difficulty else ""
-        title = f"🏆 {difficulty_name} {boss_info['name']} Leaderboard - Top 10"
-        
-        if clan:
-            clan_info = CLAN_CONFIG.get(clan, {'name': clan, 'emoji': '🏛️'})
-            title = f"{clan_info['emoji']} {clan_info['name']} - {difficulty_name} {boss_info['name']} Top 10"
+        if total <= len(rows):
+            await ctx.send(embed=embed)
+            return
         
-        embed = discord.Embed(
-            title=title,
-            color=boss_info['color'] if not clan else CLAN_CONFIG.get(clan, {'color': boss_info['color']})['color']
+        # Plusieurs pages : boutons de navigation, les pages suivantes éditent ce message
+        render = lambda page_rows, start_rank, page_total: build_leaderboard_embed(
+            boss_type, difficulty, clan, page_rows, start_rank, page_total
         )
+        view = LeaderboardView(db_manager, boss_type, difficulty, clan, LEADERBOARD_PAGE_SIZE, rows, total, render)
+        view.message = await ctx.send(embed=embed, view=view)
         
-        medals = ["🥇", "🥈", "🥉"] + ["🏅"] * 7
+    except Exception as e:
+        await ctx.send(f"⚠️ Error: {e}")
+
+async def show_all_leaderboards(ctx, boss_type, clan=None):
+    """Affiche le top de toutes les difficultés d'un boss en un seul message (un embed par difficulté)"""
+    if ctx.channel.id != AUTHORIZED_CHANNEL_ID:
+        return
+    
+    try:
+        boards = await db_manager.get_all_leaderboards(boss_type, LEADERBOARD_PAGE_SIZE, clan)
+        embeds = []
+        for difficulty in BOSS_CONFIG[boss_type]['difficulties'] or [None]:
+            if difficulty in boards:
+                rows, total = boards[difficulty]
+                embeds.append(build_leaderboard_embed(boss_type, difficulty, clan, rows, 1, total))
         
-        for i, (username, damage, date) in enumerate(leaderboard):
-            date_text = ""
-            if date:
-                formatted_date = format_date_only(date)
-                if formatted_date:
-                    date_text = f" • {formatted_date}"
-            
-            # Afficher le clan dans le nom si pas de filtre par clan
-            display_name = username
-            if not clan:
-                user_clan = get_user_clan(username)
-                if user_clan:
-                    clan_emoji = CLAN_CONFIG.get(user_clan, {'emoji': '🏛️'})['emoji']
-                    display_name = f"{clan_emoji} {username}"
-            
-            embed.add_field(
-                name=f"{medals[i]} #{i+1} {display_name}",
-                value=f"**{format_damage_display(damage)} damage**{date_text}",
-                inline=False
-            )
+        if not embeds:
+            clan_text = f" for clan {clan}" if clan else ""
+            await ctx.send(f"⚠️ No {BOSS_CONFIG[boss_type]['name']} records found{clan_text} yet!")
+            return
         
-        await ctx.send(embed=embed)
+        # Un seul message (10 embeds et 6000 caractères max) ; découpé seulement si les pseudos sont très longs
+        batch, size = [], 0
+        for embed in embeds:
+            if batch and (len(batch) == 10 or size + len(embed) > 6000):
+                await ctx.send(embeds=batch)
+                batch, size = [], 0
+            batch.append(embed)
+            size += len(embed)
+        await ctx.send(embeds=batch)
         
     except Exception as e:
         await ctx.send(f"⚠️ Error: {e}")
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Prévision Monte Carlo du nombre de shards avant un loot (règles de mercy de helpers.MERCY_RULES)"""
+from functools import lru_cache
+from config import MERCY_FORECAST_TRIALS, MERCY_FORECAST_BATCH, MERCY_FORECAST_CACHE_SIZE
+from utils.helpers import MERCY_RULES, calc_chance_and_guarantee
+
+try:
+    import numpy as np
+except ImportError:  # NumPy absent : la commande forecast est désactivée
+    np = None
+
+FORECAST_PERCENTILES = (50, 75, 90, 99)
+
+def is_available():
+    """Indique si NumPy est installé"""
+    return np is not None
+
+def _drop_chances(shard_type, current_pulls):
+    """Probabilité de loot de chaque pull suivant, jusqu'au pull garanti inclus
+
+    Le nombre de pulls est le « remaining » de !mercy show (calc_chance_and_guarantee).
+    """
+    _, _, remaining = calc_chance_and_guarantee(shard_type, current_pulls)
+    return np.array([
+        min(calc_chance_and_guarantee(shard_type, pulls)[0], 100) / 100
+        for pulls in range(current_pulls, current_pulls + max(1, remaining))
+    ])
+
+@lru_cache(maxsize=MERCY_FORECAST_CACHE_SIZE)
+def forecast(shard_type, current_pulls, trials=MERCY_FORECAST_TRIALS, batch_size=MERCY_FORECAST_BATCH):
+    """Simule `trials` progressions de mercy par lots vectorisés
+
+    Chaque trajectoire est tirée par inversion de la fonction de répartition du
+    premier loot ; seul l'histogramme des résultats est conservé entre les lots.
+    Retourne {'percentiles': {p: shards}, 'expected': float, 'worst_case': int}.
+    """
+    if shard_type not in MERCY_RULES:
+        raise ValueError(f"Unknown shard type: {shard_type}")
+
+    chances = _drop_chances(shard_type, max(0, current_pulls))
+    # P(loot au plus tard au k-ième shard), forcée à 1 au pull garanti
+    cdf = 1 - np.cumprod(1 - chances)
+    cdf[-1] = 1.0
+
+    rng = np.random.default_rng()
+    histogram = np.zeros(len(cdf), dtype=np.int64)
+    remaining = trials
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        shards = np.searchsorted(cdf, rng.random(size), side="right")
+        histogram += np.bincount(shards, minlength=len(cdf))
+        remaining -= size
+
+    cumulative = np.cumsum(histogram)
+    percentiles = {
+        p: int(np.searchsorted(cumulative, trials * p / 100)) + 1
+        for p in FORECAST_PERCENTILES
+    }
+    expected = float(np.dot(np.arange(1, len(cdf) + 1), histogram) / trials)
+    return {'percentiles': percentiles, 'expected': expected, 'worst_case': len(cdf)}
@@ -1,14 +1,19 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import os
 import discord
-from config import AUTHORIZED_CHANNEL_ID, BOSS_CONFIG
+from config import AUTHORIZED_CHANNEL_ID, BOSS_CONFIG, SCREENSHOT_MAX_BYTES, SUBMISSION_QUEUED_EMOJI
 from utils.helpers import (
     parse_damage_amount,
     normalize_difficulty,
     get_difficulty_display_name,
     format_damage_display,
     format_datetime,
+    format_date_only,
+    is_cdn_url_valid,
 )
+from utils.DatabaseManager_class import StalePBError
+from utils.SubmissionPipeline_class import SubmissionPipeline
 
 db_manager = None
 screenshot_manager = None
@@ -90,22 +95,85 @@ async def handle_pb_submission(ctx, boss_type, difficulty, damage):
         await ctx.send("⚠️ Please attach a valid image file!")
         return
     
+    if attachment.size > SCREENSHOT_MAX_BYTES:
+        await ctx.send(f"⚠️ Screenshot too large (max {SCREENSHOT_MAX_BYTES // (1024 * 1024)} MB)!")
+        return
+    
+    # Traitement différé par la file bornée : la commande rend la main immédiatement
+    position = submission_pipeline.submit((ctx, boss_type, difficulty, damage, attachment))
+    if position is None:
+        await ctx.send("⚠️ Too many PB submissions right now, please try again in a minute!")
+        return
+    try:
+        await ctx.message.add_reaction(SUBMISSION_QUEUED_EMOJI)
+    except discord.HTTPException:
+        pass
+    if position:
+        await ctx.send(f"{SUBMISSION_QUEUED_EMOJI} Your PB is queued (position **{position}**).")
+
+async def _process_submission(job):
+    """Worker de la file : traite une soumission puis retire la réaction d'attente"""
+    ctx, boss_type, difficulty, damage, attachment = job
     user_id = ctx.author.id
     username = ctx.author.display_name
-    current_pb, _, _ = db_manager.get_user_pb(user_id, boss_type, difficulty)
+    try:
+        await _submit_pb(ctx, boss_type, difficulty, damage, attachment, user_id, username)
+    except Exception as e:
+        await ctx.send(f"⚠️ Error: {str(e)}")
+    finally:
+        try:
+            await ctx.message.remove_reaction(SUBMISSION_QUEUED_EMOJI, ctx.bot.user)
+        except discord.HTTPException:
+            pass
+
+async def _write_pb(*args):
+    """Écrivain unique de la file : écriture du PB en base"""
+    return await db_manager.update_user_pb(*args)
+
+def _submission_key(job):
+    """Clé de sérialisation d'une soumission : un seul traitement à la fois par (utilisateur, boss, difficulté)"""
+    ctx, boss_type, difficulty = job[:3]
+    return ctx.author.id, boss_type, difficulty
+
+# Téléchargements bornés par le nombre de workers, écritures en base sérialisées,
+# soumissions d'un même PB traitées l'une après l'autre sans bloquer de worker
+submission_pipeline = SubmissionPipeline(_process_submission, _write_pb, key=_submission_key)
+
+async def _submit_pb(ctx, boss_type, difficulty, damage, attachment, user_id, username):
+    """Section critique d'une soumission (une seule à la fois par PB, voir _submission_key)"""
+    current_pb, _, _ = await db_manager.get_user_pb(user_id, boss_type, difficulty)
     
     if damage > current_pb:
         screenshot_filename = await screenshot_manager.save_screenshot(
             attachment, username, damage, boss_type, difficulty
         )
+        # Ré-encodage compact dans le pool de processus (jamais sur la boucle d'événements)
+        screenshot_filename = await screenshot_manager.process_screenshot(screenshot_filename, boss_type, difficulty)
         
         if screenshot_filename:
-            old_screenshot = db_manager.update_user_pb(
-                user_id, username, boss_type, damage, screenshot_filename, difficulty
-            )
+            try:
+                # Hash perceptuel hors boucle : recherche des screenshots déjà soumis presque identiques
+                phash = await screenshot_manager.compute_phash(screenshot_filename, boss_type, difficulty)
+                similar = await db_manager.find_similar_screenshots(phash)
+
+                old_screenshot = await submission_pipeline.write(
+                    user_id, username, boss_type, damage, screenshot_filename, difficulty
+                )
+            except StalePBError:
+                # PB supérieur écrit entre-temps (autre instance du bot) : le nouveau screenshot n'a
+                # jamais été référencé, le nettoyage périodique le supprimera après son délai de grâce
+                await ctx.send("⚠️ A higher PB was recorded in the meantime.")
+                await show_user_pb(ctx, boss_type, difficulty, username)
+                return
+            finally:
+                # Référencé en base (ou abandonné) : le compteur de références prend le relais
+                screenshot_manager.unpin(screenshot_filename)
             
             if old_screenshot:
-                screenshot_manager.delete_old_screenshot(old_screenshot, boss_type, difficulty)
+                await screenshot_manager.delete_old_screenshot(old_screenshot, boss_type, difficulty)
+            
+            # Classements en direct : rafraîchis en différé si le top a changé
+            ctx.bot.dispatch("pb_update", user_id, username, boss_type, difficulty)
             
             improvement = damage - current_pb if current_pb > 0 else damage
             boss_info = BOSS_CONFIG[boss_type]
@@ -117,46 +185,84 @@ async def handle_pb_submission(ctx, boss_type, difficulty, damage):
                 color=0x00ff00
             )
             embed.add_field(name="📈 Improvement", value=f"+{format_damage_display(improvement)} damage", inline=True)
+            
+            if similar:
+                embed.add_field(name="⚠️ Possible reused screenshot", value=await format_similar_screenshots(similar), inline=False)
+            await db_manager.record_screenshot_hash(screenshot_filename, phash, user_id, boss_type, difficulty)
 
-            # Envoi du screenshot correctement pour Discord
-            screenshot_path = screenshot_manager.get_screenshot_path(screenshot_filename, boss_type, difficulty)
-            if screenshot_path and os.path.exists(screenshot_path):
-                file = discord.File(screenshot_path, filename=screenshot_filename)
-                embed.set_image(url=f"attachment://{screenshot_filename}")
-                await ctx.send(embed=embed, file=file)
-            else:
-                await ctx.send(embed=embed)
+            # Premier envoi du screenshot : l'URL CDN est mémorisée pour les affichages suivants
+            await send_pb_embed(ctx, embed, user_id, boss_type, difficulty, screenshot_filename)
         else:
             await ctx.send("⚠️ Failed to save screenshot. Please try again.")
     else:
         # Si le PB n'est pas battu, on montre le PB existant
         await show_user_pb(ctx, boss_type, difficulty, username)
 
-async def show_user_pb(ctx, boss_type, difficulty, target_user):
-    """Affiche le PB actuel d'un utilisateur"""
+async def format_similar_screenshots(similar, limit=3):
+    """Texte des screenshots déjà soumis qui ressemblent au nouveau [(distance, entrée), ...]"""
+    lines = []
+    for distance, (_, discord_id, boss_type, difficulty, created_at) in similar[:limit]:
+        owner = await db_manager.get_username(discord_id) or "unknown user"
+        difficulty_name = f"{get_difficulty_display_name(difficulty)} " if difficulty else ""
+        formatted_date = format_date_only(created_at)
+        date_text = f", {formatted_date}" if formatted_date else ""
+        lines.append(f"Matches **{owner}**'s {difficulty_name}{BOSS_CONFIG[boss_type]['name']} screenshot{date_text} ({distance}/64 bits differ)")
+    return "\n".join(lines)
+
+async def send_pb_embed(ctx, embed, user_id, boss_type, difficulty, screenshot, screenshot_url=None):
+    """Envoie un embed de PB : URL CDN réutilisée si encore valide, sinon upload du fichier local"""
+    if screenshot and is_cdn_url_valid(screenshot_url):
+        embed.set_image(url=screenshot_url)
+        await ctx.send(embed=embed)
+        return
+    
+    screenshot_path = screenshot_manager.get_screenshot_path(screenshot, boss_type, difficulty)
+    if not (screenshot_path and await asyncio.to_thread(os.path.exists, screenshot_path)):
+        await ctx.send(embed=embed)
+        return
+    
+    file = discord.File(screenshot_path, filename=screenshot)
+    embed.set_image(url=f"attachment://{screenshot}")
+    message = await ctx.send(embed=embed, file=file)
+    
+    # L'image est désormais hébergée par Discord : on garde son URL
+    cdn_url = None
+    if message.attachments:
+        cdn_url = message.attachments[0].url
+    elif message.embeds and message.embeds[0].image:
+        cdn_url = message.embeds[0].image.url
+    if cdn_url:
+        await db_manager.set_screenshot_url(user_id, boss_type, difficulty, screenshot, cdn_url)
+
+async def resolve_target_user(ctx, target_user):
+    """Retourne (user_id, display_name) pour un pseudo, ou None après avoir informé l'utilisateur"""
     # Si target_user est un nom d'utilisateur, on essaie de le trouver
     if isinstance(target_user, str) and not target_user.isdigit():
         # D'abord, vérifier si c'est l'utilisateur actuel
         if target_user.lower() == ctx.author.display_name.lower():
-            user_id = ctx.author.id
-            display_name = ctx.author.display_name
-        else:
-            # Chercher dans la base de données
-            matches = db_manager.find_user_by_name(target_user)
-            if not matches:
-                await ctx.send(f"⚠️ User **{target_user}** not found in database.")
-                return
-            elif len(matches) > 1:
-                await ctx.send(f"⚠️ Multiple users found for **{target_user}**. Please be more specific.")
-                return
-            else:
-                user_id, display_name = matches[0]
-    else:
-        # Si c'est l'utilisateur actuel
-        user_id = ctx.author.id
-        display_name = ctx.author.display_name
+            return ctx.author.id, ctx.author.display_name
+        # Chercher dans la base de données
+        matches = await db_manager.find_user_by_name(target_user)
+        if not matches:
+            await ctx.send(f"⚠️ User **{target_user}** not found in database.")
+            return None
+        elif len(matches) > 1:
+            # Correspondances de même rang : proposer les candidats
+            suggestions = ", ".join(f"**{name}**" for _, name in matches[:5])
+            await ctx.send(f"⚠️ Multiple users found for **{target_user}**: {suggestions}. Please be more specific.")
+            return None
+        return matches[0]
+    # Si c'est l'utilisateur actuel
+    return ctx.author.id, ctx.author.display_name
+
+async def show_user_pb(ctx, boss_type, difficulty, target_user):
+    """Affiche le PB actuel d'un utilisateur"""
+    target = await resolve_target_user(ctx, target_user)
+    if not target:
+        return
+    user_id, display_name = target
     
-    current_pb, screenshot, date = db_manager.get_user_pb(user_id, boss_type, difficulty)
+    current_pb, screenshot, date, screenshot_url = await db_manager.get_user_pb_record(user_id, boss_type, difficulty)
     boss_info = BOSS_CONFIG[boss_type]
     difficulty_name = get_difficulty_display_name(difficulty) if difficulty else ""
     
@@ -169,15 +275,6 @@ async def show_user_pb(ctx, boss_type, difficulty, target_user):
         if date:
             embed.add_field(name="📅 Date", value=format_datetime(date), inline=True)
 
-        # Envoi du screenshot local correctement
-        if screenshot:
-            screenshot_path = screenshot_manager.get_screenshot_path(screenshot, boss_type, difficulty)
-            if screenshot_path and os.path.exists(screenshot_path):
-                file = discord.File(screenshot_path, filename=screenshot)
-                embed.set_image(url=f"attachment://{screenshot}")
-                await ctx.send(embed=embed, file=file)
-                return
-
-        await ctx.send(embed=embed)
+        await send_pb_embed(ctx, embed, user_id, boss_type, difficulty, screenshot, screenshot_url)
     else:
         await ctx.send(f"⚠️ No PB found for **{display_name}** on {difficulty_name} {boss_info['name']}.")
\ No newline at end of file